@@ -1,20 +1,85 @@
 """
 Custom storage classes for AWS S3 - MEDIA FILES ONLY
 Static files are now served locally via Whitenoise
+
+Media is content-addressed: an upload is stored under a name derived from
+the SHA-256 of its bytes, so identical images uploaded for different
+products share one object and a stored name never changes content. That
+makes year-long immutable cache headers safe.
 """
-from django.conf import settings
+import hashlib
+import os
+import posixpath
+
+from django.core.files import File
+from django.core.files.storage import FileSystemStorage
+from django.core.files.utils import validate_file_name
+from django.db.models import Q
 from storages.backends.s3boto3 import S3Boto3Storage
 
+IMMUTABLE_CACHE_CONTROL = 'public, max-age=31536000, immutable'
+
 
 # StaticStorage class removed - static files now served locally via Whitenoise
 
 
-class MediaStorage(S3Boto3Storage):
+class ContentHashStorageMixin:
+    """
+    Store files under ``<dir>/<sha256 prefix><ext>`` and skip duplicate uploads
+
+    Saving content that is already stored returns the existing name without
+    writing anything. Deleting a name that a product still uses is a no-op.
+    """
+    hash_length = 16
+    hash_chunk_size = 1024 * 1024
+
+    def hashed_name(self, name, content):
+        digest = hashlib.sha256()
+        content.seek(0)
+        for chunk in content.chunks(self.hash_chunk_size):
+            digest.update(chunk)
+        content.seek(0)
+        dirname, basename = posixpath.split(name.replace('\\', '/'))
+        extension = os.path.splitext(basename)[1].lower()
+        return posixpath.join(dirname, digest.hexdigest()[:self.hash_length] + extension)
+
+    def save(self, name, content, max_length=None):
+        if name is None:
+            name = content.name
+        if not hasattr(content, 'chunks'):
+            content = File(content, name)
+        validate_file_name(name, allow_relative_path=True)
+
+        name = self.hashed_name(name, content)
+        if not self.exists(name):
+            name = self._save(name, content)
+        return name
+
+    def delete(self, name):
+        # Content-addressed files can be shared by several products, so only
+        # delete names that nothing references any more
+        if not self.is_referenced(name):
+            super().delete(name)
+
+    def is_referenced(self, name):
+        """True if a product's image or one of its derivatives is stored under name"""
+        from products.models import Product
+
+        return Product.objects.filter(
+            Q(image=name) | Q(image_derivatives__icontains=name)
+        ).exists()
+
+
+class HashedFileSystemStorage(ContentHashStorageMixin, FileSystemStorage):
+    """Content-addressed media on the local filesystem"""
+
+
+class MediaStorage(ContentHashStorageMixin, S3Boto3Storage):
     """Custom storage for media files ONLY"""
     location = 'media'
     default_acl = None
-    file_overwrite = False
-    
-    def __init__(self, *args, **kwargs):
-        super().__init__(*args, **kwargs)
-        print(f"MediaStorage initialized with location: {self.location}")
\ No newline at end of file
+    # Same name means same bytes, so rewriting an object is harmless
+    file_overwrite = True
+    # Signed URLs change on every call and defeat browser and CDN caching
+    querystring_auth = False
+    object_parameters = {'CacheControl': IMMUTABLE_CACHE_CONTROL}
@@ -0,0 +1,18 @@
+"""
+Gunicorn settings, loaded automatically from the working directory
+
+SERVER_MODE selects the serving profile and must match the application
+module named in the Procfile:
+
+- wsgi (default): threaded workers running wiesbaden_cyclery.wsgi. Live
+  order status streams each hold a thread, so workers need several
+  (GUNICORN_THREADS, above ORDER_EVENTS_MAX_CONNECTIONS)
+- asgi: uvicorn workers running wiesbaden_cyclery.asgi, which serve the
+  async AJAX views natively
+"""
+import os
+
+if os.environ.get('SERVER_MODE', 'wsgi') == 'asgi':
+    worker_class = 'uvicorn.workers.UvicornWorker'
+else:
+    threads = int(os.environ.get('GUNICORN_THREADS', 8))
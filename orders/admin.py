@@ -1,7 +1,21 @@
 from django.contrib import admin
+from django.http import StreamingHttpResponse
+from wiesbaden_cyclery.paginator import EstimatedCountPaginator
+from .exports import EXPORT_FORMATS, get_export_filename, get_export_queryset, stream_export
 from .models import Order, OrderLineItem
 
 
+def _export_response(queryset, export_format):
+    """Stream the selected orders' line items as a download"""
+    content_type = EXPORT_FORMATS[export_format][1]
+    response = StreamingHttpResponse(
+        stream_export(get_export_queryset(orders=queryset), export_format),
+        content_type=content_type
+    )
+    response['Content-Disposition'] = f'attachment; filename="{get_export_filename(export_format)}"'
+    return response
+
+
 class OrderLineItemAdminInline(admin.TabularInline):
     """Inline admin for order line items"""
     model = OrderLineItem
@@ -41,6 +55,11 @@ class OrderAdmin(admin.ModelAdmin):
     
     ordering = ('-date',)
 
+    actions = ('export_csv', 'export_ndjson')
+
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
+
     def order_total_display(self, obj):
         """Display formatted order total"""
         return f"€{obj.order_total:.2f}"
@@ -61,8 +80,19 @@ class OrderAdmin(admin.ModelAdmin):
 
     def total_items_display(self, obj):
         """Display total number of items"""
-        return obj.total_items
+        return obj.item_count
     total_items_display.short_description = "Items"
+    total_items_display.admin_order_field = 'item_count'
+
+    def export_csv(self, request, queryset):
+        """Download selected orders with their line items as CSV"""
+        return _export_response(queryset, 'csv')
+    export_csv.short_description = "Export selected orders (CSV)"
+
+    def export_ndjson(self, request, queryset):
+        """Download selected orders with their line items as NDJSON"""
+        return _export_response(queryset, 'ndjson')
+    export_ndjson.short_description = "Export selected orders (NDJSON)"
 
     def get_readonly_fields(self, request, obj=None):
         """Make certain fields readonly after order creation"""
@@ -79,6 +109,9 @@ class OrderLineItemAdmin(admin.ModelAdmin):
     list_filter = ('order__date', 'product__category')
     search_fields = ('order__order_number', 'product__name', 'product__sku')
     readonly_fields = ('lineitem_total',)
+    list_select_related = ('order', 'product', 'size')
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
 
     def lineitem_total_display(self, obj):
         """Display formatted line item total"""
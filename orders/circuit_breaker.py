@@ -0,0 +1,175 @@
+"""
+Circuit breaker for payment gateway calls
+
+When Stripe is slow or failing, every checkout request would otherwise wait
+for timeouts and tie up a worker. After ``failure_threshold`` failures within
+``failure_window`` seconds the circuit opens and calls fail fast with
+``CircuitOpenError`` for ``reset_timeout`` seconds. Then a single probe call
+is let through (half-open): success closes the circuit, failure re-opens it.
+
+State is kept in the Django cache so all workers sharing that cache see the
+same circuit. Configure ``STRIPE_CIRCUIT_CACHE`` with a shared backend
+(Redis, Memcached or database cache) in multi-process deployments.
+"""
+import logging
+import time
+
+import stripe
+from django.core.cache import caches
+
+from .payment_gateway import PaymentGateway
+
+logger = logging.getLogger(__name__)
+
+CLOSED = 'closed'
+OPEN = 'open'
+HALF_OPEN = 'half_open'
+
+# Errors that indicate the gateway itself is unhealthy. Card declines and
+# invalid requests are normal responses and never trip the circuit.
+GATEWAY_FAILURES = (
+    stripe.error.APIConnectionError,
+    stripe.error.APIError,
+    stripe.error.RateLimitError,
+)
+
+
+class CircuitOpenError(stripe.error.StripeError):
+    """Raised instead of calling the gateway while the circuit is open"""
+
+    def __init__(self, name, retry_after):
+        super().__init__(
+            f"Circuit '{name}' is open; retry in {retry_after}s",
+            http_status=503,
+            code='payment_service_unavailable',
+        )
+        self.retry_after = retry_after
+
+
+class CircuitBreaker:
+    """
+    Circuit breaker with state shared across workers through the cache
+    """
+
+    def __init__(self, name, failure_threshold=5, failure_window=60, reset_timeout=30,
+                 cache_alias='default', failures=GATEWAY_FAILURES):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.failure_window = failure_window
+        self.reset_timeout = reset_timeout
+        self.cache = caches[cache_alias]
+        self.failures = failures
+
+        prefix = f'circuit_{name}_'
+        self.failures_key = f'{prefix}failures'
+        self.opened_key = f'{prefix}opened_at'
+        self.probe_key = f'{prefix}probe'
+
+    @property
+    def state(self):
+        """Current state: 'closed', 'open' or 'half_open'"""
+        opened_at = self.cache.get(self.opened_key)
+        if opened_at is None:
+            return CLOSED
+        if time.time() - opened_at < self.reset_timeout:
+            return OPEN
+        return HALF_OPEN
+
+    def call(self, func, *args, **kwargs):
+        """Call ``func`` through the breaker"""
+        probing = self._before_call()
+        try:
+            result = func(*args, **kwargs)
+        except self.failures:
+            self._record_failure(probing)
+            raise
+        except Exception:
+            # Other errors mean the gateway answered; only release the probe
+            if probing:
+                self._close()
+            raise
+        if probing:
+            self._close()
+        return result
+
+    def _before_call(self):
+        """Raise CircuitOpenError unless the call may proceed; return True for a probe"""
+        opened_at = self.cache.get(self.opened_key)
+        if opened_at is None:
+            return False
+
+        elapsed = time.time() - opened_at
+        if elapsed < self.reset_timeout:
+            raise CircuitOpenError(self.name, max(1, int(self.reset_timeout - elapsed)))
+
+        # Half-open: let exactly one worker probe the gateway
+        if self.cache.add(self.probe_key, True, self.reset_timeout):
+            logger.info(f"Circuit '{self.name}' half-open, probing gateway")
+            return True
+        raise CircuitOpenError(self.name, 1)
+
+    def _record_failure(self, probing):
+        if probing:
+            self._open()
+            return
+
+        self.cache.add(self.failures_key, 0, self.failure_window)
+        try:
+            failures = self.cache.incr(self.failures_key)
+        except ValueError:
+            # Key expired between add() and incr()
+            failures = 1
+            self.cache.set(self.failures_key, failures, self.failure_window)
+
+        if failures >= self.failure_threshold:
+            self._open()
+
+    def _open(self):
+        logger.error(f"Circuit '{self.name}' opened; failing fast for {self.reset_timeout}s")
+        self.cache.set(self.opened_key, time.time(), None)
+        self.cache.delete_many([self.failures_key, self.probe_key])
+
+    def _close(self):
+        logger.info(f"Circuit '{self.name}' closed")
+        self.cache.delete_many([self.opened_key, self.failures_key, self.probe_key])
+
+    def reset(self):
+        """Close the circuit and forget recorded failures"""
+        self._close()
+
+
+class CircuitBreakerGateway(PaymentGateway):
+    """
+    Gateway wrapper routing every API call through a circuit breaker
+
+    Webhook signature verification is local and bypasses the breaker.
+    Other attributes are delegated to the wrapped gateway.
+    """
+
+    def __init__(self, gateway, breaker):
+        self.gateway = gateway
+        self.breaker = breaker
+
+    def __getattr__(self, name):
+        return getattr(self.gateway, name)
+
+    def create_intent(self, amount, currency, metadata=None, **params):
+        return self.breaker.call(self.gateway.create_intent, amount, currency, metadata, **params)
+
+    def retrieve_intent(self, intent_id):
+        return self.breaker.call(self.gateway.retrieve_intent, intent_id)
+
+    def modify_intent(self, intent_id, **params):
+        return self.breaker.call(self.gateway.modify_intent, intent_id, **params)
+
+    def confirm_intent(self, intent_id, payment_method=None):
+        return self.breaker.call(self.gateway.confirm_intent, intent_id, payment_method)
+
+    def cancel_intent(self, intent_id, cancellation_reason=None):
+        return self.breaker.call(self.gateway.cancel_intent, intent_id, cancellation_reason)
+
+    def construct_event(self, payload, sig_header):
+        return self.gateway.construct_event(payload, sig_header)
+
+    def retrieve_account(self):
+        return self.breaker.call(self.gateway.retrieve_account)
@@ -5,6 +5,7 @@ from django.core.mail import send_mail
 from django.template.loader import render_to_string
 from django.conf import settings
 from django.contrib.sites.models import Site
+from .summary import OrderSummary
 import logging
 
 logger = logging.getLogger(__name__)
@@ -19,9 +20,10 @@ def send_order_confirmation_email(order):
         current_site = Site.objects.get_current()
         site_url = f"https://{current_site.domain}" if not settings.DEBUG else f"http://{current_site.domain}:8000"
         
-        # Email context
+        # Email context; both templates render the same prefetched items
         context = {
             'order': order,
+            'items': OrderSummary(order).items,
             'site_url': site_url,
         }
         
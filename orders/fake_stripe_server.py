@@ -0,0 +1,149 @@
+"""
+Tiny local HTTP stand-in for the Stripe API
+
+Serves the payment intent endpoints used by the shop from a ``FakeGateway``
+so ``StripeGateway`` (and its pooled HTTP client) can be exercised end to end
+without network access. Point ``STRIPE_API_BASE`` at the server, e.g.::
+
+    python manage.py run_fake_stripe --port 12111
+    STRIPE_API_BASE=http://127.0.0.1:12111 gunicorn wiesbaden_cyclery.wsgi
+"""
+import json
+import logging
+import re
+import sys
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qsl, urlparse
+
+import stripe
+
+from .payment_gateway import FakeGateway
+
+logger = logging.getLogger(__name__)
+
+INTENT_PATH = re.compile(r'^/v1/payment_intents/(?P<id>[^/]+)(?P<action>/confirm|/cancel)?$')
+
+
+def parse_form(body):
+    """
+    Decode a Stripe form-encoded body into a dict
+
+    Handles the one level of nesting the shop sends, e.g. ``metadata[cart_id]``.
+    """
+    params = {}
+    for key, value in parse_qsl(body, keep_blank_values=True):
+        match = re.match(r'^(\w+)\[(\w+)\]$', key)
+        if match:
+            params.setdefault(match.group(1), {})[match.group(2)] = value
+        else:
+            params[key] = value
+    return params
+
+
+class FakeStripeRequestHandler(BaseHTTPRequestHandler):
+    """Request handler translating Stripe API calls into FakeGateway calls"""
+
+    protocol_version = 'HTTP/1.1'  # keep-alive, like the real API
+
+    @property
+    def gateway(self):
+        return self.server.gateway
+
+    def log_message(self, format, *args):
+        logger.debug(format, *args)
+
+    def _send_json(self, status, data):
+        body = json.dumps(data).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.send_header('Request-Id', 'req_fake')
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _send_error(self, error):
+        payload = (error.json_body or {}).get('error') or {
+            'type': 'invalid_request_error',
+            'code': error.code,
+            'message': error.user_message or str(error),
+        }
+        if isinstance(error, stripe.error.CardError):
+            payload.setdefault('type', 'card_error')
+        self._send_json(error.http_status or 400, {'error': payload})
+
+    def _read_params(self):
+        length = int(self.headers.get('Content-Length') or 0)
+        return parse_form(self.rfile.read(length).decode('utf-8')) if length else {}
+
+    def _dispatch(self, method):
+        path = urlparse(self.path).path
+        params = self._read_params() if method == 'POST' else {}
+        try:
+            if path == '/v1/account' and method == 'GET':
+                return self._send_json(200, self.gateway.retrieve_account().to_dict_recursive())
+
+            if path == '/v1/payment_intents' and method == 'POST':
+                metadata = params.pop('metadata', None)
+                params.pop('automatic_payment_methods', None)
+                amount = int(params.pop('amount'))
+                currency = params.pop('currency', 'eur')
+                intent = self.gateway.create_intent(amount, currency, metadata=metadata)
+                return self._send_json(200, intent.to_dict_recursive())
+
+            match = INTENT_PATH.match(path)
+            if match:
+                intent_id, action = match.group('id'), match.group('action')
+                if method == 'GET' and not action:
+                    intent = self.gateway.retrieve_intent(intent_id)
+                elif method == 'POST' and action == '/confirm':
+                    intent = self.gateway.confirm_intent(intent_id, params.get('payment_method'))
+                elif method == 'POST' and action == '/cancel':
+                    intent = self.gateway.cancel_intent(intent_id, params.get('cancellation_reason'))
+                elif method == 'POST':
+                    if 'amount' in params:
+                        params['amount'] = int(params['amount'])
+                    intent = self.gateway.modify_intent(intent_id, **params)
+                else:
+                    return self._send_json(405, {'error': {'type': 'invalid_request_error'}})
+                return self._send_json(200, intent.to_dict_recursive())
+
+            self._send_json(404, {'error': {
+                'type': 'invalid_request_error',
+                'message': f'Unrecognized request URL ({method}: {path})',
+            }})
+        except stripe.error.StripeError as e:
+            self._send_error(e)
+
+    def do_GET(self):
+        self._dispatch('GET')
+
+    def do_POST(self):
+        self._dispatch('POST')
+
+
+class FakeStripeServer(ThreadingHTTPServer):
+    """Threaded HTTP server holding the FakeGateway state"""
+
+    daemon_threads = True
+
+    def __init__(self, address=('127.0.0.1', 0), gateway=None):
+        self.gateway = gateway or FakeGateway()
+        super().__init__(address, FakeStripeRequestHandler)
+
+    def handle_error(self, request, client_address):
+        # Clients that timed out hang up before the response is written
+        if isinstance(sys.exc_info()[1], (BrokenPipeError, ConnectionResetError)):
+            return
+        super().handle_error(request, client_address)
+
+    @property
+    def url(self):
+        host, port = self.server_address[:2]
+        return f'http://{host}:{port}'
+
+    def start(self):
+        """Serve in a background thread and return the base URL"""
+        thread = threading.Thread(target=self.serve_forever, daemon=True)
+        thread.start()
+        return self.url
@@ -0,0 +1,205 @@
+"""
+Management command to compare WSGI and ASGI throughput for the AJAX endpoints
+"""
+import asyncio
+import io
+import logging
+import statistics
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.contrib.sessions.backends.db import SessionStore
+from django.core.asgi import get_asgi_application
+from django.core.management.base import BaseCommand
+from django.core.wsgi import get_wsgi_application
+from django.urls import reverse
+
+from orders.models import Order
+from products.models import Product
+from shopping_cart.models import Cart
+
+
+def _endpoints():
+    order = Order.objects.only('order_number').first()
+    return {
+        'cart_summary': reverse('shopping_cart:ajax_cart_summary'),
+        'checkout_summary': reverse('orders:ajax_checkout_summary'),
+        'order_status': reverse(
+            'orders:ajax_order_status', args=[order.order_number if order else 'missing']
+        ),
+    }
+
+
+def _host():
+    hosts = [host for host in settings.ALLOWED_HOSTS if host and '*' not in host]
+    return (hosts or ['localhost'])[0].lstrip('.')
+
+
+class WSGIClient:
+    """Call the WSGI application from a pool of threads, like gthread workers"""
+
+    def __init__(self, host, cookie=''):
+        self.app = get_wsgi_application()
+        self.host = host
+        self.cookie = cookie
+
+    def request(self, path):
+        environ = {
+            'REQUEST_METHOD': 'GET',
+            'PATH_INFO': path,
+            'QUERY_STRING': '',
+            'SERVER_NAME': self.host,
+            'SERVER_PORT': '80',
+            'SERVER_PROTOCOL': 'HTTP/1.1',
+            'HTTP_HOST': self.host,
+            'HTTP_COOKIE': self.cookie,
+            'REMOTE_ADDR': '127.0.0.1',
+            'wsgi.input': io.BytesIO(),
+            'wsgi.errors': sys.stderr,
+            'wsgi.url_scheme': 'http',
+            'wsgi.multithread': True,
+            'wsgi.multiprocess': False,
+            'wsgi.run_once': False,
+            'wsgi.version': (1, 0),
+        }
+        status = []
+        body = self.app(environ, lambda s, headers, exc_info=None: status.append(s))
+        try:
+            for _ in body:
+                pass
+        finally:
+            body.close()
+        return int(status[0].split()[0])
+
+    def run(self, path, requests, concurrency):
+        def timed(_):
+            started = time.perf_counter()
+            status = self.request(path)
+            return status, time.perf_counter() - started
+
+        with ThreadPoolExecutor(max_workers=concurrency) as executor:
+            return list(executor.map(timed, range(requests)))
+
+
+class ASGIClient:
+    """Call the ASGI application from concurrent tasks on one event loop"""
+
+    def __init__(self, host, cookie=''):
+        self.app = get_asgi_application()
+        self.host = host
+        self.cookie = cookie
+
+    async def request(self, path):
+        scope = {
+            'type': 'http',
+            'asgi': {'version': '3.0'},
+            'http_version': '1.1',
+            'method': 'GET',
+            'scheme': 'http',
+            'path': path,
+            'raw_path': path.encode(),
+            'query_string': b'',
+            'headers': [(b'host', self.host.encode()), (b'cookie', self.cookie.encode())],
+            'server': (self.host, 80),
+            'client': ('127.0.0.1', 0),
+        }
+        status = []
+
+        async def receive():
+            return {'type': 'http.request', 'body': b'', 'more_body': False}
+
+        async def send(message):
+            if message['type'] == 'http.response.start':
+                status.append(message['status'])
+
+        await self.app(scope, receive, send)
+        return status[0]
+
+    def run(self, path, requests, concurrency):
+        async def main():
+            semaphore = asyncio.Semaphore(concurrency)
+
+            async def timed():
+                async with semaphore:
+                    started = time.perf_counter()
+                    status = await self.request(path)
+                    return status, time.perf_counter() - started
+
+            return await asyncio.gather(*(timed() for _ in range(requests)))
+
+        return asyncio.run(main())
+
+
+class Command(BaseCommand):
+    help = 'Measure concurrent throughput of the AJAX endpoints under WSGI and ASGI'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--requests',
+            type=int,
+            default=500,
+            help='Requests per endpoint and server mode (default: 500)',
+        )
+        parser.add_argument(
+            '--concurrency',
+            type=int,
+            default=32,
+            help='Concurrent connections (default: 32)',
+        )
+        parser.add_argument(
+            '--endpoint',
+            action='append',
+            choices=['cart_summary', 'checkout_summary', 'order_status'],
+            help='Endpoint to benchmark; repeat for several (default: all)',
+        )
+
+    def handle(self, *args, **options):
+        self.stdout.write(self.style.SUCCESS('=== Async View Benchmark ==='))
+        self.stdout.write(
+            f'{options["requests"]} requests per run, {options["concurrency"]} concurrent connections'
+        )
+        endpoints = _endpoints()
+        host = _host()
+        session, cart = self.create_shopper()
+        cookie = f'{settings.SESSION_COOKIE_NAME}={session.session_key}'
+        clients = {'wsgi': WSGIClient(host, cookie), 'asgi': ASGIClient(host, cookie)}
+        # After the handlers' django.setup(): 404s and 400s are expected when
+        # there are no orders or products
+        logging.getLogger('django.request').setLevel(logging.CRITICAL)
+
+        try:
+            for name in options['endpoint'] or endpoints:
+                self.stdout.write(f'\n{name} ({endpoints[name]})')
+                for mode, client in clients.items():
+                    # One warm-up request per mode loads URLconf, templates and connections
+                    client.run(endpoints[name], 1, 1)
+                    started = time.perf_counter()
+                    results = client.run(endpoints[name], options['requests'], options['concurrency'])
+                    elapsed = time.perf_counter() - started
+                    self.report(mode, results, elapsed)
+        finally:
+            cart.delete()
+            session.delete()
+
+    def create_shopper(self):
+        """A returning anonymous shopper: a session with one item in the cart"""
+        session = SessionStore()
+        session.create()
+        cart = Cart.objects.create(session_key=session.session_key)
+        product = Product.objects.filter(in_stock=True).first()
+        if product:
+            cart.items.create(product=product, quantity=1)
+        return session, cart
+
+    def report(self, mode, results, elapsed):
+        latencies = sorted(latency for _, latency in results)
+        statuses = sorted({status for status, _ in results})
+        p95 = latencies[int(len(latencies) * 0.95) - 1] if latencies else 0
+        self.stdout.write(
+            f'  {mode}: {len(results) / elapsed:8.1f} req/s'
+            f'  p50 {statistics.median(latencies) * 1000:6.1f} ms'
+            f'  p95 {p95 * 1000:6.1f} ms'
+            f'  status {",".join(map(str, statuses))}'
+        )
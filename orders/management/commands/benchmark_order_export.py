@@ -0,0 +1,152 @@
+"""
+Management command to benchmark the streaming order export
+"""
+import os
+import time
+import tracemalloc
+from decimal import Decimal
+
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+
+from orders.exports import EXPORT_CHUNK_SIZE, EXPORT_FORMATS, get_export_queryset, stream_export
+from orders.models import Order, OrderLineItem
+from products.models import Category, Product
+
+BENCHMARK_PREFIX = 'BENCH'
+BENCHMARK_PRODUCT = 'Benchmark Product'
+BENCHMARK_CATEGORY = 'benchmark'
+
+
+class Command(BaseCommand):
+    help = 'Seed synthetic orders and measure export throughput and peak memory'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--line-items',
+            type=int,
+            default=1000000,
+            help='Number of line items to seed (default: 1,000,000)',
+        )
+        parser.add_argument(
+            '--items-per-order',
+            type=int,
+            default=5,
+            help='Line items per synthetic order (default: 5)',
+        )
+        parser.add_argument(
+            '--chunk-size',
+            type=int,
+            default=EXPORT_CHUNK_SIZE,
+            help=f'Export chunk size (default: {EXPORT_CHUNK_SIZE})',
+        )
+        parser.add_argument(
+            '--trace-memory',
+            action='store_true',
+            help='Report peak Python memory with tracemalloc (slows the export down)',
+        )
+        parser.add_argument(
+            '--keep',
+            action='store_true',
+            help='Keep the synthetic orders instead of deleting them afterwards',
+        )
+
+    def handle(self, *args, **options):
+        self.stdout.write(self.style.SUCCESS('=== Order Export Benchmark ==='))
+
+        if not Order.objects.filter(order_number__startswith=BENCHMARK_PREFIX).exists():
+            self.seed(options['line_items'], options['items_per_order'])
+        else:
+            self.stdout.write('Reusing existing benchmark orders')
+
+        orders = Order.objects.filter(order_number__startswith=BENCHMARK_PREFIX)
+        queryset = get_export_queryset(orders=orders)
+
+        try:
+            for export_format in sorted(EXPORT_FORMATS):
+                self.run_export(queryset, export_format, options['chunk_size'], options['trace_memory'])
+        finally:
+            if not options['keep']:
+                self.cleanup()
+
+    def seed(self, line_items, items_per_order):
+        category, _ = Category.objects.get_or_create(
+            name=BENCHMARK_CATEGORY, defaults={'friendly_name': 'Benchmark'}
+        )
+        product, _ = Product.objects.get_or_create(
+            name=BENCHMARK_PRODUCT,
+            defaults={'category': category, 'price': Decimal('19.99'), 'stock_quantity': 0, 'in_stock': False},
+        )
+
+        self.stdout.write(f'Seeding {line_items} line items...')
+        started = time.monotonic()
+        order_count = -(-line_items // items_per_order)
+        batch_size = 5000
+
+        # bulk_create skips the per-item order total signals on purpose
+        for offset in range(0, order_count, batch_size):
+            with transaction.atomic():
+                orders = Order.objects.bulk_create([
+                    Order(
+                        order_number=f'{BENCHMARK_PREFIX}{number:027d}',
+                        full_name=f'Benchmark Customer {number}',
+                        email='benchmark@example.com',
+                        street_address1='Benchmark Street 1',
+                        town_or_city='Wiesbaden',
+                        country='DE',
+                        order_total=Decimal('99.95'),
+                        grand_total=Decimal('99.95'),
+                        item_count=items_per_order,
+                        status='delivered',
+                    )
+                    for number in range(offset, min(offset + batch_size, order_count))
+                ])
+                if not orders[0].pk:
+                    orders = list(Order.objects.filter(
+                        order_number__in=[order.order_number for order in orders]
+                    ))
+                OrderLineItem.objects.bulk_create([
+                    OrderLineItem(order=order, product=product, quantity=1, lineitem_total=product.price)
+                    for order in orders
+                    for _ in range(items_per_order)
+                ])
+
+        self.stdout.write(f'Seeded in {time.monotonic() - started:.1f}s')
+
+    def run_export(self, queryset, export_format, chunk_size, trace_memory):
+        if trace_memory:
+            tracemalloc.start()
+        started = time.monotonic()
+        count = 0
+        with open(os.devnull, 'w') as output:
+            for line in stream_export(queryset, export_format, chunk_size):
+                output.write(line)
+                count += 1
+        elapsed = time.monotonic() - started
+
+        if export_format == 'csv':
+            count -= 1  # header
+        result = f'{export_format}: {count} rows in {elapsed:.1f}s ({count / elapsed:.0f} rows/s)'
+        if trace_memory:
+            result += f', peak Python memory {tracemalloc.get_traced_memory()[1] / 1024 / 1024:.1f} MB'
+            tracemalloc.stop()
+        self.stdout.write(result)
+
+    def cleanup(self):
+        self.stdout.write('Deleting benchmark orders and product...')
+        order_table = Order._meta.db_table
+        benchmark_orders = (
+            f"SELECT id FROM {order_table} WHERE order_number LIKE %s"
+        )
+        # Raw deletes avoid loading a million line items through the collector
+        with transaction.atomic(), connection.cursor() as cursor:
+            cursor.execute(
+                f'DELETE FROM {OrderLineItem._meta.db_table} WHERE order_id IN ({benchmark_orders})',
+                [f'{BENCHMARK_PREFIX}%']
+            )
+            cursor.execute(
+                f'DELETE FROM {order_table} WHERE order_number LIKE %s',
+                [f'{BENCHMARK_PREFIX}%']
+            )
+            Product.objects.filter(name=BENCHMARK_PRODUCT, category__name=BENCHMARK_CATEGORY).delete()
+            Category.objects.filter(name=BENCHMARK_CATEGORY, product__isnull=True).delete()
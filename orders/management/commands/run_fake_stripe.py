@@ -0,0 +1,44 @@
+from django.core.management.base import BaseCommand
+from orders.fake_stripe_server import FakeStripeServer
+from orders.payment_gateway import FakeGateway
+
+
+class Command(BaseCommand):
+    help = 'Run a local Stripe API stand-in for offline checkout and load testing'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--host',
+            default='127.0.0.1',
+            help='Interface to listen on (default: 127.0.0.1)',
+        )
+        parser.add_argument(
+            '--port',
+            type=int,
+            default=12111,
+            help='Port to listen on (default: 12111)',
+        )
+        parser.add_argument(
+            '--latency',
+            type=float,
+            default=0,
+            help='Seconds of simulated latency added to every API call',
+        )
+
+    def handle(self, *args, **options):
+        gateway = FakeGateway(latency=options['latency'])
+        server = FakeStripeServer((options['host'], options['port']), gateway=gateway)
+
+        self.stdout.write(self.style.SUCCESS(f'=== Fake Stripe API listening on {server.url} ==='))
+        self.stdout.write('Point the shop at it with:')
+        self.stdout.write(f'  STRIPE_API_BASE={server.url}')
+        self.stdout.write(f'  STRIPE_WH_SECRET={gateway.webhook_secret}')
+        self.stdout.write('Confirm intents with test payment methods, e.g.:')
+        self.stdout.write(f'  curl -X POST {server.url}/v1/payment_intents/<id>/confirm -d payment_method=pm_card_visa')
+
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            self.stdout.write('\nShutting down')
+        finally:
+            server.server_close()
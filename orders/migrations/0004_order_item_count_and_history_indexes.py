@@ -0,0 +1,39 @@
+# Generated by Django 3.2.25 on 2026-10-19 05:30
+
+from django.db import migrations, models
+from django.db.models import OuterRef, Subquery, Sum
+from django.db.models.functions import Coalesce
+
+
+def backfill_item_counts(apps, schema_editor):
+    """Store each existing order's unit count in one UPDATE"""
+    Order = apps.get_model('orders', 'Order')
+    OrderLineItem = apps.get_model('orders', 'OrderLineItem')
+    quantities = OrderLineItem.objects.filter(
+        order=OuterRef('pk')
+    ).order_by().values('order').annotate(total=Sum('quantity')).values('total')
+    Order.objects.update(item_count=Coalesce(Subquery(quantities), 0))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('orders', '0003_alter_orderlineitem_lineitem_total'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='order',
+            name='item_count',
+            field=models.PositiveIntegerField(default=0, editable=False, help_text='Units across all line items, kept by update_total'),
+        ),
+        migrations.RunPython(backfill_item_counts, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='order',
+            index=models.Index(fields=['user_profile', '-date'], name='order_profile_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='order',
+            index=models.Index(fields=['order_number'], name='order_number_prefix_idx', opclasses=['varchar_pattern_ops']),
+        ),
+    ]
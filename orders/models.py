@@ -1,5 +1,5 @@
 import uuid
-from django.db import models
+from django.db import models, transaction
 from django.contrib.auth.models import User
 from django.core.validators import MinValueValidator
 from decimal import Decimal
@@ -7,11 +7,100 @@ from django_countries.fields import CountryField
 from products.models import Product, Size
 
 
-class Order(models.Model):
+class _UncommittedValues:
+    """Tracked values saved in a transaction that hasn't committed yet"""
+
+    def __init__(self, values):
+        self.values = values
+        self.committed = False
+
+    def __call__(self):
+        # Runs as the transaction's on_commit callback
+        self.committed = True
+
+
+class TrackedFieldsMixin:
+    """
+    Remember the stored values of ``tracked_fields``
+
+    Values are taken when an instance is loaded or refreshed from the
+    database and after each save, so a change can be detected without
+    reading the row. Values saved inside a transaction count once it
+    commits; if the transaction ends without committing them they are
+    forgotten again.
+    """
+    tracked_fields = ()
+    _stored_values = {}
+    _uncommitted = ()
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        instance._stored_values = instance._tracked_values()
+        return instance
+
+    def refresh_from_db(self, using=None, fields=None):
+        super().refresh_from_db(using=using, fields=fields)
+        refreshed = self._tracked_values(fields)
+        self._stored_values = {**self._stored_values, **refreshed}
+        for saved in self._settle():
+            saved.values = {field: value for field, value in saved.values.items() if field not in refreshed}
+
+    def save(self, *args, **kwargs):
+        super().save(*args, **kwargs)
+        values = self._tracked_values(kwargs.get('update_fields'))
+        if transaction.get_connection(self._state.db).in_atomic_block:
+            saved = _UncommittedValues(values)
+            transaction.on_commit(saved, using=self._state.db)
+            self._uncommitted = [*self._settle(), saved]
+        else:
+            self._stored_values = {**self._stored_values, **values}
+
+    def _tracked_values(self, fields=None):
+        if fields is None:
+            fields = self.tracked_fields
+        return {field: self.__dict__[field] for field in self.tracked_fields
+                if field in fields and field in self.__dict__}
+
+    def _settle(self):
+        """
+        Fold committed saves into the stored values and drop rolled back ones
+
+        Each save's commit callback sets its ``committed`` flag. A save whose
+        flag is still unset once the transaction has ended was rolled back.
+        Returns the saves still waiting for a commit.
+        """
+        if not self._uncommitted:
+            return []
+        in_transaction = transaction.get_connection(self._state.db).in_atomic_block
+        pending = []
+        for saved in self._uncommitted:
+            if saved.committed:
+                self._stored_values = {**self._stored_values, **saved.values}
+            elif in_transaction:
+                pending.append(saved)
+        self._uncommitted = pending
+        return pending
+
+    def stored_value(self, field):
+        """
+        The field's value as last loaded, refreshed or saved
+
+        Raises KeyError if it isn't known, e.g. the field was deferred.
+        """
+        for saved in reversed(self._settle()):
+            if field in saved.values:
+                return saved.values[field]
+        return self._stored_values[field]
+
+
+class Order(TrackedFieldsMixin, models.Model):
     """
     Order model for managing customer orders
     """
     
+    tracked_fields = ('status',)
+    
     # Order Status Choices
     STATUS_CHOICES = [
         ('pending', 'Pending'),
@@ -66,6 +155,11 @@ class Order(models.Model):
         default=0,
         validators=[MinValueValidator(0)]
     )
+    item_count = models.PositiveIntegerField(
+        default=0,
+        editable=False,
+        help_text="Units across all line items, kept by update_total"
+    )
     
     # Order status and tracking
     status = models.CharField(
@@ -101,6 +195,16 @@ class Order(models.Model):
         ordering = ['-date']
         verbose_name = 'Order'
         verbose_name_plural = 'Orders'
+        indexes = [
+            # Order history: one customer's orders by date
+            models.Index(fields=['user_profile', '-date'], name='order_profile_date_idx'),
+            # Order number prefix search; the unique index can't serve LIKE
+            # under a non-C collation on PostgreSQL
+            models.Index(
+                fields=['order_number'], name='order_number_prefix_idx',
+                opclasses=['varchar_pattern_ops']
+            ),
+        ]
 
     def _generate_order_number(self):
         """
@@ -110,12 +214,14 @@ class Order(models.Model):
 
     def update_total(self):
         """
-        Update grand total each time a line item is added,
+        Update grand total and item count each time a line item is added,
         accounting for delivery costs.
         """
-        self.order_total = self.lineitems.aggregate(
-            models.Sum('lineitem_total')
-        )['lineitem_total__sum'] or 0
+        totals = self.lineitems.aggregate(
+            models.Sum('lineitem_total'), models.Sum('quantity')
+        )
+        self.order_total = totals['lineitem_total__sum'] or 0
+        self.item_count = totals['quantity__sum'] or 0
         
         # Calculate delivery cost - free delivery over €50
         if self.order_total >= Decimal('50.00'):
@@ -140,8 +246,8 @@ class Order(models.Model):
 
     @property
     def total_items(self):
-        """Calculate total number of items in order"""
-        return sum(item.quantity for item in self.lineitems.all())
+        """Total number of items in order"""
+        return self.item_count
 
     def get_status_display_badge(self):
         """Return Bootstrap badge class for order status"""
@@ -0,0 +1,179 @@
+"""
+Live order status events
+
+Status changes are published from the order signal into an in-process
+pub/sub and streamed to customers as server-sent events.
+
+Subscribers only hear changes made in their own worker. Streams also re-read
+the order's status from the database on each heartbeat, so a change made on
+another worker arrives within one heartbeat.
+
+A stream can stay open for minutes, so it doesn't hold a database
+connection between heartbeats: the view closes its connection before
+streaming starts and each heartbeat's read closes it again.
+
+The stream's event id is the order status. A client that reconnects with
+Last-Event-ID set to the current status is not sent the status again.
+"""
+import json
+import queue
+import threading
+import time
+from collections import defaultdict
+
+from django.conf import settings
+from django.db import connection
+
+from .models import Order
+
+FINAL_STATUSES = frozenset(['delivered', 'cancelled'])
+SUBSCRIBER_QUEUE_SIZE = 10
+
+
+class OrderStatusBroker:
+    """
+    In-process pub/sub of order status events, keyed by order number
+
+    Also counts open streams so each worker can cap them.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._subscribers = defaultdict(set)
+        self.connections = 0
+
+    def acquire(self, limit):
+        """Reserve a stream slot; False if the worker is at its limit"""
+        with self._lock:
+            if self.connections >= limit:
+                return False
+            self.connections += 1
+            return True
+
+    def release(self):
+        with self._lock:
+            self.connections = max(0, self.connections - 1)
+
+    def subscribe(self, order_number):
+        subscriber = queue.Queue(maxsize=SUBSCRIBER_QUEUE_SIZE)
+        with self._lock:
+            self._subscribers[order_number].add(subscriber)
+        return subscriber
+
+    def unsubscribe(self, order_number, subscriber):
+        with self._lock:
+            subscribers = self._subscribers.get(order_number)
+            if subscribers is not None:
+                subscribers.discard(subscriber)
+                if not subscribers:
+                    del self._subscribers[order_number]
+
+    def publish(self, order_number, event):
+        with self._lock:
+            subscribers = list(self._subscribers.get(order_number, ()))
+        for subscriber in subscribers:
+            try:
+                subscriber.put_nowait(event)
+            except queue.Full:
+                # A stalled client only needs the latest status
+                pass
+        return len(subscribers)
+
+
+broker = OrderStatusBroker()
+
+
+def status_event(order_number, status, status_display, changed_at=0):
+    return {
+        'order_number': order_number,
+        'status': status,
+        'status_display': status_display,
+        'changed_at': changed_at,
+    }
+
+
+def publish_status(order_number, status, status_display):
+    """Announce an order's new status to streams in this worker"""
+    broker.publish(order_number, status_event(order_number, status, status_display, time.time()))
+
+
+def release_connection():
+    """Close this thread's database connection unless a transaction needs it"""
+    if not connection.in_atomic_block:
+        connection.close()
+
+
+def stored_status_event(order_number):
+    """Status event for the order as currently stored, or None if it's gone"""
+    read_at = time.time()
+    try:
+        status = Order.objects.filter(order_number=order_number).values_list('status', flat=True).first()
+    finally:
+        release_connection()
+    if status is None:
+        return None
+    return status_event(order_number, status, dict(Order.STATUS_CHOICES).get(status, status), read_at)
+
+
+def format_event(event):
+    return (
+        f'id: {event["status"]}\n'
+        f'event: status\n'
+        f'data: {json.dumps(event)}\n\n'
+    )
+
+
+class OrderStatusStream:
+    """
+    Iterable body of an order status event stream
+
+    Blocks its server thread between events, so each worker runs only
+    ``ORDER_EVENTS_MAX_CONNECTIONS`` at once. The slot taken by the view is
+    released by ``close()``, which the response calls even if the stream
+    never started.
+
+
+    Args:
+        order: The order, loaded at ``loaded_at`` (a time.time() value)
+        last_event_id: Last-Event-ID sent by a reconnecting client
+    """
+
+    def __init__(self, order, loaded_at, last_event_id=None, broker=broker):
+        self.current = status_event(
+            order.order_number, order.status, order.get_status_display(), loaded_at
+        )
+        self.last_event_id = last_event_id
+        self.broker = broker
+        self.subscriber = broker.subscribe(order.order_number)
+        self.closed = False
+
+    def __iter__(self):
+        heartbeat = settings.ORDER_EVENTS_HEARTBEAT
+        deadline = time.monotonic() + settings.ORDER_EVENTS_STREAM_TIMEOUT
+        order_number = self.current['order_number']
+
+        # Middleware may have reopened the connection after the view closed it
+        release_connection()
+        yield f'retry: {settings.ORDER_EVENTS_RETRY_MS}\n\n'
+        if self.last_event_id != self.current['status']:
+            yield format_event(self.current)
+
+        while self.current['status'] not in FINAL_STATUSES and time.monotonic() < deadline:
+            try:
+                event = self.subscriber.get(timeout=heartbeat)
+            except queue.Empty:
+                event = stored_status_event(order_number)
+
+            # A queued event may be older than a status already read
+            if event and event['changed_at'] >= self.current['changed_at'] \
+                    and event['status'] != self.current['status']:
+                self.current = event
+                yield format_event(event)
+            else:
+                yield ': heartbeat\n\n'
+
+    def close(self):
+        if not self.closed:
+            self.closed = True
+            self.broker.unsubscribe(self.current['order_number'], self.subscriber)
+            self.broker.release()
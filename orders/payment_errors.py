@@ -2,7 +2,10 @@
 Comprehensive payment error handling system
 """
 import logging
+from functools import lru_cache
+from types import MappingProxyType
 from django.conf import settings
+from django.core.cache import caches
 from django.core.mail import send_mail
 from django.template.loader import render_to_string
 from django.utils import timezone
@@ -27,7 +30,8 @@ ERROR_CATEGORIES = {
         'testmode_decline', 'transaction_not_allowed', 'try_again_later'
     ],
     'network_errors': [
-        'network_error', 'timeout', 'connection_error'
+        'network_error', 'timeout', 'connection_error',
+        'payment_service_unavailable'
     ],
     'api_errors': [
         'api_key_expired', 'missing', 'request_failed', 'rate_limit'
@@ -111,6 +115,11 @@ USER_FRIENDLY_MESSAGES = {
         'action': 'retry_payment',
         'severity': 'medium'
     },
+    'payment_service_unavailable': {
+        'message': 'Our payment provider is temporarily unavailable. Please try again in a minute.',
+        'action': 'wait_retry',
+        'severity': 'medium'
+    },
     
     # API errors
     'rate_limit': {
@@ -149,6 +158,119 @@ USER_FRIENDLY_MESSAGES = {
     }
 }
 
+# Recovery steps shown for each recovery action
+RECOVERY_INSTRUCTIONS = {
+    'try_different_card': [
+        "Try using a different credit or debit card",
+        "Ensure your card is activated and not expired",
+        "Contact your bank if you continue to have issues"
+    ],
+    'update_card': [
+        "Check your card expiration date",
+        "Use a card that hasn't expired",
+        "Contact your bank for a replacement card if needed"
+    ],
+    'retry_payment': [
+        "Double-check your card information",
+        "Try the payment again in a few minutes",
+        "Ensure you have a stable internet connection"
+    ],
+    'contact_bank': [
+        "Contact your card issuer or bank",
+        "Ask them to authorize the payment",
+        "Try again after speaking with your bank"
+    ],
+    'contact_support': [
+        "Contact our customer support team",
+        "Provide your order number for assistance",
+        "We'll help resolve the issue quickly"
+    ],
+    'wait_retry': [
+        "Wait a few minutes before trying again",
+        "Too many attempts were made recently",
+        "Contact support if the issue persists"
+    ],
+    'modify_cart': [
+        "Add more items to reach the minimum amount",
+        "Check our minimum order requirements",
+        "Contact support if you need assistance"
+    ]
+}
+
+# Codes whose instructions differ from the generic ones for their action
+RECOVERY_INSTRUCTIONS_BY_CODE = {
+    'payment_service_unavailable': [
+        "Wait a minute before trying again",
+        "Our payment provider is having a temporary outage",
+        "Your card has not been charged"
+    ],
+}
+
+# Lookup tables compiled once at import
+ERROR_CATEGORY_BY_CODE = {
+    code: category
+    for category, codes in ERROR_CATEGORIES.items()
+    for code in codes
+}
+CRITICAL_ERROR_CODES = frozenset(['api_key_expired', 'missing', 'fraudulent'])
+HIGH_ERROR_CODES = frozenset(['card_declined', 'insufficient_funds', 'lost_card', 'stolen_card'])
+CATEGORY_FALLBACK_MESSAGES = {
+    'card_errors': USER_FRIENDLY_MESSAGES['card_declined'],
+    'network_errors': USER_FRIENDLY_MESSAGES['network_error'],
+}
+RETRY_ACTIONS = frozenset(['retry_payment', 'wait_retry'])
+
+
+class PaymentErrorAggregator:
+    """
+    Collapse repeated identical payment errors into a counter
+
+    Occurrences of the same key are counted in the cache for ``window``
+    seconds. Callers write a record for the first occurrence and only touch
+    it again when the count reaches a power of two, so a burst of N
+    identical errors (e.g. card testing) costs O(log N) writes instead of N.
+    """
+
+    def __init__(self, prefix='payment_error_', window=None, cache_alias='default'):
+        self.prefix = prefix
+        self._window = window
+        self.cache_alias = cache_alias
+
+    @property
+    def window(self):
+        return self._window or settings.PAYMENT_ERROR_AGGREGATION_WINDOW
+
+    @property
+    def cache(self):
+        return caches[self.cache_alias]
+
+    def hit(self, key):
+        """Count one occurrence of ``key`` and return the count in the window"""
+        counter_key = f'{self.prefix}{key}'
+        self.cache.add(counter_key, 0, self.window)
+        try:
+            return self.cache.incr(counter_key)
+        except ValueError:
+            # Key expired between add() and incr()
+            self.cache.set(counter_key, 1, self.window)
+            return 1
+
+    @staticmethod
+    def should_flush(count):
+        """True for the first occurrence and every power of two after it"""
+        return count & (count - 1) == 0
+
+    def attach(self, key, record_id):
+        """Remember the record written for the first occurrence of ``key``"""
+        self.cache.set(f'{self.prefix}{key}_record', record_id, self.window)
+
+    def attached(self, key):
+        return self.cache.get(f'{self.prefix}{key}_record')
+
+
+error_aggregator = PaymentErrorAggregator()
+
+
 class PaymentErrorHandler:
     """
     Comprehensive payment error handling class
@@ -177,9 +299,12 @@ class PaymentErrorHandler:
         # Determine recovery action
         recovery_action = self._determine_recovery_action(error_info)
         
-        # Send notifications if critical
+        # Send notifications if critical, collapsing repeats of the same code
+        # across orders so an outage doesn't mail the admin once per error
         if error_info['severity'] == 'critical':
-            self._send_critical_error_notification(error_info, context)
+            occurrences = error_aggregator.hit(f"notify_{error_info['code']}")
+            if error_aggregator.should_flush(occurrences):
+                self._send_critical_error_notification(error_info, context, occurrences)
         
         return {
             'success': False,
@@ -188,7 +313,7 @@ class PaymentErrorHandler:
             'user_message': user_message['message'],
             'recovery_action': recovery_action,
             'severity': error_info['severity'],
-            'retry_allowed': recovery_action in ['retry_payment', 'wait_retry'],
+            'retry_allowed': recovery_action in RETRY_ACTIONS,
             'technical_details': error_info['technical_message'] if settings.DEBUG else None
         }
     
@@ -234,21 +359,15 @@ class PaymentErrorHandler:
         """
         Categorize error by type
         """
-        for category, codes in ERROR_CATEGORIES.items():
-            if error_code in codes:
-                return category
-        return 'unknown'
+        return ERROR_CATEGORY_BY_CODE.get(error_code, 'unknown')
     
     def _determine_severity(self, error_code, error_type):
         """
         Determine error severity
         """
-        critical_errors = ['api_key_expired', 'missing', 'fraudulent']
-        high_errors = ['card_declined', 'insufficient_funds', 'lost_card', 'stolen_card']
-        
-        if error_code in critical_errors:
+        if error_code in CRITICAL_ERROR_CODES:
             return 'critical'
-        elif error_code in high_errors:
+        elif error_code in HIGH_ERROR_CODES:
             return 'high'
         elif error_type == 'card_error':
             return 'medium'
@@ -259,19 +378,13 @@ class PaymentErrorHandler:
         """
         Get user-friendly error message
         """
-        error_code = error_info['code']
-        
-        if error_code in USER_FRIENDLY_MESSAGES:
-            return USER_FRIENDLY_MESSAGES[error_code]
-        else:
+        message = USER_FRIENDLY_MESSAGES.get(error_info['code'])
+        if message is None:
             # Try to match by category
-            category = error_info['category']
-            if category == 'card_errors':
-                return USER_FRIENDLY_MESSAGES['card_declined']
-            elif category == 'network_errors':
-                return USER_FRIENDLY_MESSAGES['network_error']
-            else:
-                return USER_FRIENDLY_MESSAGES['unknown']
+            message = CATEGORY_FALLBACK_MESSAGES.get(
+                error_info['category'], USER_FRIENDLY_MESSAGES['unknown']
+            )
+        return message
     
     def _determine_recovery_action(self, error_info):
         """
@@ -308,10 +421,25 @@ class PaymentErrorHandler:
     def _record_order_error(self, error_info, user_message):
         """
         Record error in order for tracking
+
+        Repeats of the same error on the same order within the aggregation
+        window only bump a counter on the first history entry.
         """
         if not self.order:
             return
         
+        key = f"{self.order.pk}_{error_info['code']}"
+        occurrences = error_aggregator.hit(key)
+        history_notes = f"Payment error: {error_info['code']} - {user_message['message']}"
+        
+        if occurrences > 1:
+            history_id = error_aggregator.attached(key)
+            if history_id and error_aggregator.should_flush(occurrences):
+                OrderStatusHistory.objects.filter(pk=history_id).update(
+                    notes=f"{history_notes} (repeated {occurrences} times)"
+                )
+            return
+        
         # Add error to order notes
         error_note = f"Payment Error [{error_info['timestamp'].strftime('%Y-%m-%d %H:%M:%S')}]: " \
                      f"{error_info['code']} - {error_info['message']}"
@@ -328,18 +456,21 @@ class PaymentErrorHandler:
         self.order.save()
         
         # Create status history entry
-        OrderStatusHistory.objects.create(
+        history = OrderStatusHistory.objects.create(
             order=self.order,
             status=self.order.status,
-            notes=f"Payment error: {error_info['code']} - {user_message['message']}"
+            notes=history_notes
         )
+        error_aggregator.attach(key, history.pk)
     
-    def _send_critical_error_notification(self, error_info, context=None):
+    def _send_critical_error_notification(self, error_info, context=None, occurrences=1):
         """
         Send notification for critical errors
         """
         try:
             subject = f"Critical Payment Error - {error_info['code']}"
+            if occurrences > 1:
+                subject += f" (repeated {occurrences} times)"
             
             message = f"""
 Critical payment error occurred:
@@ -350,6 +481,7 @@ Message: {error_info['message']}
 Timestamp: {error_info['timestamp']}
 Order: {self.order.order_number if self.order else 'N/A'}
 Context: {context or 'N/A'}
+Occurrences in the last {error_aggregator.window} seconds: {occurrences}
 
 Immediate attention required.
             """
@@ -376,62 +508,40 @@ def handle_payment_error(error, order=None, context=None):
 def get_error_recovery_instructions(error_code):
     """
     Get detailed recovery instructions for an error code
+
+    The lookup is memoized; each call returns a fresh dict the caller may
+    modify.
     """
-    if error_code in USER_FRIENDLY_MESSAGES:
+    # Unknown codes share one cache entry so request input can't grow the cache
+    if error_code not in USER_FRIENDLY_MESSAGES:
+        error_code = None
+    recovery_info = dict(_recovery_instructions(error_code))
+    recovery_info['instructions'] = list(recovery_info['instructions'])
+    return recovery_info
+
+
+@lru_cache(maxsize=None)
+def _recovery_instructions(error_code):
+    if error_code is not None:
         error_info = USER_FRIENDLY_MESSAGES[error_code]
+        instructions = RECOVERY_INSTRUCTIONS_BY_CODE.get(
+            error_code, RECOVERY_INSTRUCTIONS.get(error_info['action'], [])
+        )
         
-        instructions = {
-            'try_different_card': [
-                "Try using a different credit or debit card",
-                "Ensure your card is activated and not expired",
-                "Contact your bank if you continue to have issues"
-            ],
-            'update_card': [
-                "Check your card expiration date",
-                "Use a card that hasn't expired",
-                "Contact your bank for a replacement card if needed"
-            ],
-            'retry_payment': [
-                "Double-check your card information",
-                "Try the payment again in a few minutes",
-                "Ensure you have a stable internet connection"
-            ],
-            'contact_bank': [
-                "Contact your card issuer or bank",
-                "Ask them to authorize the payment",
-                "Try again after speaking with your bank"
-            ],
-            'contact_support': [
-                "Contact our customer support team",
-                "Provide your order number for assistance",
-                "We'll help resolve the issue quickly"
-            ],
-            'wait_retry': [
-                "Wait a few minutes before trying again",
-                "Too many attempts were made recently",
-                "Contact support if the issue persists"
-            ],
-            'modify_cart': [
-                "Add more items to reach the minimum amount",
-                "Check our minimum order requirements",
-                "Contact support if you need assistance"
-            ]
-        }
-        
-        return {
+        return MappingProxyType({
             'message': error_info['message'],
             'action': error_info['action'],
-            'instructions': instructions.get(error_info['action'], []),
+            'instructions': tuple(instructions),
             'severity': error_info['severity']
-        }
+        })
     
-    return {
+    return MappingProxyType({
         'message': USER_FRIENDLY_MESSAGES['unknown']['message'],
         'action': 'retry_or_support',
-        'instructions': [
+        'instructions': (
             "Try the payment again",
             "Check your card information",
             "Contact support if the problem continues"
-        ],
+        ),
         'severity': 'medium'
-    }
\ No newline at end of file
+    })
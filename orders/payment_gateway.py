@@ -0,0 +1,401 @@
+"""
+Payment gateway adapters
+
+All Stripe API traffic goes through a ``PaymentGateway`` so the HTTP client
+(connection pooling, timeouts, retries) is configured in one place and the
+checkout can run against an in-process fake with no network access.
+
+The active gateway is selected with the ``PAYMENT_GATEWAY`` setting and
+obtained with ``get_gateway()``.
+"""
+import copy
+import hashlib
+import hmac
+import json
+import logging
+import threading
+import time
+import uuid
+from urllib.parse import quote_plus
+
+import requests
+import stripe
+from django.conf import settings
+from django.core.signals import setting_changed
+from django.dispatch import receiver
+from django.utils.module_loading import import_string
+from requests.adapters import HTTPAdapter
+
+logger = logging.getLogger(__name__)
+
+
+class PaymentGateway:
+    """
+    Interface implemented by payment gateway adapters
+
+    Methods return Stripe objects (``stripe.PaymentIntent``, ``stripe.Event``)
+    and raise ``stripe.error.StripeError`` subclasses, so callers handle every
+    gateway the same way.
+    """
+
+    def create_intent(self, amount, currency, metadata=None, **params):
+        """Create a payment intent for ``amount`` (in cents)"""
+        raise NotImplementedError
+
+    def retrieve_intent(self, intent_id):
+        """Retrieve a payment intent"""
+        raise NotImplementedError
+
+    def modify_intent(self, intent_id, **params):
+        """Update a payment intent (e.g. its amount or metadata)"""
+        raise NotImplementedError
+
+    def confirm_intent(self, intent_id, payment_method=None):
+        """Confirm a payment intent"""
+        raise NotImplementedError
+
+    def cancel_intent(self, intent_id, cancellation_reason=None):
+        """Cancel a payment intent"""
+        raise NotImplementedError
+
+    def construct_event(self, payload, sig_header):
+        """Verify a webhook signature and return the event"""
+        raise NotImplementedError
+
+    def retrieve_account(self):
+        """Retrieve the account, used to check API connectivity"""
+        raise NotImplementedError
+
+
+class GatewayHTTPClient(stripe.http_client.RequestsClient):
+    """
+    Stripe HTTP client with its own retry count
+
+    The Stripe library reads ``stripe.max_network_retries`` for every
+    client; this one uses the count it was built with, so each gateway
+    keeps its retry policy without changing module settings.
+    """
+
+    def __init__(self, max_network_retries=0, **kwargs):
+        super().__init__(**kwargs)
+        self.max_network_retries = max_network_retries
+
+    def _max_network_retries(self):
+        return self.max_network_retries
+
+
+def build_http_client(connect_timeout, read_timeout, pool_size, max_retries=0):
+    """
+    Build a Stripe HTTP client backed by a pooled, keep-alive requests session
+
+    Retries are left to the Stripe library (``max_retries``) because it adds
+    idempotency keys to retried POSTs; retrying at the urllib3 level could
+    create duplicate payment intents.
+    """
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size, max_retries=0)
+    session.mount('https://', adapter)
+    session.mount('http://', adapter)
+    return GatewayHTTPClient(
+        max_network_retries=max_retries,
+        timeout=(connect_timeout, read_timeout),
+        session=session,
+    )
+
+
+class StripeGateway(PaymentGateway):
+    """
+    Stripe API gateway using a shared keep-alive connection pool
+
+    Configured with the ``STRIPE_*`` settings. ``STRIPE_API_BASE`` can point
+    the client at a local stand-in (see ``orders.fake_stripe_server``).
+
+    Requests go through the gateway's own ``APIRequestor``, so the API base,
+    HTTP client and retries apply to this gateway only and the module-level
+    ``stripe`` settings are left alone.
+    """
+
+    def __init__(self, api_key=None, api_base=None, connect_timeout=None,
+                 read_timeout=None, max_retries=None, pool_size=None):
+        self.api_key = api_key or settings.STRIPE_SECRET_KEY
+        self.webhook_secret = settings.STRIPE_WH_SECRET
+        self.http_client = build_http_client(
+            connect_timeout=connect_timeout or settings.STRIPE_CONNECT_TIMEOUT,
+            read_timeout=read_timeout or settings.STRIPE_READ_TIMEOUT,
+            pool_size=pool_size or settings.STRIPE_HTTP_POOL_SIZE,
+            max_retries=settings.STRIPE_MAX_NETWORK_RETRIES if max_retries is None else max_retries,
+        )
+        self.requestor = stripe.APIRequestor(
+            key=self.api_key,
+            client=self.http_client,
+            api_base=api_base or settings.STRIPE_API_BASE or None,
+        )
+
+    def _request(self, method, url, params=None):
+        """Send a request with this gateway's requestor and wrap the response"""
+        response, api_key = self.requestor.request(method, url, params)
+        return stripe.convert_to_stripe_object(response, api_key, params=params)
+
+    def _intent_url(self, intent_id, action=''):
+        return f'/v1/payment_intents/{quote_plus(intent_id)}{action}'
+
+    def create_intent(self, amount, currency, metadata=None, **params):
+        return self._request('post', '/v1/payment_intents', dict(
+            params, amount=amount, currency=currency, metadata=metadata or {}
+        ))
+
+    def retrieve_intent(self, intent_id):
+        return self._request('get', self._intent_url(intent_id))
+
+    def modify_intent(self, intent_id, **params):
+        return self._request('post', self._intent_url(intent_id), params)
+
+    def confirm_intent(self, intent_id, payment_method=None):
+        params = {}
+        if payment_method:
+            params['payment_method'] = payment_method
+        return self._request('post', self._intent_url(intent_id, '/confirm'), params)
+
+    def cancel_intent(self, intent_id, cancellation_reason=None):
+        params = {}
+        if cancellation_reason:
+            params['cancellation_reason'] = cancellation_reason
+        return self._request('post', self._intent_url(intent_id, '/cancel'), params)
+
+    def construct_event(self, payload, sig_header):
+        return stripe.Webhook.construct_event(payload, sig_header, self.webhook_secret)
+
+    def retrieve_account(self):
+        return self._request('get', '/v1/account')
+
+
+# Stripe test payment methods understood by FakeGateway and the outcome
+# of confirming an intent with them: None for success, 'requires_action'
+# for 3D Secure, otherwise (code, decline_code, message) of the card error.
+TEST_PAYMENT_METHODS = {
+    'pm_card_visa': None,
+    'pm_card_mastercard': None,
+    'pm_card_authenticationRequired': 'requires_action',
+    'pm_card_chargeDeclined': ('card_declined', 'generic_decline', 'Your card was declined.'),
+    'pm_card_chargeDeclinedInsufficientFunds': (
+        'card_declined', 'insufficient_funds', 'Your card has insufficient funds.'
+    ),
+    'pm_card_chargeDeclinedExpiredCard': ('expired_card', None, 'Your card has expired.'),
+    'pm_card_chargeDeclinedFraudulent': ('card_declined', 'fraudulent', 'Your card was declined.'),
+}
+
+# Intent states that can still be updated, confirmed or cancelled
+MUTABLE_INTENT_STATUSES = ('requires_payment_method', 'requires_confirmation', 'requires_action')
+
+
+class FakeGateway(PaymentGateway):
+    """
+    In-process payment gateway for tests and offline load testing
+
+    Keeps payment intents in memory and simulates confirmations, card
+    declines and webhook events. Extra behaviour can be injected with
+    ``latency`` (seconds added to every call) and ``fail_next()``.
+    """
+
+    def __init__(self, latency=0, webhook_secret=None):
+        self.latency = latency
+        self.webhook_secret = webhook_secret or settings.STRIPE_WH_SECRET or 'whsec_fake'
+        self.intents = {}
+        self.events = []
+        self.calls = []
+        self._failures = []
+        self._lock = threading.Lock()
+
+    def fail_next(self, error, times=1):
+        """Raise ``error`` from the next ``times`` gateway calls"""
+        with self._lock:
+            self._failures.extend([error] * times)
+
+    def reset(self):
+        """Forget all intents, events and injected failures"""
+        with self._lock:
+            self.intents.clear()
+            self.events.clear()
+            self.calls.clear()
+            self._failures.clear()
+
+    def _call(self, name):
+        """Record a call, apply latency and raise any injected failure"""
+        with self._lock:
+            self.calls.append(name)
+            error = self._failures.pop(0) if self._failures else None
+        if self.latency:
+            time.sleep(self.latency)
+        if error is not None:
+            raise error
+
+    def _get(self, intent_id):
+        try:
+            return self.intents[intent_id]
+        except KeyError:
+            raise stripe.error.InvalidRequestError(
+                f"No such payment_intent: '{intent_id}'", 'intent', code='resource_missing',
+                http_status=404,
+            )
+
+    def _to_stripe(self, intent):
+        return stripe.PaymentIntent.construct_from(copy.deepcopy(intent), 'sk_test_fake')
+
+    def _emit(self, event_type, intent):
+        event = {
+            'id': f'evt_fake_{uuid.uuid4().hex[:24]}',
+            'object': 'event',
+            'type': event_type,
+            'created': int(time.time()),
+            'livemode': False,
+            'data': {'object': copy.deepcopy(intent)},
+        }
+        self.events.append(event)
+        return event
+
+    def create_intent(self, amount, currency, metadata=None, **params):
+        self._call('create_intent')
+        if amount < 50:
+            raise stripe.error.InvalidRequestError(
+                'Amount must be at least 50 cents', 'amount', code='amount_too_small',
+                http_status=400,
+            )
+        intent_id = f'pi_fake_{uuid.uuid4().hex[:24]}'
+        intent = {
+            'id': intent_id,
+            'object': 'payment_intent',
+            'amount': amount,
+            'amount_received': 0,
+            'currency': currency,
+            'status': 'requires_payment_method',
+            'client_secret': f'{intent_id}_secret_{uuid.uuid4().hex[:24]}',
+            'metadata': dict(metadata or {}),
+            'payment_method': None,
+            'last_payment_error': None,
+            'cancellation_reason': None,
+            'charges': {'object': 'list', 'data': []},
+            'created': int(time.time()),
+            'livemode': False,
+        }
+        with self._lock:
+            self.intents[intent_id] = intent
+        return self._to_stripe(intent)
+
+    def retrieve_intent(self, intent_id):
+        self._call('retrieve_intent')
+        return self._to_stripe(self._get(intent_id))
+
+    def modify_intent(self, intent_id, **params):
+        self._call('modify_intent')
+        intent = self._get(intent_id)
+        if intent['status'] not in MUTABLE_INTENT_STATUSES:
+            raise stripe.error.InvalidRequestError(
+                f"This PaymentIntent's status is {intent['status']} and cannot be updated.",
+                None, code='payment_intent_unexpected_state', http_status=400,
+            )
+        metadata = params.pop('metadata', None)
+        if metadata:
+            intent['metadata'].update(metadata)
+        intent.update(params)
+        return self._to_stripe(intent)
+
+    def confirm_intent(self, intent_id, payment_method=None):
+        self._call('confirm_intent')
+        intent = self._get(intent_id)
+        if intent['status'] not in MUTABLE_INTENT_STATUSES:
+            raise stripe.error.InvalidRequestError(
+                f"This PaymentIntent's status is {intent['status']} and cannot be confirmed.",
+                None, code='payment_intent_unexpected_state', http_status=400,
+            )
+
+        payment_method = payment_method or intent['payment_method'] or 'pm_card_visa'
+        intent['payment_method'] = payment_method
+        outcome = TEST_PAYMENT_METHODS.get(payment_method)
+
+        if outcome == 'requires_action':
+            intent['status'] = 'requires_action'
+            self._emit('payment_intent.requires_action', intent)
+        elif outcome:
+            code, decline_code, message = outcome
+            intent['status'] = 'requires_payment_method'
+            intent['last_payment_error'] = {
+                'type': 'card_error', 'code': code, 'decline_code': decline_code, 'message': message,
+            }
+            self._emit('payment_intent.payment_failed', intent)
+            raise stripe.error.CardError(
+                message, 'payment_method', code, http_status=402,
+                json_body={'error': dict(intent['last_payment_error'], payment_intent=copy.deepcopy(intent))},
+            )
+        else:
+            intent['status'] = 'succeeded'
+            intent['amount_received'] = intent['amount']
+            intent['last_payment_error'] = None
+            intent['charges']['data'] = [{'id': f'ch_fake_{uuid.uuid4().hex[:24]}', 'object': 'charge'}]
+            self._emit('payment_intent.succeeded', intent)
+        return self._to_stripe(intent)
+
+    def cancel_intent(self, intent_id, cancellation_reason=None):
+        self._call('cancel_intent')
+        intent = self._get(intent_id)
+        if intent['status'] == 'succeeded':
+            raise stripe.error.InvalidRequestError(
+                'You cannot cancel this PaymentIntent because it has a status of succeeded.',
+                None, code='payment_intent_unexpected_state', http_status=400,
+            )
+        intent['status'] = 'canceled'
+        intent['cancellation_reason'] = cancellation_reason or 'requested_by_customer'
+        self._emit('payment_intent.canceled', intent)
+        return self._to_stripe(intent)
+
+    def construct_event(self, payload, sig_header):
+        return stripe.Webhook.construct_event(payload, sig_header, self.webhook_secret)
+
+    def retrieve_account(self):
+        self._call('retrieve_account')
+        return stripe.Account.construct_from({'id': 'acct_fake', 'object': 'account'}, 'sk_test_fake')
+
+    def sign_payload(self, payload, timestamp=None):
+        """Return a ``Stripe-Signature`` header for ``payload``"""
+        timestamp = int(timestamp or time.time())
+        if isinstance(payload, bytes):
+            payload = payload.decode('utf-8')
+        signature = hmac.new(
+            self.webhook_secret.encode('utf-8'),
+            f'{timestamp}.{payload}'.encode('utf-8'),
+            hashlib.sha256,
+        ).hexdigest()
+        return f't={timestamp},v1={signature}'
+
+    def webhook_request(self, event):
+        """Return ``(payload, sig_header)`` for posting ``event`` to the webhook view"""
+        payload = json.dumps(event)
+        return payload, self.sign_payload(payload)
+
+
+_gateway = None
+
+
+def get_gateway():
+    """Return the configured payment gateway (one instance per process)"""
+    global _gateway
+    if _gateway is None:
+        gateway = import_string(settings.PAYMENT_GATEWAY)()
+        if settings.STRIPE_CIRCUIT_BREAKER_ENABLED:
+            from .circuit_breaker import CircuitBreaker, CircuitBreakerGateway
+            gateway = CircuitBreakerGateway(gateway, CircuitBreaker(
+                'stripe',
+                failure_threshold=settings.STRIPE_CIRCUIT_FAILURE_THRESHOLD,
+                failure_window=settings.STRIPE_CIRCUIT_FAILURE_WINDOW,
+                reset_timeout=settings.STRIPE_CIRCUIT_RESET_TIMEOUT,
+                cache_alias=settings.STRIPE_CIRCUIT_CACHE,
+            ))
+        _gateway = gateway
+    return _gateway
+
+
+@receiver(setting_changed)
+def reset_gateway(setting, **kwargs):
+    """Rebuild the gateway when its settings change (e.g. in tests)"""
+    global _gateway
+    if setting == 'PAYMENT_GATEWAY' or setting.startswith('STRIPE_'):
+        _gateway = None
@@ -2,9 +2,12 @@
 Order signals for automatic email notifications
 """
 import logging
+from functools import partial
+from django.db import transaction
 from django.db.models.signals import pre_save
 from django.dispatch import receiver
 from .models import Order
+from .order_events import publish_status
 from .utils import (
     send_order_cancelled_email,
     send_order_processing_email,
@@ -15,43 +18,60 @@ from .utils import (
 
 logger = logging.getLogger(__name__)
 
+STATUS_EMAILS = {
+    'processing': send_order_processing_email,
+    'shipped': send_order_shipped_email,
+    'delivered': send_order_delivered_email,
+    'cancelled': send_order_cancelled_email,
+}
+
+
+def _restore_stock(order):
+    try:
+        restore_product_stock(order)
+        logger.info(f"Product stock restored for cancelled order {order.order_number}")
+    except Exception as e:
+        logger.error(f"Error restoring stock for order {order.order_number}: {str(e)}")
+
 
 @receiver(pre_save, sender=Order)
 def order_status_changed(sender, instance, **kwargs):
     """
     Detect order status changes and trigger appropriate actions
+
+    The previous status comes from the instance's loaded state, so ordinary
+    saves don't read the row first. Stock is restored right away, inside the
+    saving transaction; emails and live status events wait until the change
+    is committed.
     """
     # Only process if this is an existing order (not a new one)
-    if instance.pk:
-        try:
-            # Get the old order state from database
-            old_order = Order.objects.get(pk=instance.pk)
-            
-            # Only send email if status actually changed
-            if old_order.status != instance.status:
-                logger.info(f"Order {instance.order_number} status changed from {old_order.status} to {instance.status}")
-                
-                # Send appropriate email based on new status
-                if instance.status == 'processing':
-                    send_order_processing_email(instance)
-                    
-                elif instance.status == 'shipped':
-                    send_order_shipped_email(instance)
-                    
-                elif instance.status == 'delivered':
-                    send_order_delivered_email(instance)
-                    
-                elif instance.status == 'cancelled':
-                    send_order_cancelled_email(instance)
-                    
-                    # Restore product stock when order is cancelled
-                    try:
-                        restore_product_stock(instance)
-                        logger.info(f"Product stock restored for cancelled order {instance.order_number}")
-                    except Exception as e:
-                        logger.error(f"Error restoring stock for order {instance.order_number}: {str(e)}")
-                    
-        except Order.DoesNotExist:
-            # This shouldn't happen, but handle gracefully
+    if not instance.pk:
+        return
+
+    try:
+        old_status = instance.stored_value('status')
+    except KeyError:
+        # Status wasn't loaded (deferred, or built by hand); read it
+        old_status = Order.objects.filter(pk=instance.pk).values_list('status', flat=True).first()
+        if old_status is None:
             logger.warning(f"Could not find existing order with pk {instance.pk}")
-            pass
+            return
+
+    if old_status == instance.status:
+        return
+
+    logger.info(f"Order {instance.order_number} status changed from {old_status} to {instance.status}")
+
+    # Push the change to live status streams once it is saved
+    transaction.on_commit(partial(
+        publish_status, instance.order_number, instance.status, instance.get_status_display()
+    ))
+
+    # Send appropriate email based on new status
+    send_email = STATUS_EMAILS.get(instance.status)
+    if send_email:
+        transaction.on_commit(partial(send_email, instance))
+
+    # Restore product stock when order is cancelled
+    if instance.status == 'cancelled':
+        _restore_stock(instance)
@@ -1,14 +1,31 @@
+import hashlib
+import json
 import stripe
 import logging
 from django.conf import settings
+from django.core.cache import caches
 from django.http import HttpResponse
 from decimal import Decimal
+from .payment_gateway import get_gateway, MUTABLE_INTENT_STATUSES
+from .circuit_breaker import CircuitOpenError
 
 # Configure Stripe
 stripe.api_key = settings.STRIPE_SECRET_KEY
 
 logger = logging.getLogger(__name__)
 
+# Per-cart payment intent cache, so checkout reuses one intent per cart
+PAYMENT_INTENT_CACHE_PREFIX = 'cart_payment_intent_'
+PAYMENT_INTENT_CACHE_TIMEOUT = 60 * 60 * 24  # 24 hours
+PAYMENT_INTENT_METRICS_PREFIX = 'payment_intent_metrics_'
+PAYMENT_INTENT_METRICS = ('created', 'updated', 'reused')
+
+
+def _intent_cache():
+    """Cache holding cart intents and counters, shared by all workers in production"""
+    return caches[settings.PAYMENT_INTENT_CACHE]
+
+
 def create_payment_intent(amount, currency='eur', metadata=None):
     """
     Create a Stripe payment intent
@@ -26,18 +43,21 @@ def create_payment_intent(amount, currency='eur', metadata=None):
         amount_cents = int(amount * 100)
         
         # Create payment intent
-        intent = stripe.PaymentIntent.create(
+        intent = get_gateway().create_intent(
             amount=amount_cents,
             currency=currency,
+            metadata=metadata or {},
             automatic_payment_methods={
                 'enabled': True,
             },
-            metadata=metadata or {},
         )
         
         logger.info(f"Payment intent created: {intent.id} for €{amount}")
         return intent
         
+    except CircuitOpenError:
+        # Fail fast, the caller reports the outage to the user
+        raise
     except stripe.error.StripeError as e:
         logger.error(f"Stripe error creating payment intent: {str(e)}")
         return None
@@ -45,6 +65,124 @@ def create_payment_intent(amount, currency='eur', metadata=None):
         logger.error(f"Error creating payment intent: {str(e)}")
         return None
 
+def get_cart_content_hash(cart):
+    """
+    Hash the cart contents (products, sizes, quantities and prices)
+    
+    Args:
+        cart (Cart): Shopping cart
+    
+    Returns:
+        str: Hex digest that changes whenever the cart amount could change
+    """
+    lines = sorted(
+        (product_id, size_id, quantity, str(price))
+        for product_id, size_id, quantity, price in cart.items.values_list(
+            'product_id', 'size_id', 'quantity', 'product__price'
+        )
+    )
+    return hashlib.sha256(json.dumps(lines).encode('utf-8')).hexdigest()
+
+def get_or_create_cart_payment_intent(cart, amount, currency='eur', metadata=None):
+    """
+    Get the payment intent for a cart, creating one only when necessary
+    
+    The cart's intent is cached together with a hash of the cart contents.
+    An unchanged cart reuses the cached intent while it can still be paid,
+    a changed cart updates the amount of the existing intent, and a new
+    intent is created only when there is none or it can no longer be updated.
+    
+    Args:
+        cart (Cart): Shopping cart the intent pays for
+        amount (Decimal): Amount in euros (will be converted to cents)
+        currency (str): Currency code (default: 'eur')
+        metadata (dict): Additional metadata for the payment intent
+    
+    Returns:
+        PaymentIntent: Stripe payment intent object or None if error
+    """
+    cache_key = f"{PAYMENT_INTENT_CACHE_PREFIX}{cart.id}"
+    content_hash = get_cart_content_hash(cart)
+    amount_cents = int(amount * 100)
+    cached = _intent_cache().get(cache_key)
+    
+    if cached and cached['currency'] == currency and (
+            cached['content_hash'] == content_hash and cached['amount'] == amount_cents):
+        intent = retrieve_payment_intent(cached['id'])
+        if intent is not None and intent.status in MUTABLE_INTENT_STATUSES:
+            record_payment_intent_metric('reused')
+            return intent
+    elif cached and cached['currency'] == currency:
+        try:
+            intent = get_gateway().modify_intent(
+                cached['id'],
+                amount=amount_cents,
+                metadata=metadata or {},
+            )
+            if intent.status in MUTABLE_INTENT_STATUSES:
+                record_payment_intent_metric('updated')
+                _cache_cart_payment_intent(cache_key, intent, content_hash)
+                logger.info(f"Payment intent updated: {intent.id} for cart {cart.id} to €{amount}")
+                return intent
+        except stripe.error.InvalidRequestError as e:
+            # Intent already succeeded, was cancelled or no longer exists
+            logger.info(f"Payment intent {cached['id']} for cart {cart.id} cannot be reused: {str(e)}")
+        except CircuitOpenError:
+            # Fail fast, the caller reports the outage to the user
+            raise
+        except stripe.error.StripeError as e:
+            logger.error(f"Stripe error updating payment intent {cached['id']}: {str(e)}")
+            return None
+    
+    intent = create_payment_intent(amount, currency=currency, metadata=metadata)
+    if intent:
+        record_payment_intent_metric('created')
+        _cache_cart_payment_intent(cache_key, intent, content_hash)
+    return intent
+
+def _cache_cart_payment_intent(cache_key, intent, content_hash):
+    """Store the fields needed to reuse a cart's payment intent"""
+    _intent_cache().set(cache_key, {
+        'id': intent.id,
+        'client_secret': intent.client_secret,
+        'amount': intent.amount,
+        'currency': intent.currency,
+        'content_hash': content_hash,
+    }, PAYMENT_INTENT_CACHE_TIMEOUT)
+
+def forget_cart_payment_intent(cart_id):
+    """
+    Drop a cart's cached payment intent
+    
+    Called once the intent has been paid or cancelled so the next
+    checkout of the cart starts with a fresh intent.
+    """
+    _intent_cache().delete(f"{PAYMENT_INTENT_CACHE_PREFIX}{cart_id}")
+
+def record_payment_intent_metric(name):
+    """Increment a payment intent counter ('created', 'updated' or 'reused')"""
+    key = f"{PAYMENT_INTENT_METRICS_PREFIX}{name}"
+    cache = _intent_cache()
+    cache.add(key, 0, None)
+    try:
+        cache.incr(key)
+    except ValueError:
+        # Key was evicted between add() and incr()
+        cache.set(key, 1, None)
+
+def get_payment_intent_metrics():
+    """
+    Get payment intent counters
+    
+    Returns:
+        dict: Number of intents created, updated and reused
+    """
+    values = _intent_cache().get_many([f"{PAYMENT_INTENT_METRICS_PREFIX}{name}" for name in PAYMENT_INTENT_METRICS])
+    return {
+        name: values.get(f"{PAYMENT_INTENT_METRICS_PREFIX}{name}", 0)
+        for name in PAYMENT_INTENT_METRICS
+    }
+
 def retrieve_payment_intent(payment_intent_id):
     """
     Retrieve a Stripe payment intent
@@ -56,8 +194,11 @@ def retrieve_payment_intent(payment_intent_id):
         PaymentIntent: Stripe payment intent object or None if error
     """
     try:
-        intent = stripe.PaymentIntent.retrieve(payment_intent_id)
+        intent = get_gateway().retrieve_intent(payment_intent_id)
         return intent
+    except CircuitOpenError:
+        # Fail fast, the caller reports the outage to the user
+        raise
     except stripe.error.StripeError as e:
         logger.error(f"Stripe error retrieving payment intent {payment_intent_id}: {str(e)}")
         return None
@@ -77,18 +218,17 @@ def confirm_payment_intent(payment_intent_id, payment_method_id=None):
         PaymentIntent: Confirmed payment intent or None if error
     """
     try:
-        confirm_params = {}
-        if payment_method_id:
-            confirm_params['payment_method'] = payment_method_id
-            
-        intent = stripe.PaymentIntent.confirm(
+        intent = get_gateway().confirm_intent(
             payment_intent_id,
-            **confirm_params
+            payment_method=payment_method_id
         )
         
         logger.info(f"Payment intent confirmed: {payment_intent_id}")
         return intent
         
+    except CircuitOpenError:
+        # Fail fast, the caller reports the outage to the user
+        raise
     except stripe.error.StripeError as e:
         logger.error(f"Stripe error confirming payment intent {payment_intent_id}: {str(e)}")
         return None
@@ -108,18 +248,17 @@ def cancel_payment_intent(payment_intent_id, cancellation_reason=None):
         PaymentIntent: Cancelled payment intent or None if error
     """
     try:
-        cancel_params = {}
-        if cancellation_reason:
-            cancel_params['cancellation_reason'] = cancellation_reason
-            
-        intent = stripe.PaymentIntent.cancel(
+        intent = get_gateway().cancel_intent(
             payment_intent_id,
-            **cancel_params
+            cancellation_reason=cancellation_reason
         )
         
         logger.info(f"Payment intent cancelled: {payment_intent_id}")
         return intent
         
+    except CircuitOpenError:
+        # Fail fast, the caller reports the outage to the user
+        raise
     except stripe.error.StripeError as e:
         logger.error(f"Stripe error cancelling payment intent {payment_intent_id}: {str(e)}")
         return None
@@ -139,9 +278,7 @@ def handle_payment_intent_webhook(payload, sig_header):
         tuple: (success: bool, event: dict or None, error: str or None)
     """
     try:
-        event = stripe.Webhook.construct_event(
-            payload, sig_header, settings.STRIPE_WH_SECRET
-        )
+        event = get_gateway().construct_event(payload, sig_header)
         
         logger.info(f"Webhook received: {event['type']}")
         return True, event, None
@@ -247,7 +384,7 @@ def validate_stripe_configuration():
     
     # Test API connection
     try:
-        stripe.Account.retrieve()
+        get_gateway().retrieve_account()
     except stripe.error.AuthenticationError:
         errors.append("Invalid Stripe API keys")
     except Exception as e:
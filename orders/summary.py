@@ -0,0 +1,121 @@
+"""
+Order summaries for pages, emails and JSON
+
+An OrderSummary holds an order with its line items, their products and
+sizes loaded by one prefetch, so the confirmation and detail pages, the
+emails and JSON responses all render from the same objects without
+querying per line.
+"""
+from django.db.models import prefetch_related_objects
+from django.shortcuts import get_object_or_404
+
+from .models import Order
+
+ORDER_SUMMARY_PREFETCH = ('lineitems__product', 'lineitems__size')
+
+
+class OrderSummary:
+    """
+    An order and its line items, loaded once
+
+    Args:
+        order: The order; its line items are prefetched if they aren't yet
+    """
+
+    def __init__(self, order):
+        prefetch_related_objects([order], *ORDER_SUMMARY_PREFETCH)
+        self.order = order
+        self.items = list(order.lineitems.all())
+
+    @classmethod
+    def queryset(cls):
+        return Order.objects.select_related('user_profile').prefetch_related(*ORDER_SUMMARY_PREFETCH)
+
+    @classmethod
+    def get_or_404(cls, **lookup):
+        """Load an order and its line items, raising Http404 if it's missing"""
+        return cls(get_object_or_404(cls.queryset(), **lookup))
+
+    @property
+    def total_items(self):
+        return sum(item.quantity for item in self.items)
+
+    def as_dict(self):
+        """Summary for order pages"""
+        order = self.order
+        return {
+            'order_number': order.order_number,
+            'date': order.date,
+            'status': order.status,
+            'full_name': order.full_name,
+            'email': order.email,
+            'delivery_address': {
+                'street_address1': order.street_address1,
+                'street_address2': order.street_address2,
+                'town_or_city': order.town_or_city,
+                'county': order.county,
+                'postcode': order.postcode,
+                'country': order.country,
+            },
+            'items': [
+                {
+                    'product': item.product,
+                    'size': item.size,
+                    'quantity': item.quantity,
+                    'lineitem_total': item.lineitem_total,
+                }
+                for item in self.items
+            ],
+            'order_total': order.order_total,
+            'delivery_cost': order.delivery_cost,
+            'grand_total': order.grand_total,
+            'total_items': self.total_items,
+        }
+
+    def as_email(self):
+        """Summary with preformatted values for email templates"""
+        order = self.order
+        return {
+            'order_number': order.order_number,
+            'date': order.date.strftime('%B %d, %Y at %I:%M %p'),
+            'customer_name': order.full_name,
+            'customer_email': order.email,
+            'delivery_address': f"{order.street_address1}, {order.town_or_city}, {order.postcode}, {order.country}",
+            'items': [
+                {
+                    'name': item.product.name,
+                    'size': item.size.display_name if item.size else 'N/A',
+                    'quantity': item.quantity,
+                    'price': f"€{item.product.price:.2f}",
+                    'total': f"€{item.lineitem_total:.2f}",
+                }
+                for item in self.items
+            ],
+            'subtotal': f"€{order.order_total:.2f}",
+            'delivery': f"€{order.delivery_cost:.2f}",
+            'total': f"€{order.grand_total:.2f}",
+        }
+
+    def as_json(self):
+        """JSON-serializable summary for API responses"""
+        order = self.order
+        return {
+            'order_number': order.order_number,
+            'date': order.date.isoformat(),
+            'status': order.status,
+            'items': [
+                {
+                    'sku': item.product.sku,
+                    'name': item.product.name,
+                    'size': item.size.name if item.size else None,
+                    'quantity': item.quantity,
+                    'price': float(item.product.price),
+                    'total': float(item.lineitem_total),
+                }
+                for item in self.items
+            ],
+            'total_items': self.total_items,
+            'order_total': float(order.order_total),
+            'delivery_cost': float(order.delivery_cost),
+            'grand_total': float(order.grand_total),
+        }
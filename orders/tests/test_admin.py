@@ -0,0 +1,69 @@
+"""
+Tests for the orders admin
+"""
+from decimal import Decimal
+from django.contrib.auth.models import User
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from orders.models import Order, OrderLineItem
+from products.models import Product, Category
+
+
+class OrderChangelistTest(TestCase):
+    """Test order changelists run a constant number of queries"""
+
+    def setUp(self):
+        self.admin = User.objects.create_superuser('admin', 'admin@example.com', 'password')
+        self.client.force_login(self.admin)
+        self.category = Category.objects.create(name='accessories', friendly_name='Accessories')
+        self.product = Product.objects.create(
+            name='Bike Lock',
+            price=Decimal('60.00'),
+            category=self.category,
+            stock_quantity=500,
+            in_stock=True
+        )
+
+    def create_orders(self, count):
+        for i in range(count):
+            order = Order.objects.create(
+                full_name=f'Customer {i}',
+                email='customer@example.com',
+                street_address1='Main Street 1',
+                town_or_city='Wiesbaden',
+                postcode='65183',
+                country='DE'
+            )
+            OrderLineItem.objects.create(order=order, product=self.product, quantity=2)
+            OrderLineItem.objects.create(order=order, product=self.product, quantity=1)
+
+    def changelist_queries(self, url):
+        # Warm up per-session work (session, permissions) before measuring
+        self.client.get(url)
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        return len(queries), response
+
+    def test_order_changelist_query_count(self):
+        """Test the order changelist doesn't query per row"""
+        url = reverse('admin:orders_order_changelist')
+        self.create_orders(1)
+        one_row, response = self.changelist_queries(url)
+        self.assertContains(response, '<td class="field-total_items_display">3</td>', html=True)
+
+        self.create_orders(20)
+        many_rows, _ = self.changelist_queries(url)
+        self.assertEqual(one_row, many_rows)
+
+    def test_lineitem_changelist_query_count(self):
+        """Test the line item changelist doesn't query per row"""
+        url = reverse('admin:orders_orderlineitem_changelist')
+        self.create_orders(1)
+        one_row, _ = self.changelist_queries(url)
+
+        self.create_orders(20)
+        many_rows, _ = self.changelist_queries(url)
+        self.assertEqual(one_row, many_rows)
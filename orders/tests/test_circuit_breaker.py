@@ -0,0 +1,173 @@
+"""
+Tests for the Stripe circuit breaker
+"""
+import json
+import time
+from decimal import Decimal
+from unittest.mock import patch
+import stripe
+from django.core.cache import cache
+from django.test import TestCase, Client, override_settings
+from django.urls import reverse
+from orders.circuit_breaker import (
+    CircuitBreaker, CircuitBreakerGateway, CircuitOpenError, CLOSED, OPEN, HALF_OPEN
+)
+from orders.fake_stripe_server import FakeStripeServer
+from orders.models import Order
+from orders.payment_gateway import FakeGateway, StripeGateway
+from products.models import Product, Category
+
+
+class SlowGatewayCircuitTest(TestCase):
+    """Test the breaker against a slow Stripe stand-in"""
+
+    def setUp(self):
+        cache.clear()
+        self.server = FakeStripeServer(gateway=FakeGateway(latency=0.3))
+        gateway = StripeGateway(
+            api_key='sk_test_fake', api_base=self.server.start(),
+            read_timeout=0.1, max_retries=0,
+        )
+        self.breaker = CircuitBreaker('test_stripe', failure_threshold=2, reset_timeout=30)
+        self.gateway = CircuitBreakerGateway(gateway, self.breaker)
+
+    def tearDown(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+    def test_timeouts_open_circuit_and_fail_fast(self):
+        """Test repeated timeouts open the circuit and later calls fail fast"""
+        for _ in range(2):
+            with self.assertRaises(stripe.error.APIConnectionError):
+                self.gateway.create_intent(1000, 'eur')
+        self.assertEqual(self.breaker.state, OPEN)
+
+        started = time.monotonic()
+        with self.assertRaises(CircuitOpenError) as ctx:
+            self.gateway.create_intent(1000, 'eur')
+
+        self.assertLess(time.monotonic() - started, 0.05)
+        self.assertEqual(ctx.exception.code, 'payment_service_unavailable')
+        self.assertGreater(ctx.exception.retry_after, 0)
+        self.assertEqual(len(self.server.gateway.calls), 2)
+
+
+class HalfOpenProbeTest(TestCase):
+    """Test half-open probing"""
+
+    def setUp(self):
+        cache.clear()
+        self.breaker = CircuitBreaker('test_probe', failure_threshold=1, reset_timeout=30)
+        self.now = time.time()
+
+    def fail(self):
+        raise stripe.error.APIConnectionError('Timeout')
+
+    def open_circuit(self):
+        with self.assertRaises(stripe.error.APIConnectionError):
+            self.breaker.call(self.fail)
+
+    def after_reset_timeout(self):
+        return patch('orders.circuit_breaker.time.time', return_value=self.now + 31)
+
+    def test_single_probe_closes_circuit(self):
+        """Test only one probe runs and its success closes the circuit"""
+        self.open_circuit()
+
+        with self.after_reset_timeout():
+            self.assertEqual(self.breaker.state, HALF_OPEN)
+
+            def probe():
+                # A concurrent call while the probe is in flight fails fast
+                with self.assertRaises(CircuitOpenError):
+                    self.breaker.call(lambda: 'second')
+                return 'ok'
+
+            self.assertEqual(self.breaker.call(probe), 'ok')
+            self.assertEqual(self.breaker.state, CLOSED)
+
+    def test_failed_probe_reopens_circuit(self):
+        """Test a failing probe re-opens the circuit"""
+        self.open_circuit()
+
+        with self.after_reset_timeout():
+            with self.assertRaises(stripe.error.APIConnectionError):
+                self.breaker.call(self.fail)
+            self.assertEqual(self.breaker.state, OPEN)
+
+    def test_card_errors_do_not_trip_circuit(self):
+        """Test declines are not counted as gateway failures"""
+        def decline():
+            raise stripe.error.CardError('Declined', 'card', 'card_declined')
+
+        with self.assertRaises(stripe.error.CardError):
+            self.breaker.call(decline)
+        self.assertEqual(self.breaker.state, CLOSED)
+
+
+@override_settings(
+    PAYMENT_GATEWAY='orders.payment_gateway.FakeGateway',
+    STRIPE_CIRCUIT_FAILURE_THRESHOLD=1,
+)
+class CircuitOpenViewTest(TestCase):
+    """Test views fail fast with a recovery code while the circuit is open"""
+
+    def setUp(self):
+        cache.clear()
+        self.client = Client()
+        self.category = Category.objects.create(name='accessories', friendly_name='Accessories')
+        self.product = Product.objects.create(
+            name='Bike Lock',
+            price=Decimal('60.00'),
+            category=self.category,
+            stock_quantity=5,
+            in_stock=True
+        )
+        self.client.post(reverse('shopping_cart:add_to_cart', args=[self.product.id]), {'quantity': 1})
+        CircuitBreaker('stripe', failure_threshold=1)._open()
+
+    def test_create_payment_intent_fails_fast(self):
+        """Test the AJAX endpoint returns a retryable 503"""
+        response = self.client.post(
+            reverse('orders:ajax_create_payment_intent'),
+            json.dumps({}),
+            content_type='application/json'
+        )
+
+        self.assertEqual(response.status_code, 503)
+        data = response.json()
+        self.assertEqual(data['error_code'], 'payment_service_unavailable')
+        self.assertEqual(data['recovery_action'], 'wait_retry')
+        self.assertTrue(data['retry_allowed'])
+        self.assertIn('retry_after', data)
+
+    def test_checkout_page_renders_recovery_info(self):
+        """Test the checkout page passes recovery info to the JS"""
+        response = self.client.get(reverse('orders:checkout'))
+
+        self.assertEqual(response.status_code, 200)
+        self.assertIsNone(response.context['client_secret'])
+        self.assertEqual(response.context['payment_error']['error_code'], 'payment_service_unavailable')
+        self.assertContains(response, 'id="id_payment_error"')
+
+    def test_payment_retry_records_error_on_order(self):
+        """Test a failed-fast retry is recorded in the order's history"""
+        order = Order.objects.create(
+            full_name='Test Rider',
+            email='rider@example.com',
+            street_address1='Main Street 1',
+            town_or_city='Wiesbaden',
+            postcode='65183',
+            country='DE',
+            payment_intent_id='pi_failed'
+        )
+
+        response = self.client.post(
+            reverse('orders:ajax_retry_payment'),
+            json.dumps({'original_payment_intent_id': 'pi_failed'}),
+            content_type='application/json'
+        )
+
+        self.assertEqual(response.status_code, 503)
+        self.assertIn('retry_after', response.json())
+        self.assertIn('payment_service_unavailable', order.status_history.get().notes)
@@ -0,0 +1,108 @@
+"""
+Tests for the streaming order export
+"""
+import csv
+import io
+import json
+import os
+import tempfile
+from datetime import timedelta
+from decimal import Decimal
+from django.contrib.auth.models import User
+from django.core.management import call_command
+from django.test import TestCase
+from django.urls import reverse
+from django.utils import timezone
+from orders.exports import EXPORT_HEADERS, get_export_queryset, stream_export
+from orders.models import Order, OrderLineItem
+from products.models import Product, Category, Size
+
+
+class OrderExportTest(TestCase):
+    """Test order exports"""
+
+    def setUp(self):
+        self.category = Category.objects.create(name='accessories', friendly_name='Accessories')
+        self.product = Product.objects.create(
+            name='Bike Lock',
+            sku='LOCK-1',
+            price=Decimal('20.00'),
+            category=self.category,
+            stock_quantity=50,
+            in_stock=True
+        )
+        self.size = Size.objects.create(name='M', display_name='Medium')
+        self.delivered = self.create_order('Old Customer', 'delivered', days_ago=10)
+        self.pending = self.create_order('New Customer', 'pending', days_ago=0)
+
+    def create_order(self, full_name, status, days_ago):
+        order = Order.objects.create(
+            full_name=full_name,
+            email='customer@example.com',
+            street_address1='Main Street 1',
+            town_or_city='Wiesbaden',
+            postcode='65183',
+            country='DE',
+            status=status
+        )
+        OrderLineItem.objects.create(order=order, product=self.product, size=self.size, quantity=2)
+        OrderLineItem.objects.create(order=order, product=self.product, quantity=1)
+        Order.objects.filter(pk=order.pk).update(date=timezone.now() - timedelta(days=days_ago))
+        return order
+
+    def test_csv_export(self):
+        """Test CSV rows join order, product and size columns"""
+        content = ''.join(stream_export(get_export_queryset(), 'csv'))
+        rows = list(csv.DictReader(io.StringIO(content)))
+
+        self.assertEqual(len(rows), 4)
+        self.assertEqual(rows[0]['order_number'], self.delivered.order_number)
+        self.assertEqual(rows[0]['product_sku'], 'LOCK-1')
+        self.assertEqual(rows[0]['size'], 'M')
+        self.assertEqual(rows[0]['lineitem_total'], '40.00')
+
+    def test_filters(self):
+        """Test date range and status filters"""
+        today = timezone.now().date()
+        recent = get_export_queryset(date_from=today - timedelta(days=1))
+        self.assertEqual({row[0] for row in recent}, {self.pending.order_number})
+
+        old = get_export_queryset(date_to=today - timedelta(days=5), statuses=['delivered'])
+        self.assertEqual({row[0] for row in old}, {self.delivered.order_number})
+
+    def test_command_writes_ndjson(self):
+        """Test the management command writes NDJSON to a file"""
+        with tempfile.TemporaryDirectory() as tmpdir:
+            path = os.path.join(tmpdir, 'orders.ndjson')
+            call_command('export_orders', format='ndjson', output=path, status=['pending'], stderr=io.StringIO())
+            with open(path) as export:
+                rows = [json.loads(line) for line in export]
+
+        self.assertEqual(len(rows), 2)
+        self.assertEqual(set(rows[0]), set(EXPORT_HEADERS))
+        self.assertEqual(rows[0]['order_number'], self.pending.order_number)
+
+    def test_admin_action_streams_csv(self):
+        """Test the admin action streams the selected orders"""
+        admin = User.objects.create_superuser('admin', 'admin@example.com', 'password')
+        self.client.force_login(admin)
+
+        response = self.client.post(reverse('admin:orders_order_changelist'), {
+            'action': 'export_csv',
+            '_selected_action': [self.delivered.pk],
+        })
+
+        self.assertTrue(response.streaming)
+        self.assertEqual(response['Content-Type'], 'text/csv')
+        content = b''.join(response.streaming_content).decode()
+        self.assertEqual(content.count(self.delivered.order_number), 2)
+        self.assertNotIn(self.pending.order_number, content)
+
+    def test_benchmark_cleans_up(self):
+        """Test the export benchmark removes its orders, product and category"""
+        call_command('benchmark_order_export', line_items=10, items_per_order=5, stdout=io.StringIO())
+
+        self.assertFalse(Order.objects.filter(order_number__startswith='BENCH').exists())
+        self.assertFalse(Product.objects.filter(name='Benchmark Product').exists())
+        self.assertFalse(Category.objects.filter(name='benchmark').exists())
+        self.assertEqual(Product.objects.count(), 1)
@@ -0,0 +1,112 @@
+"""
+Tests for live order status events
+"""
+import json
+import time
+from unittest import mock
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from orders import order_events
+from orders.models import Order
+from orders.order_events import OrderStatusBroker, OrderStatusStream
+
+
+@override_settings(ORDER_EVENTS_HEARTBEAT=0.01, ORDER_EVENTS_STREAM_TIMEOUT=0.05)
+class OrderStatusStreamTest(TestCase):
+    """Test the order status event stream"""
+
+    def setUp(self):
+        self.order = Order.objects.create(
+            full_name='Test Rider',
+            email='rider@example.com',
+            street_address1='Main Street 1',
+            town_or_city='Wiesbaden',
+            postcode='65183',
+            country='DE',
+            status='processing'
+        )
+        self.broker = OrderStatusBroker()
+
+    def stream(self, last_event_id=None):
+        self.broker.acquire(1)
+        return OrderStatusStream(self.order, time.time(), last_event_id, broker=self.broker)
+
+    def events(self, chunks):
+        return [
+            json.loads(chunk.split('data: ', 1)[1]) for chunk in chunks if chunk.startswith('id: ')
+        ]
+
+    def test_sends_current_status_then_heartbeats(self):
+        """Test a new stream starts with the current status and keeps alive"""
+        stream = self.stream()
+        chunks = list(stream)
+        stream.close()
+        self.assertTrue(chunks[0].startswith('retry: '))
+        self.assertEqual([event['status'] for event in self.events(chunks)], ['processing'])
+        self.assertIn(': heartbeat\n\n', chunks)
+        self.assertEqual(self.broker.connections, 0)
+
+    def test_reconnect_skips_known_status(self):
+        """Test Last-Event-ID equal to the current status sends nothing new"""
+        stream = self.stream(last_event_id='processing')
+        self.assertEqual(self.events(list(stream)), [])
+        stream.close()
+
+    def test_published_change_is_streamed(self):
+        """Test a published status change reaches subscribed streams"""
+        stream = self.stream(last_event_id='processing')
+        chunks = iter(stream)
+        next(chunks)
+        self.assertEqual(self.broker.publish(self.order.order_number, order_events.status_event(
+            self.order.order_number, 'shipped', 'Shipped', time.time()
+        )), 1)
+        self.assertEqual(self.events([next(chunks)])[0]['status'], 'shipped')
+        stream.close()
+
+    def test_change_from_other_worker_arrives_via_database(self):
+        """Test a change made elsewhere is read from the database on a heartbeat"""
+        stream = self.stream(last_event_id='processing')
+        Order.objects.filter(pk=self.order.pk).update(status='delivered')
+        events = self.events(list(stream))
+        stream.close()
+        self.assertEqual([(event['status'], event['status_display']) for event in events], [
+            ('delivered', 'Delivered')
+        ])
+
+    def test_status_change_publishes_on_commit(self):
+        """Test saving a new status publishes it once the transaction commits"""
+        subscriber = order_events.broker.subscribe(self.order.order_number)
+        try:
+            with self.captureOnCommitCallbacks(execute=True):
+                self.order.status = 'shipped'
+                self.order.save()
+                self.assertTrue(subscriber.empty())
+            self.assertEqual(subscriber.get_nowait()['status'], 'shipped')
+        finally:
+            order_events.broker.unsubscribe(self.order.order_number, subscriber)
+
+    def test_view_streams_and_caps_connections(self):
+        """Test the endpoint streams events and refuses streams over the cap"""
+        url = reverse('orders:order_status_stream', args=[self.order.order_number])
+        response = self.client.get(url)
+        self.assertEqual(response['Content-Type'], 'text/event-stream')
+        body = b''.join(response.streaming_content).decode()
+        response.close()
+        self.assertIn('event: status', body)
+
+        with override_settings(ORDER_EVENTS_MAX_CONNECTIONS=0):
+            self.assertEqual(self.client.get(url).status_code, 503)
+        self.assertEqual(order_events.broker.connections, 0)
+        self.assertEqual(
+            self.client.get(reverse('orders:order_status_stream', args=['missing'])).status_code, 404
+        )
+
+    def test_connection_released_while_streaming(self):
+        """Test the stream closes its database connection before and between heartbeats"""
+        url = reverse('orders:order_status_stream', args=[self.order.order_number])
+        with mock.patch('orders.order_events.release_connection') as release:
+            response = self.client.get(url)
+            self.assertEqual(release.call_count, 1)
+            b''.join(response.streaming_content)
+            response.close()
+        self.assertGreater(release.call_count, 2)
@@ -0,0 +1,91 @@
+"""
+Tests for the order history page
+"""
+from datetime import date, datetime
+from decimal import Decimal
+from django.contrib.auth.models import User
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+from orders.models import Order, OrderLineItem
+from products.models import Product, Category
+
+
+class OrderHistoryTest(TestCase):
+    """Test order history filters and query count"""
+
+    def setUp(self):
+        self.user = User.objects.create_user(username='rider', password='testpass123')
+        self.client.force_login(self.user)
+        category = Category.objects.create(name='accessories', friendly_name='Accessories')
+        self.product = Product.objects.create(
+            name='Bike Lock', price=Decimal('20.00'), category=category, stock_quantity=500, in_stock=True
+        )
+
+    def create_order(self, placed=None, full_name='Test Rider'):
+        order = Order.objects.create(
+            user_profile=self.user.userprofile,
+            full_name=full_name,
+            email='rider@example.com',
+            street_address1='Main Street 1',
+            town_or_city='Wiesbaden',
+            postcode='65183',
+            country='DE'
+        )
+        OrderLineItem.objects.create(order=order, product=self.product, quantity=2)
+        OrderLineItem.objects.create(order=order, product=self.product, quantity=1)
+        if placed:
+            Order.objects.filter(pk=order.pk).update(date=placed)
+        return order
+
+    def history(self, **params):
+        return self.client.get(reverse('orders:order_history'), params)
+
+    def test_item_count_is_stored(self):
+        """Test line item changes keep the stored item count current"""
+        order = self.create_order()
+        self.assertEqual(order.item_count, 3)
+        order.lineitems.first().delete()
+        order.refresh_from_db()
+        self.assertEqual(order.total_items, 1)
+
+    def test_query_count_is_constant(self):
+        """Test the page doesn't query per order"""
+        self.create_order()
+        self.history()
+        with CaptureQueriesContext(connection) as one_order:
+            response = self.history()
+        self.assertContains(response, '<td>3</td>', html=True)
+
+        for _ in range(9):
+            self.create_order()
+        with CaptureQueriesContext(connection) as ten_orders:
+            self.history()
+        self.assertEqual(len(one_order), len(ten_orders))
+
+    def test_date_range_includes_whole_days(self):
+        """Test from/to dates cover the full first and last day"""
+        tz = timezone.get_current_timezone()
+        early = self.create_order(datetime(2025, 3, 1, 0, 0, tzinfo=tz))
+        late = self.create_order(datetime(2025, 3, 2, 23, 59, tzinfo=tz))
+        self.create_order(datetime(2025, 3, 3, 0, 0, tzinfo=tz))
+        response = self.history(date_from=date(2025, 3, 1), date_to=date(2025, 3, 2))
+        self.assertEqual(set(response.context['orders']), {early, late})
+
+    def test_search_by_order_number_or_name(self):
+        """Test searches match order number prefixes, names and emails"""
+        order = self.create_order()
+        other = self.create_order(full_name='Someone Else')
+        response = self.history(search_query=order.order_number[:8].lower())
+        self.assertEqual(list(response.context['orders']), [order])
+        response = self.history(search_query=order.order_number[4:12])
+        self.assertEqual(list(response.context['orders']), [])
+        response = self.history(search_query='someone')
+        self.assertEqual(list(response.context['orders']), [other])
+
+        # Hex-looking words are still names and emails
+        facade = self.create_order(full_name='Ada Facade')
+        response = self.history(search_query='facade')
+        self.assertEqual(list(response.context['orders']), [facade])
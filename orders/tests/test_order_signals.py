@@ -0,0 +1,121 @@
+"""
+Tests for order status change handling
+"""
+from decimal import Decimal
+from django.core import mail
+from django.db import transaction
+from django.test import TestCase, TransactionTestCase
+from orders.models import Order, OrderLineItem
+from products.models import Product, Category
+
+
+class OrderStatusSignalTest(TestCase):
+    """Test status changes are detected from loaded state and acted on after commit"""
+
+    def setUp(self):
+        category = Category.objects.create(name='accessories', friendly_name='Accessories')
+        self.product = Product.objects.create(
+            name='Bike Lock', price=Decimal('20.00'), category=category, stock_quantity=5, in_stock=True
+        )
+        order = Order.objects.create(
+            full_name='Test Rider',
+            email='rider@example.com',
+            street_address1='Main Street 1',
+            town_or_city='Wiesbaden',
+            postcode='65183',
+            country='DE',
+            status='processing'
+        )
+        OrderLineItem.objects.create(order=order, product=self.product, quantity=2)
+        self.order = Order.objects.get(pk=order.pk)
+
+    def test_plain_save_is_one_update(self):
+        """Test saving without a status change doesn't read the row first"""
+        self.order.order_notes = 'Leave at the door'
+        with self.assertNumQueries(1):
+            self.order.save()
+        with self.assertNumQueries(2):
+            self.order.update_total()
+
+    def test_notifications_wait_for_commit(self):
+        """Test stock is restored in the transaction and emails wait for commit"""
+        with self.captureOnCommitCallbacks(execute=True):
+            self.order.status = 'cancelled'
+            self.order.save()
+            self.assertEqual(len(mail.outbox), 0)
+            self.product.refresh_from_db()
+            self.assertEqual(self.product.stock_quantity, 7)
+        self.assertEqual(len(mail.outbox), 1)
+
+        # The saved status is the new baseline
+        with self.captureOnCommitCallbacks(execute=True):
+            self.order.save()
+        self.assertEqual(len(mail.outbox), 1)
+        self.product.refresh_from_db()
+        self.assertEqual(self.product.stock_quantity, 7)
+
+    def test_refresh_updates_stored_status(self):
+        """Test a refreshed order compares against the refreshed status"""
+        Order.objects.filter(pk=self.order.pk).update(status='cancelled')
+        self.order.refresh_from_db()
+        with self.captureOnCommitCallbacks(execute=True):
+            self.order.save()
+        self.assertEqual(len(mail.outbox), 0)
+        self.product.refresh_from_db()
+        self.assertEqual(self.product.stock_quantity, 5)
+
+    def test_deferred_status_is_read(self):
+        """Test an order loaded without its status still detects changes"""
+        order = Order.objects.defer('status').get(pk=self.order.pk)
+        order.status = 'shipped'
+        with self.captureOnCommitCallbacks(execute=True):
+            order.save()
+        self.assertEqual(len(mail.outbox), 1)
+
+
+class OrderStatusRollbackTest(TransactionTestCase):
+    """Test status changes in transactions that are rolled back"""
+
+    def setUp(self):
+        category = Category.objects.create(name='accessories', friendly_name='Accessories')
+        self.product = Product.objects.create(
+            name='Bike Lock', price=Decimal('20.00'), category=category, stock_quantity=5, in_stock=True
+        )
+        order = Order.objects.create(
+            full_name='Test Rider',
+            email='rider@example.com',
+            street_address1='Main Street 1',
+            town_or_city='Wiesbaden',
+            postcode='65183',
+            country='DE',
+            status='processing'
+        )
+        OrderLineItem.objects.create(order=order, product=self.product, quantity=2)
+        self.order = Order.objects.get(pk=order.pk)
+        mail.outbox = []
+
+    def test_rolled_back_change_has_no_effect(self):
+        """Test a cancellation that is rolled back sends nothing and keeps the stock"""
+        with transaction.atomic():
+            self.order.status = 'cancelled'
+            self.order.save()
+            self.assertEqual(self.order.stored_value('status'), 'cancelled')
+            transaction.set_rollback(True)
+        self.assertEqual(len(mail.outbox), 0)
+        self.product.refresh_from_db()
+        self.assertEqual(self.product.stock_quantity, 5)
+
+        # The rolled back save doesn't count as the stored status
+        self.assertEqual(self.order.stored_value('status'), 'processing')
+        self.order.save()
+        self.assertEqual(len(mail.outbox), 1)
+        self.product.refresh_from_db()
+        self.assertEqual(self.product.stock_quantity, 7)
+
+    def test_committed_change_is_stored(self):
+        """Test a committed save becomes the stored status"""
+        with transaction.atomic():
+            self.order.status = 'shipped'
+            self.order.save()
+        self.assertEqual(self.order.stored_value('status'), 'shipped')
+        self.assertEqual(len(mail.outbox), 1)
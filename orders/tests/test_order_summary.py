@@ -0,0 +1,70 @@
+"""
+Tests for prefetched order summaries
+"""
+from decimal import Decimal
+from django.contrib.auth.models import User
+from django.core import mail
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from orders.emails import send_order_confirmation_email
+from orders.models import Order, OrderLineItem
+from orders.summary import OrderSummary
+from products.models import Product, Category, Size
+
+
+class OrderSummaryTest(TestCase):
+    """Test order pages, emails and JSON render from one prefetch"""
+
+    def setUp(self):
+        self.user = User.objects.create_user(username='rider', password='testpass123')
+        self.client.force_login(self.user)
+        self.category = Category.objects.create(name='clothing', friendly_name='Clothing')
+        self.medium = Size.objects.create(name='M', display_name='Medium')
+        self.order = Order.objects.create(
+            user_profile=self.user.userprofile,
+            full_name='Test Rider',
+            email='rider@example.com',
+            street_address1='Main Street 1',
+            town_or_city='Wiesbaden',
+            postcode='65183',
+            country='DE'
+        )
+        self.add_lines(1)
+
+    def add_lines(self, count):
+        for i in range(count):
+            product = Product.objects.create(
+                name=f'Jersey {Product.objects.count()}', price=Decimal('30.00'),
+                category=self.category, stock_quantity=10, in_stock=True
+            )
+            OrderLineItem.objects.create(order=self.order, product=product, size=self.medium, quantity=2)
+
+    def detail_queries(self):
+        url = reverse('orders:order_detail', args=[self.order.order_number])
+        self.client.get(url)
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        return len(queries)
+
+    def test_detail_page_query_count_is_constant(self):
+        """Test the detail page doesn't query per line item"""
+        one_line = self.detail_queries()
+        self.add_lines(5)
+        self.assertEqual(self.detail_queries(), one_line)
+
+    def test_summary_formats(self):
+        """Test the page, email and JSON summaries share the loaded lines"""
+        order = OrderSummary.queryset().get(pk=self.order.pk)
+        with self.assertNumQueries(0):
+            summary = OrderSummary(order)
+            self.assertEqual(summary.as_dict()['total_items'], 2)
+            self.assertEqual(summary.as_email()['items'][0]['size'], 'Medium')
+            self.assertEqual(summary.as_json()['items'][0]['total'], 60.0)
+
+    def test_confirmation_email_lists_sizes(self):
+        """Test the confirmation email shows each line's size"""
+        self.assertTrue(send_order_confirmation_email(self.order))
+        self.assertIn('(Size: Medium)', mail.outbox[0].body)
@@ -0,0 +1,106 @@
+"""
+Tests for payment error handling
+"""
+import stripe
+from django.core import mail
+from django.core.cache import cache
+from django.test import TestCase
+from orders.models import Order, OrderStatusHistory
+from orders.payment_errors import (
+    PaymentErrorHandler, handle_payment_error, get_error_recovery_instructions
+)
+
+
+class ErrorLookupTest(TestCase):
+    """Test the precompiled error lookup tables"""
+
+    def test_categorize_and_severity(self):
+        """Test categories and severities resolve from the lookup tables"""
+        handler = PaymentErrorHandler()
+        self.assertEqual(handler._categorize_error('card_declined'), 'card_errors')
+        self.assertEqual(handler._categorize_error('rate_limit'), 'api_errors')
+        self.assertEqual(handler._categorize_error('no_such_code'), 'unknown')
+        self.assertEqual(handler._determine_severity('fraudulent', 'card_error'), 'critical')
+        self.assertEqual(handler._determine_severity('lost_card', 'card_error'), 'high')
+        self.assertEqual(handler._determine_severity('incorrect_cvc', 'card_error'), 'medium')
+        self.assertEqual(handler._determine_severity('timeout', 'api_error'), 'low')
+
+    def test_category_fallback_message(self):
+        """Test codes without a message fall back to their category"""
+        error = stripe.error.CardError('Declined', 'card', 'pickup_card')
+        result = handle_payment_error(error)
+        self.assertEqual(result['error_code'], 'pickup_card')
+        self.assertEqual(result['recovery_action'], 'try_different_card')
+
+    def test_recovery_instructions_are_fresh(self):
+        """Test each caller gets its own copy of the recovery instructions"""
+        first = get_error_recovery_instructions('expired_card')
+        first['instructions'].append('Changed by caller')
+        first['message'] = 'Changed by caller'
+
+        second = get_error_recovery_instructions('expired_card')
+        self.assertEqual(second['action'], 'update_card')
+        self.assertEqual(len(second['instructions']), 3)
+        self.assertNotEqual(second['message'], 'Changed by caller')
+        self.assertEqual(
+            get_error_recovery_instructions('made_up_1'),
+            get_error_recovery_instructions('made_up_2'),
+        )
+        self.assertEqual(get_error_recovery_instructions('made_up_1')['action'], 'retry_or_support')
+
+    def test_outage_has_its_own_instructions(self):
+        """Test a provider outage is not described as too many attempts"""
+        instructions = get_error_recovery_instructions('payment_service_unavailable')['instructions']
+        self.assertNotIn("Too many attempts were made recently", instructions)
+        self.assertEqual(
+            get_error_recovery_instructions('rate_limit')['instructions'][1],
+            "Too many attempts were made recently",
+        )
+
+
+class ErrorAggregationTest(TestCase):
+    """Test repeated errors are collapsed into counters"""
+
+    def setUp(self):
+        cache.clear()
+        self.order = Order.objects.create(
+            full_name='John Doe',
+            email='john@example.com',
+            street_address1='123 Main St',
+            town_or_city='Wiesbaden',
+            postcode='65183',
+            country='DE'
+        )
+
+    def error_history(self):
+        return OrderStatusHistory.objects.filter(order=self.order, notes__startswith='Payment error')
+
+    def test_repeated_errors_collapse(self):
+        """Test a burst of identical errors writes one history entry"""
+        error = stripe.error.CardError('Declined', 'card', 'card_declined')
+
+        for _ in range(10):
+            handle_payment_error(error, order=self.order)
+
+        history = self.error_history().get()
+        self.assertIn('card_declined', history.notes)
+        self.assertIn('repeated 8 times', history.notes)
+        self.order.refresh_from_db()
+        self.assertEqual(self.order.order_notes.count('Payment Error'), 1)
+
+    def test_distinct_errors_recorded_separately(self):
+        """Test different error codes each get an entry"""
+        handle_payment_error(stripe.error.CardError('Declined', 'card', 'card_declined'), order=self.order)
+        handle_payment_error(stripe.error.CardError('Expired', 'card', 'expired_card'), order=self.order)
+
+        self.assertEqual(self.error_history().count(), 2)
+
+    def test_critical_notifications_collapse(self):
+        """Test repeated critical errors mail the admin at powers of two only"""
+        error = stripe.error.CardError('Declined', 'card', 'fraudulent')
+
+        for _ in range(10):
+            handle_payment_error(error)
+
+        self.assertEqual(len(mail.outbox), 4)
+        self.assertIn('repeated 8 times', mail.outbox[-1].subject)
@@ -0,0 +1,143 @@
+"""
+Tests for payment gateway adapters
+"""
+from decimal import Decimal
+import stripe
+from django.test import TestCase, Client, override_settings
+from django.urls import reverse
+from orders.fake_stripe_server import FakeStripeServer
+from orders.models import Order
+from orders.payment_gateway import FakeGateway, StripeGateway, get_gateway
+from orders.stripe_utils import create_payment_intent, retrieve_payment_intent
+from products.models import Product, Category
+from shopping_cart.models import Cart
+
+
+@override_settings(PAYMENT_GATEWAY='orders.payment_gateway.FakeGateway')
+class FakeGatewayTest(TestCase):
+    """Test the in-process fake gateway"""
+
+    def test_create_and_confirm_intent(self):
+        """Test a confirmed intent succeeds and emits a webhook event"""
+        gateway = get_gateway()
+        self.assertIsInstance(gateway.gateway, FakeGateway)
+
+        intent = create_payment_intent(Decimal('25.50'), metadata={'cart_id': '1'})
+        self.assertEqual(intent.amount, 2550)
+        self.assertTrue(intent.client_secret.startswith(f'{intent.id}_secret'))
+
+        confirmed = gateway.confirm_intent(intent.id, 'pm_card_visa')
+        self.assertEqual(confirmed.status, 'succeeded')
+        self.assertEqual(retrieve_payment_intent(intent.id).amount_received, 2550)
+        self.assertEqual(gateway.events[-1]['type'], 'payment_intent.succeeded')
+
+    def test_declined_card(self):
+        """Test declined test cards raise Stripe card errors"""
+        gateway = get_gateway()
+        intent = gateway.create_intent(1000, 'eur')
+
+        with self.assertRaises(stripe.error.CardError) as ctx:
+            gateway.confirm_intent(intent.id, 'pm_card_chargeDeclinedInsufficientFunds')
+
+        self.assertEqual(ctx.exception.code, 'card_declined')
+        self.assertEqual(gateway.retrieve_intent(intent.id).status, 'requires_payment_method')
+        self.assertEqual(gateway.events[-1]['type'], 'payment_intent.payment_failed')
+
+    def test_injected_failure(self):
+        """Test injected failures are raised once"""
+        gateway = get_gateway()
+        gateway.fail_next(stripe.error.APIConnectionError('Network down'))
+
+        self.assertIsNone(create_payment_intent(Decimal('10.00')))
+        self.assertIsNotNone(create_payment_intent(Decimal('10.00')))
+
+
+class FakeStripeServerTest(TestCase):
+    """Test StripeGateway against the local HTTP stand-in"""
+
+    def setUp(self):
+        self.server = FakeStripeServer()
+        self.gateway = StripeGateway(
+            api_key='sk_test_fake', api_base=self.server.start(), max_retries=0
+        )
+
+    def tearDown(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+    def test_intent_round_trip(self):
+        """Test intents are created, updated and confirmed over HTTP"""
+        intent = self.gateway.create_intent(1999, 'eur', metadata={'cart_id': '7'})
+        self.assertEqual(intent.metadata['cart_id'], '7')
+
+        updated = self.gateway.modify_intent(intent.id, amount=2999)
+        self.assertEqual(updated.amount, 2999)
+
+        confirmed = self.gateway.confirm_intent(intent.id, 'pm_card_visa')
+        self.assertEqual(confirmed.status, 'succeeded')
+
+    def test_module_settings_untouched(self):
+        """Test the gateway keeps its API base, client and retries to itself"""
+        self.assertEqual(stripe.api_base, 'https://api.stripe.com')
+        self.assertIsNot(stripe.default_http_client, self.gateway.http_client)
+        self.assertEqual(stripe.max_network_retries, 0)
+
+        retrying = StripeGateway(api_key='sk_test_fake', api_base=self.server.url, max_retries=3)
+        self.assertEqual(retrying.http_client._max_network_retries(), 3)
+        self.assertEqual(self.gateway.http_client._max_network_retries(), 0)
+        self.assertEqual(stripe.max_network_retries, 0)
+
+    def test_card_error_over_http(self):
+        """Test card errors are translated back into Stripe exceptions"""
+        intent = self.gateway.create_intent(1999, 'eur')
+        with self.assertRaises(stripe.error.CardError):
+            self.gateway.confirm_intent(intent.id, 'pm_card_chargeDeclined')
+
+
+@override_settings(PAYMENT_GATEWAY='orders.payment_gateway.FakeGateway')
+class OfflineCheckoutTest(TestCase):
+    """Test the whole checkout against the fake gateway"""
+
+    def setUp(self):
+        self.client = Client()
+        self.category = Category.objects.create(name='accessories', friendly_name='Accessories')
+        self.product = Product.objects.create(
+            name='Bike Lock',
+            price=Decimal('60.00'),
+            category=self.category,
+            stock_quantity=5,
+            in_stock=True
+        )
+        self.client.post(
+            reverse('shopping_cart:add_to_cart', args=[self.product.id]),
+            {'quantity': 2}
+        )
+
+    def test_checkout_with_fake_gateway(self):
+        """Test an order is created after the fake payment succeeds"""
+        response = self.client.get(reverse('orders:checkout'))
+        client_secret = response.context['client_secret']
+        self.assertTrue(client_secret.startswith('pi_fake_'))
+
+        get_gateway().confirm_intent(client_secret.split('_secret')[0], 'pm_card_visa')
+
+        response = self.client.post(reverse('orders:checkout'), {
+            'client_secret': client_secret,
+            'full_name': 'Test User',
+            'email': 'test@example.com',
+            'phone_number': '123456789',
+            'street_address1': 'Main Street 1',
+            'town_or_city': 'Wiesbaden',
+            'postcode': '65183',
+            'country': 'DE',
+        })
+
+        order = Order.objects.get()
+        self.assertRedirects(
+            response,
+            reverse('orders:order_confirmation', args=[order.order_number]),
+            fetch_redirect_response=False
+        )
+        self.product.refresh_from_db()
+        self.assertEqual(self.product.stock_quantity, 3)
+        self.assertFalse(Cart.objects.filter(items__isnull=False).exists())
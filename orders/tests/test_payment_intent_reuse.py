@@ -0,0 +1,89 @@
+"""
+Tests for per-cart payment intent reuse
+"""
+from decimal import Decimal
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+from orders.payment_gateway import get_gateway
+from orders.stripe_utils import (
+    get_or_create_cart_payment_intent,
+    forget_cart_payment_intent,
+    get_payment_intent_metrics,
+)
+from products.models import Product, Category
+from shopping_cart.models import Cart, CartItem
+
+
+@override_settings(PAYMENT_GATEWAY='orders.payment_gateway.FakeGateway')
+class CartPaymentIntentReuseTest(TestCase):
+    """Test payment intents are reused per cart"""
+
+    def setUp(self):
+        """Set up test data"""
+        cache.clear()
+        get_gateway().reset()
+        self.category = Category.objects.create(name='accessories', friendly_name='Accessories')
+        self.product = Product.objects.create(
+            name='Bike Lock',
+            price=Decimal('60.00'),
+            category=self.category,
+            stock_quantity=10,
+            in_stock=True
+        )
+        self.cart = Cart.objects.create(session_key='test_session_123')
+        self.item = CartItem.objects.create(cart=self.cart, product=self.product, quantity=1)
+
+    def get_intent(self):
+        return get_or_create_cart_payment_intent(self.cart, self.cart.total)
+
+    def test_unchanged_cart_reuses_intent(self):
+        """Test repeated checkouts of the same cart reuse one intent"""
+        first = self.get_intent()
+        second = self.get_intent()
+
+        self.assertEqual(first.id, second.id)
+        self.assertEqual(first.client_secret, second.client_secret)
+        self.assertEqual(second.status, first.status)
+        self.assertEqual(get_gateway().calls, ['create_intent', 'retrieve_intent'])
+        self.assertEqual(get_payment_intent_metrics(), {'created': 1, 'updated': 0, 'reused': 1})
+
+    def test_paid_unchanged_cart_gets_new_intent(self):
+        """Test an unchanged cart whose intent was paid gets a new intent"""
+        first = self.get_intent()
+        get_gateway().confirm_intent(first.id, 'pm_card_visa')
+
+        second = self.get_intent()
+
+        self.assertNotEqual(first.id, second.id)
+        self.assertEqual(get_payment_intent_metrics()['reused'], 0)
+
+    def test_changed_cart_updates_amount(self):
+        """Test a changed cart updates the existing intent"""
+        first = self.get_intent()
+        self.item.quantity = 2
+        self.item.save()
+
+        second = self.get_intent()
+
+        self.assertEqual(first.id, second.id)
+        self.assertEqual(second.amount, 12000)
+        self.assertEqual(get_gateway().calls, ['create_intent', 'modify_intent'])
+
+    def test_paid_intent_is_replaced(self):
+        """Test a new intent is created when the cached one was paid"""
+        first = self.get_intent()
+        get_gateway().confirm_intent(first.id, 'pm_card_visa')
+        self.item.quantity = 3
+        self.item.save()
+
+        second = self.get_intent()
+
+        self.assertNotEqual(first.id, second.id)
+        self.assertEqual(get_payment_intent_metrics()['created'], 2)
+
+    def test_forget_cart_payment_intent(self):
+        """Test forgetting the cart intent forces a new one"""
+        first = self.get_intent()
+        forget_cart_payment_intent(self.cart.id)
+
+        self.assertNotEqual(first.id, self.get_intent().id)
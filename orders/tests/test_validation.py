@@ -0,0 +1,94 @@
+"""
+Tests for order validation
+"""
+from django.test import TestCase
+from decimal import Decimal
+from orders.forms import OrderForm
+from orders.utils import validate_cart_stock, validate_order_data, get_error_messages
+from products.models import Product, Category, Size
+from shopping_cart.models import Cart, CartItem
+
+
+class CartStockValidationTest(TestCase):
+    """Test batched cart stock validation"""
+
+    def setUp(self):
+        """Set up test data"""
+        self.category = Category.objects.create(
+            name='road_bikes',
+            friendly_name='Road Bikes'
+        )
+        self.small = Size.objects.create(name='S', display_name='Small', sort_order=1)
+        self.large = Size.objects.create(name='L', display_name='Large', sort_order=2)
+        self.bike = Product.objects.create(
+            name='Test Bike',
+            price=Decimal('999.99'),
+            category=self.category,
+            has_sizes=True,
+            stock_quantity=3,
+            in_stock=True
+        )
+        self.bike.sizes.add(self.small, self.large)
+        self.helmet = Product.objects.create(
+            name='Test Helmet',
+            price=Decimal('49.99'),
+            category=self.category,
+            stock_quantity=10,
+            in_stock=True
+        )
+        self.cart = Cart.objects.create(session_key='test_session_123')
+
+    def test_valid_cart_has_no_errors(self):
+        """Test a cart within stock limits passes"""
+        CartItem.objects.create(cart=self.cart, product=self.bike, size=self.small, quantity=1)
+        CartItem.objects.create(cart=self.cart, product=self.helmet, quantity=2)
+
+        cart_items, errors = validate_cart_stock(self.cart)
+
+        self.assertEqual(len(cart_items), 2)
+        self.assertEqual(errors, [])
+
+    def test_quantity_aggregated_across_sizes(self):
+        """Test stock is checked against all sizes of a product combined"""
+        small_item = CartItem.objects.create(cart=self.cart, product=self.bike, size=self.small, quantity=2)
+        large_item = CartItem.objects.create(cart=self.cart, product=self.bike, size=self.large, quantity=2)
+
+        _, errors = validate_cart_stock(self.cart)
+
+        self.assertEqual(len(errors), 2)
+        self.assertEqual({error['item_id'] for error in errors}, {small_item.id, large_item.id})
+        for error in errors:
+            self.assertEqual(error['code'], 'insufficient_stock')
+            self.assertEqual(error['requested'], 4)
+            self.assertEqual(error['available'], 3)
+        self.assertEqual(
+            get_error_messages(errors),
+            ['Only 3 units of Test Bike are available']
+        )
+
+    def test_validation_uses_single_query(self):
+        """Test cart lines, products and sizes are loaded in one query"""
+        CartItem.objects.create(cart=self.cart, product=self.bike, size=self.small, quantity=1)
+        CartItem.objects.create(cart=self.cart, product=self.bike, size=self.large, quantity=1)
+        CartItem.objects.create(cart=self.cart, product=self.helmet, quantity=1)
+
+        with self.assertNumQueries(1):
+            _, errors = validate_cart_stock(self.cart)
+        self.assertEqual(errors, [])
+
+    def test_empty_cart(self):
+        """Test an empty cart is reported"""
+        _, errors = validate_cart_stock(self.cart)
+        self.assertEqual([error['code'] for error in errors], ['empty_cart'])
+
+    def test_order_form_errors_are_structured(self):
+        """Test form errors are returned alongside stock errors"""
+        self.helmet.in_stock = False
+        self.helmet.save()
+        CartItem.objects.create(cart=self.cart, product=self.helmet, quantity=1)
+
+        errors = validate_order_data(OrderForm({}), self.cart)
+        codes = {error['code'] for error in errors}
+
+        self.assertIn('out_of_stock', codes)
+        self.assertIn('invalid_field', codes)
@@ -16,6 +16,7 @@ urlpatterns = [
     
     # AJAX views
     path('ajax/status/<str:order_number>/', views.order_status_ajax, name='ajax_order_status'),
+    path('ajax/status/<str:order_number>/stream/', views.order_status_stream, name='order_status_stream'),
     path('ajax/checkout-summary/', views.checkout_summary_ajax, name='ajax_checkout_summary'),
     path('ajax/create-payment-intent/', views.create_payment_intent_view, name='ajax_create_payment_intent'),
     path('ajax/process-payment/', views.process_payment_view, name='ajax_process_payment'),
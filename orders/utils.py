@@ -1,11 +1,16 @@
 import json
 import logging
+import re
+from datetime import datetime, time
 from decimal import Decimal
 from django.conf import settings
 from django.core.mail import send_mail
+from django.db.models import Q
 from django.template.loader import render_to_string
+from django.utils import timezone
 from django.utils.html import strip_tags
 from .models import Order, OrderLineItem
+from .summary import OrderSummary
 from shopping_cart.utils import get_or_create_cart
 
 logger = logging.getLogger(__name__)
@@ -97,81 +102,126 @@ def get_order_summary(order):
     """
     Get a summary of the order for display
     """
+    return OrderSummary(order).as_dict()
+
+
+def validate_cart_stock(cart, lock=False):
+    """
+    Validate stock for every cart line in a single query
+
+    Cart lines are loaded together with their products and sizes, and the
+    requested quantity is aggregated per product across sizes before it is
+    compared with the available stock.
+
+    Args:
+        cart (Cart): Cart to validate
+        lock (bool): Lock the product rows (SELECT ... FOR UPDATE) so stock
+            cannot change before the order is created. Only meaningful
+            inside ``transaction.atomic()``.
+
+    Returns:
+        tuple: (cart_items: list, errors: list of dicts)
+    """
+    if not cart:
+        return [], [_cart_error('empty_cart', "Cannot checkout with an empty cart")]
+
+    items = cart.items.select_related('product', 'size')
+    if lock:
+        items = items.select_for_update(of=('product',))
+    cart_items = list(items)
+
+    if sum(item.quantity for item in cart_items) == 0:
+        return cart_items, [_cart_error('empty_cart', "Cannot checkout with an empty cart")]
+
+    # Total quantity requested per product, all sizes combined
+    requested = {}
+    for item in cart_items:
+        requested[item.product_id] = requested.get(item.product_id, 0) + item.quantity
+
+    errors = []
+    for item in cart_items:
+        product = item.product
+        if not product.in_stock:
+            errors.append(_line_error(
+                item, 'out_of_stock', f"{product.name} is no longer in stock",
+                requested=requested[product.id], available=0,
+            ))
+        elif product.stock_quantity < requested[product.id]:
+            errors.append(_line_error(
+                item, 'insufficient_stock',
+                f"Only {product.stock_quantity} units of {product.name} are available",
+                requested=requested[product.id], available=product.stock_quantity,
+            ))
+
+    return cart_items, errors
+
+
+def _cart_error(code, message):
+    """Build a structured error that is not tied to a cart line"""
+    return {
+        'code': code,
+        'message': message,
+        'item_id': None,
+        'product_id': None,
+        'size_id': None,
+    }
+
+
+def _line_error(item, code, message, requested, available):
+    """Build a structured error for a single cart line"""
     return {
-        'order_number': order.order_number,
-        'date': order.date,
-        'status': order.status,
-        'full_name': order.full_name,
-        'email': order.email,
-        'delivery_address': {
-            'street_address1': order.street_address1,
-            'street_address2': order.street_address2,
-            'town_or_city': order.town_or_city,
-            'county': order.county,
-            'postcode': order.postcode,
-            'country': order.country,
-        },
-        'items': [
-            {
-                'product': item.product,
-                'size': item.size,
-                'quantity': item.quantity,
-                'lineitem_total': item.lineitem_total,
-            }
-            for item in order.lineitems.all()
-        ],
-        'order_total': order.order_total,
-        'delivery_cost': order.delivery_cost,
-        'grand_total': order.grand_total,
-        'total_items': order.total_items,
+        'code': code,
+        'message': message,
+        'item_id': item.id,
+        'product_id': item.product_id,
+        'product_name': item.product.name,
+        'size_id': item.size_id,
+        'size_name': item.size.display_name if item.size else None,
+        'quantity': item.quantity,
+        'requested': requested,
+        'available': available,
     }
 
 
-def validate_order_data(order_form, cart):
+def validate_order_data(order_form, cart, lock=False):
     """
     Validate order data before creation
+
+    Returns:
+        list: Structured errors (dicts with at least ``code`` and ``message``)
     """
-    errors = []
-    
-    # Check if cart is not empty
-    if not cart or cart.total_items == 0:
-        errors.append("Cannot checkout with an empty cart")
-    
-    # Check if all cart items are still in stock
-    if cart:
-        for cart_item in cart.items.all():
-            if not cart_item.product.in_stock:
-                errors.append(f"{cart_item.product.name} is no longer in stock")
-            elif cart_item.product.stock_quantity < cart_item.quantity:
-                errors.append(
-                    f"Only {cart_item.product.stock_quantity} units of "
-                    f"{cart_item.product.name} are available"
-                )
-    
+    _, errors = validate_cart_stock(cart, lock=lock)
+
     # Validate form data
     if not order_form.is_valid():
         for field, field_errors in order_form.errors.items():
             for error in field_errors:
-                errors.append(f"{field}: {error}")
-    
+                errors.append({
+                    'code': 'invalid_field',
+                    'message': f"{field}: {error}",
+                    'field': field,
+                })
+
     return errors
 
 
+def get_error_messages(errors):
+    """
+    Flatten structured validation errors into unique display messages
+
+    Lines of the same product in different sizes share one stock message,
+    so duplicates are dropped while preserving order.
+    """
+    return list(dict.fromkeys(error['message'] for error in errors))
+
+
 def update_product_stock(order):
     """
     Update product stock quantities after order creation
     """
-    for line_item in order.lineitems.all():
+    for line_item in order.lineitems.select_related('product'):
         product = line_item.product
-        if product.stock_quantity >= line_item.quantity:
-            product.stock_quantity -= line_item.quantity
-            
-            # Mark product as out of stock if quantity reaches 0
-            if product.stock_quantity == 0:
-                product.in_stock = False
-            
-            product.save()
-        else:
+        if not product.adjust_stock(-line_item.quantity):
             # This shouldn't happen if validation is working correctly
             raise ValueError(
                 f"Insufficient stock for {product.name}. "
@@ -183,10 +233,8 @@ def restore_product_stock(order):
     """
     Restore product stock quantities if order is cancelled
     """
-    for line_item in order.lineitems.all():
-        product = line_item.product
-        product.stock_quantity += line_item.quantity
-        product.save()
+    for line_item in order.lineitems.select_related('product'):
+        line_item.product.adjust_stock(line_item.quantity)
 
 
 def get_user_orders(user):
@@ -201,30 +249,36 @@ def get_user_orders(user):
         return Order.objects.none()
 
 
+ORDER_NUMBER_PREFIX = re.compile(r'^[0-9A-Fa-f]{4,32}$')
+
+
+def order_search_filter(query):
+    """
+    Filter for the order history search box
+
+    Text is searched for in the name and email. Anything that could start
+    an order number (hex, at least four characters) is also matched as a
+    prefix of the upper case order numbers, which the order_number_prefix_idx
+    index serves on PostgreSQL. The search runs within one customer's
+    orders, which order_profile_date_idx narrows down first.
+    """
+    query = query.strip()
+    text = Q(full_name__icontains=query) | Q(email__icontains=query)
+    if ORDER_NUMBER_PREFIX.match(query):
+        return Q(order_number__startswith=query.upper()) | text
+    return text
+
+
+def start_of_day(day):
+    """Aware datetime at midnight of a date in the current time zone"""
+    return timezone.make_aware(datetime.combine(day, time.min))
+
+
 def format_order_for_email(order):
     """
     Format order data for email templates
     """
-    return {
-        'order_number': order.order_number,
-        'date': order.date.strftime('%B %d, %Y at %I:%M %p'),
-        'customer_name': order.full_name,
-        'customer_email': order.email,
-        'delivery_address': f"{order.street_address1}, {order.town_or_city}, {order.postcode}, {order.country}",
-        'items': [
-            {
-                'name': item.product.name,
-                'size': item.size.display_name if item.size else 'N/A',
-                'quantity': item.quantity,
-                'price': f"€{item.product.price:.2f}",
-                'total': f"€{item.lineitem_total:.2f}",
-            }
-            for item in order.lineitems.all()
-        ],
-        'subtotal': f"€{order.order_total:.2f}",
-        'delivery': f"€{order.delivery_cost:.2f}",
-        'total': f"€{order.grand_total:.2f}",
-    }
+    return OrderSummary(order).as_email()
 
 
 def send_order_confirmation_email(order):
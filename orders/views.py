@@ -1,21 +1,27 @@
-from django.shortcuts import render, redirect, get_object_or_404
+from datetime import timedelta
+from django.shortcuts import render, redirect
 from django.contrib import messages
 from django.contrib.auth.decorators import login_required
 from django.core.paginator import Paginator
-from django.db.models import Q
+from django.db import transaction
 from django.http import HttpResponseForbidden
 from django.conf import settings
 from shopping_cart.utils import get_or_create_cart, clear_cart
 from .models import Order, OrderLineItem
 from .forms import OrderForm, OrderSearchForm
+from .summary import OrderSummary
 from .utils import (
     create_order_from_cart, 
     validate_order_data, 
+    get_error_messages,
     update_product_stock,
     get_user_orders,
-    get_order_summary
+    order_search_filter,
+    start_of_day
 )
 from .emails import send_order_confirmation_email
+from .circuit_breaker import CircuitOpenError
+from wiesbaden_cyclery.async_views import async_require_GET, database_sync_to_async
 
 
 def checkout(request):
@@ -42,12 +48,11 @@ def checkout(request):
         
         # Verify payment intent with Stripe
         try:
-            import stripe
-            stripe.api_key = settings.STRIPE_SECRET_KEY
+            from .payment_gateway import get_gateway
             
             # Extract payment intent ID from client secret
             payment_intent_id = client_secret.split('_secret')[0]
-            payment_intent = stripe.PaymentIntent.retrieve(payment_intent_id)
+            payment_intent = get_gateway().retrieve_intent(payment_intent_id)
             
             # Check if payment was successful
             if payment_intent.status != 'succeeded':
@@ -57,51 +62,59 @@ def checkout(request):
                 )
                 return redirect('orders:checkout')
                 
+        except CircuitOpenError as e:
+            # Stripe is unavailable - fail fast instead of waiting for timeouts
+            messages.error(request, get_error_recovery_instructions(e.code)['message'])
+            return redirect('orders:checkout')
         except Exception as e:
             messages.error(request, f'Payment verification failed: {str(e)}')
             return redirect('orders:checkout')
         
-        # Validate order data
-        validation_errors = validate_order_data(form, cart)
-        if validation_errors:
-            for error in validation_errors:
-                messages.error(request, error)
-        else:
-            try:
-                # Create order from cart
-                order = create_order_from_cart(request, form)
-                
-                # Update product stock
-                update_product_stock(order)
-                
-                # Send order confirmation email
-                email_sent = send_order_confirmation_email(order)
-                
-                # Clear the cart
-                clear_cart(request)
-                
-                # Success message
-                if email_sent:
-                    messages.success(
-                        request, 
-                        f'Order {order.order_number} has been created successfully! '
-                        f'A confirmation email has been sent to {order.email}.'
-                    )
-                else:
-                    messages.success(
-                        request, 
-                        f'Order {order.order_number} has been created successfully!'
-                    )
-                    messages.warning(
-                        request,
-                        'Note: Confirmation email could not be sent. Please check your email settings.'
-                    )
-                
-                # Redirect to order confirmation
-                return redirect('orders:order_confirmation', order_number=order.order_number)
-                
-            except Exception as e:
-                messages.error(request, f'There was an error processing your order: {str(e)}')
+        # Validate order data and create the order while the stock rows are locked
+        order = None
+        try:
+            with transaction.atomic():
+                validation_errors = validate_order_data(form, cart, lock=True)
+                if not validation_errors:
+                    # Create order from cart
+                    order = create_order_from_cart(request, form)
+                    
+                    # Update product stock
+                    update_product_stock(order)
+        except Exception as e:
+            validation_errors = []
+            messages.error(request, f'There was an error processing your order: {str(e)}')
+        
+        for error_message in get_error_messages(validation_errors):
+            messages.error(request, error_message)
+        
+        if order:
+            # Send order confirmation email
+            email_sent = send_order_confirmation_email(order)
+            
+            # Clear the cart and its paid payment intent
+            clear_cart(request)
+            forget_cart_payment_intent(cart.id)
+            
+            # Success message
+            if email_sent:
+                messages.success(
+                    request, 
+                    f'Order {order.order_number} has been created successfully! '
+                    f'A confirmation email has been sent to {order.email}.'
+                )
+            else:
+                messages.success(
+                    request, 
+                    f'Order {order.order_number} has been created successfully!'
+                )
+                messages.warning(
+                    request,
+                    'Note: Confirmation email could not be sent. Please check your email settings.'
+                )
+            
+            # Redirect to order confirmation
+            return redirect('orders:order_confirmation', order_number=order.order_number)
     else:
         # Pre-populate form with user profile data if available
         initial_data = {}
@@ -128,10 +141,12 @@ def checkout(request):
     # Create Stripe payment intent for the checkout
     stripe_total = round(cart.total * 100)  # Stripe expects amount in cents
     client_secret = None
+    payment_error = None
     
     try:
-        from .stripe_utils import create_payment_intent
-        payment_intent = create_payment_intent(
+        from .stripe_utils import get_or_create_cart_payment_intent
+        payment_intent = get_or_create_cart_payment_intent(
+            cart,
             amount=cart.total,
             currency=settings.STRIPE_CURRENCY,
             metadata={
@@ -141,6 +156,13 @@ def checkout(request):
         )
         if payment_intent:
             client_secret = payment_intent.client_secret
+    except CircuitOpenError as e:
+        # Let the checkout JS show recovery instructions and retry later
+        payment_error = dict(
+            get_error_recovery_instructions(e.code),
+            error_code=e.code,
+            retry_after=e.retry_after,
+        )
     except Exception as e:
         messages.error(request, f'Payment system error: {str(e)}')
     
@@ -151,6 +173,7 @@ def checkout(request):
         'stripe_public_key': settings.STRIPE_PUBLIC_KEY,
         'stripe_currency': settings.STRIPE_CURRENCY,
         'client_secret': client_secret,
+        'payment_error': payment_error,
         'product_count': cart.total_items,
         'total': cart.subtotal,
         'delivery': cart.delivery_cost,
@@ -164,23 +187,22 @@ def order_confirmation(request, order_number):
     """
     Display order confirmation page
     """
-    order = get_object_or_404(Order, order_number=order_number)
+    summary = OrderSummary.get_or_404(order_number=order_number)
+    order = summary.order
     
     # Check if user has permission to view this order
     if request.user.is_authenticated:
         # Authenticated users can only view their own orders
-        if order.user_profile and order.user_profile.user != request.user:
+        if order.user_profile and order.user_profile.user_id != request.user.id:
             return HttpResponseForbidden("You don't have permission to view this order.")
     else:
         # For anonymous users, we'll allow viewing for a short time after creation
         # In a real application, you might want to use a secure token system
         pass
     
-    order_summary = get_order_summary(order)
-    
     context = {
         'order': order,
-        'order_summary': order_summary,
+        'order_summary': summary.as_dict(),
     }
     
     return render(request, 'orders/order_confirmation.html', context)
@@ -202,20 +224,18 @@ def order_history(request):
         date_to = search_form.cleaned_data.get('date_to')
         
         if search_query:
-            orders = orders.filter(
-                Q(order_number__icontains=search_query) |
-                Q(full_name__icontains=search_query) |
-                Q(email__icontains=search_query)
-            )
+            orders = orders.filter(order_search_filter(search_query))
         
         if status:
             orders = orders.filter(status=status)
         
+        # Compare against day boundaries so the (user_profile, date) index
+        # applies; date__date casts every row
         if date_from:
-            orders = orders.filter(date__date__gte=date_from)
+            orders = orders.filter(date__gte=start_of_day(date_from))
         
         if date_to:
-            orders = orders.filter(date__date__lte=date_to)
+            orders = orders.filter(date__lt=start_of_day(date_to + timedelta(days=1)))
     
     # Pagination
     paginator = Paginator(orders, 10)  # Show 10 orders per page
@@ -236,17 +256,16 @@ def order_detail(request, order_number):
     """
     Display detailed view of a specific order
     """
-    order = get_object_or_404(Order, order_number=order_number)
+    summary = OrderSummary.get_or_404(order_number=order_number)
+    order = summary.order
     
     # Check if user has permission to view this order
-    if order.user_profile and order.user_profile.user != request.user:
+    if order.user_profile and order.user_profile.user_id != request.user.id:
         return HttpResponseForbidden("You don't have permission to view this order.")
     
-    order_summary = get_order_summary(order)
-    
     context = {
         'order': order,
-        'order_summary': order_summary,
+        'order_summary': summary.as_dict(),
     }
     
     return render(request, 'orders/order_detail.html', context)
@@ -281,23 +300,35 @@ def order_tracking(request):
 
 # AJAX Views for dynamic updates
 
-from django.http import JsonResponse
+from django.core.handlers.asgi import ASGIRequest
+from django.http import JsonResponse, StreamingHttpResponse
 from django.views.decorators.http import require_GET, require_POST
 from django.views.decorators.csrf import csrf_exempt, ensure_csrf_cookie
 from django.conf import settings
-from .stripe_utils import create_payment_intent, get_stripe_error_message
+from .stripe_utils import (
+    create_payment_intent,
+    get_or_create_cart_payment_intent,
+    forget_cart_payment_intent,
+    get_stripe_error_message
+)
 from .payment_errors import handle_payment_error, get_error_recovery_instructions
+from . import order_events
 import json
 import stripe
 import logging
+import time
 
 logger = logging.getLogger(__name__)
 
-@require_GET
-def order_status_ajax(request, order_number):
+@async_require_GET
+async def order_status_ajax(request, order_number):
     """
     AJAX view to get order status
     """
+    return await database_sync_to_async(_order_status_ajax)(request, order_number)
+
+
+def _order_status_ajax(request, order_number):
     try:
         order = Order.objects.get(order_number=order_number)
         
@@ -322,10 +353,51 @@ def order_status_ajax(request, order_number):
 
 
 @require_GET
-def checkout_summary_ajax(request):
+def order_status_stream(request, order_number):
+    """
+    Server-sent events stream of an order's status
+    """
+    if isinstance(request, ASGIRequest):
+        # Django 3.2 iterates streaming responses on the event loop, where
+        # this blocking stream would stall every other request
+        return JsonResponse({'error': 'Live updates unavailable'}, status=503)
+
+    loaded_at = time.time()
+    try:
+        order = Order.objects.select_related('user_profile').get(order_number=order_number)
+    except Order.DoesNotExist:
+        return JsonResponse({'error': 'Order not found'}, status=404)
+
+    if request.user.is_authenticated:
+        if order.user_profile and order.user_profile.user_id != request.user.id:
+            return JsonResponse({'error': 'Permission denied'}, status=403)
+
+    if not order_events.broker.acquire(settings.ORDER_EVENTS_MAX_CONNECTIONS):
+        response = JsonResponse({'error': 'Too many live connections'}, status=503)
+        response['Retry-After'] = settings.ORDER_EVENTS_RETRY_MS // 1000
+        return response
+
+    stream = order_events.OrderStatusStream(
+        order, loaded_at, last_event_id=request.META.get('HTTP_LAST_EVENT_ID')
+    )
+    # Don't hold a database connection for the life of the stream
+    order_events.release_connection()
+    response = StreamingHttpResponse(stream, content_type='text/event-stream')
+    response['Cache-Control'] = 'no-cache'
+    # Stop nginx-style proxies from buffering the stream
+    response['X-Accel-Buffering'] = 'no'
+    return response
+
+
+@async_require_GET
+async def checkout_summary_ajax(request):
     """
     AJAX view to get checkout summary
     """
+    return await database_sync_to_async(_checkout_summary_ajax)(request)
+
+
+def _checkout_summary_ajax(request):
     try:
         cart = get_or_create_cart(request)
         
@@ -371,9 +443,10 @@ def create_payment_intent_view(request):
             'items_count': str(cart.total_items),
         }
         
-        # Create payment intent with comprehensive error handling
+        # Reuse or create the cart's payment intent with comprehensive error handling
         try:
-            payment_intent = create_payment_intent(
+            payment_intent = get_or_create_cart_payment_intent(
+                cart,
                 amount=cart.total,
                 currency=settings.STRIPE_CURRENCY,
                 metadata=metadata
@@ -395,6 +468,11 @@ def create_payment_intent_view(request):
                     'retry_allowed': True
                 }, status=500)
                 
+        except CircuitOpenError as e:
+            # Stripe is unavailable - fail fast with a recovery code
+            error_response = handle_payment_error(e, context='payment_intent_creation')
+            error_response['retry_after'] = e.retry_after
+            return JsonResponse(error_response, status=503)
         except stripe.error.StripeError as e:
             # Handle Stripe-specific errors
             error_response = handle_payment_error(e, context='payment_intent_creation')
@@ -432,44 +510,48 @@ def process_payment_view(request):
         order_form_data = data.get('order_form', {})
         form = OrderForm(order_form_data)
         
-        # Validate order data
-        validation_errors = validate_order_data(form, cart)
-        if validation_errors:
-            return JsonResponse({
-                'error': 'Order validation failed',
-                'validation_errors': validation_errors
-            }, status=400)
-        
-        # Create order with comprehensive error handling
+        # Validate and create the order while the stock rows are locked
         try:
-            order = create_order_from_cart(request, form)
-            order.payment_intent_id = payment_intent_id
-            order.payment_status = 'processing'
-            order.save()
-            
-            # Update product stock with error handling
-            try:
-                update_product_stock(order)
-            except ValueError as stock_error:
-                # Stock error - cancel the order
-                order.status = 'cancelled'
-                order.payment_status = 'failed'
-                order.order_notes = f"Order cancelled due to stock error: {str(stock_error)}"
+            with transaction.atomic():
+                validation_errors = validate_order_data(form, cart, lock=True)
+                if validation_errors:
+                    return JsonResponse({
+                        'error': 'Order validation failed',
+                        'validation_errors': get_error_messages(validation_errors),
+                        'errors': validation_errors,
+                    }, status=400)
+                
+                order = create_order_from_cart(request, form)
+                order.payment_intent_id = payment_intent_id
+                order.payment_status = 'processing'
                 order.save()
                 
-                return JsonResponse({
-                    'success': False,
-                    'error': 'Some items are no longer in stock. Your payment will be refunded.',
-                    'error_code': 'insufficient_stock',
-                    'retry_allowed': False
-                }, status=400)
+                # Update product stock with error handling
+                try:
+                    with transaction.atomic():
+                        update_product_stock(order)
+                except ValueError as stock_error:
+                    # Stock error - cancel the order
+                    order.status = 'cancelled'
+                    order.payment_status = 'failed'
+                    order.order_notes = f"Order cancelled due to stock error: {str(stock_error)}"
+                    order.save()
+                    
+                    return JsonResponse({
+                        'success': False,
+                        'error': 'Some items are no longer in stock. Your payment will be refunded.',
+                        'error_code': 'insufficient_stock',
+                        'retry_allowed': False
+                    }, status=400)
             
-            # Clear the cart
+            # Clear the cart and its paid payment intent
             clear_cart(request)
+            forget_cart_payment_intent(cart.id)
             
             return JsonResponse({
                 'success': True,
                 'order_number': order.order_number,
+                'order': OrderSummary(order).as_json(),
                 'redirect_url': f'/orders/confirmation/{order.order_number}/'
             })
             
@@ -640,6 +722,10 @@ def retry_payment_intent(request):
                     'error': 'Failed to create retry payment intent'
                 }, status=500)
                 
+        except CircuitOpenError as e:
+            error_response = handle_payment_error(e, order, 'payment_retry')
+            error_response['retry_after'] = e.retry_after
+            return JsonResponse(error_response, status=503)
         except stripe.error.StripeError as e:
             error_response = handle_payment_error(e, order, 'payment_retry')
             return JsonResponse(error_response, status=400)
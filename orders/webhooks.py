@@ -9,7 +9,7 @@ from django.conf import settings
 from django.db import transaction
 from django.core.cache import cache
 from .models import Order, OrderStatusHistory
-from .stripe_utils import handle_payment_intent_webhook
+from .stripe_utils import handle_payment_intent_webhook, forget_cart_payment_intent
 from .utils import send_order_confirmation_email, send_order_notification_email
 
 logger = logging.getLogger(__name__)
@@ -105,6 +105,12 @@ def process_webhook_event(event):
     event_type = event['type']
     event_data = event['data']['object']
     
+    # A paid or cancelled intent can no longer be reused for its cart
+    if event_type in ('payment_intent.succeeded', 'payment_intent.canceled'):
+        cart_id = (event_data.get('metadata') or {}).get('cart_id')
+        if cart_id:
+            forget_cart_payment_intent(cart_id)
+    
     try:
         if event_type == 'payment_intent.succeeded':
             return handle_payment_succeeded(event_data)
@@ -0,0 +1,382 @@
+"""
+Bulk catalog import
+
+Rows are streamed from CSV, JSON arrays or NDJSON, matched to products by
+SKU and applied in batches: one query loads the existing products of a
+batch, the diff is computed in Python and the changes are written with
+bulk_create/bulk_update. Size links are written straight to the M2M
+through table.
+"""
+import csv
+import json
+import re
+import time
+from collections import Counter
+from decimal import Decimal, InvalidOperation
+
+from django.db import transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from .models import Category, Product, Size, normalize_sku
+from .signals import products_changed
+
+IMPORT_BATCH_SIZE = 1000
+
+# Product fields that can be set from an import row
+IMPORT_FIELDS = (
+    'name', 'description', 'category', 'has_sizes', 'price', 'rating',
+    'image_url', 'in_stock', 'stock_quantity', 'wheel_size', 'gear_system',
+    'bicycle_features',
+)
+SIZE_SEPARATOR = '|'
+TRUE_VALUES = frozenset(['1', 'true', 'yes', 'y', 'on'])
+FALSE_VALUES = frozenset(['0', 'false', 'no', 'n', 'off', ''])
+
+_WHITESPACE = re.compile(r'[\s,]*')
+
+
+class CatalogRowError(ValueError):
+    """Raised for import rows that can't be applied"""
+
+
+class ImportReport:
+    """
+    Counters and errors collected during an import
+    """
+
+    def __init__(self, dry_run=False):
+        self.dry_run = dry_run
+        self.rows = 0
+        self.created = 0
+        self.updated = 0
+        self.unchanged = 0
+        self.size_links_added = 0
+        self.size_links_removed = 0
+        self.changed_fields = Counter()
+        self.errors = []
+        self.started = time.monotonic()
+        self.elapsed = 0
+
+    def add_error(self, line, sku, message):
+        self.errors.append({'line': line, 'sku': sku, 'message': message})
+
+    @property
+    def rows_per_second(self):
+        return self.rows / self.elapsed if self.elapsed else 0
+
+
+def iter_csv_rows(stream):
+    """Yield (line, row) for each row of a CSV file, line being its line in the file"""
+    reader = csv.DictReader(stream)
+    for row in reader:
+        yield reader.line_num, row
+
+
+def iter_json_rows(stream, chunk_size=65536):
+    """
+    Yield objects from a JSON array or an NDJSON stream
+
+    The input is read in chunks and decoded object by object with
+    ``JSONDecoder.raw_decode``, so large files are never loaded whole.
+    """
+    decoder = json.JSONDecoder()
+    buffer = ''
+    pos = 0
+    eof = False
+    in_array = False
+
+    while True:
+        pos = _WHITESPACE.match(buffer, pos).end()
+        if pos < len(buffer):
+            char = buffer[pos]
+            if char == '[' and not in_array:
+                in_array = True
+                pos += 1
+                continue
+            if char == ']' and in_array:
+                return
+            try:
+                row, pos = decoder.raw_decode(buffer, pos)
+            except json.JSONDecodeError:
+                if eof:
+                    raise
+            else:
+                yield row
+                continue
+        elif eof:
+            return
+
+        chunk = stream.read(chunk_size)
+        eof = not chunk
+        buffer = buffer[pos:] + chunk
+        pos = 0
+
+
+def iter_numbered_json_rows(stream):
+    """Yield (position, object) for each object of a JSON array or NDJSON stream"""
+    return enumerate(iter_json_rows(stream), start=1)
+
+
+# Readers yield (line, row dict) pairs for import_catalog()
+READERS = {
+    'csv': iter_csv_rows,
+    'json': iter_numbered_json_rows,
+}
+
+
+def _blank(value):
+    return value is None or (isinstance(value, str) and not value.strip())
+
+
+def _parse_bool(value):
+    if isinstance(value, bool):
+        return value
+    value = str(value).strip().lower()
+    if value in TRUE_VALUES:
+        return True
+    if value in FALSE_VALUES:
+        return False
+    raise CatalogRowError(f'invalid boolean {value!r}')
+
+
+def _parse_int(value, field):
+    if _blank(value):
+        return None
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        raise CatalogRowError(f'invalid {field} {value!r}')
+
+
+class RowParser:
+    """
+    Convert raw import rows into Product field values
+
+    Categories and sizes are small tables and are looked up by name from
+    maps loaded once per import.
+    """
+
+    def __init__(self):
+        self.categories = {category.name: category for category in Category.objects.all()}
+        self.sizes = dict(Size.objects.values_list('name', 'id'))
+
+    def parse(self, raw):
+        """
+        Args:
+            raw: Row dict from a reader
+
+        Returns:
+            (sku, values, size_ids) where size_ids is None when the row has
+            no sizes column
+        """
+        sku = normalize_sku(raw.get('sku'))
+        if not sku:
+            raise CatalogRowError('missing sku')
+
+        values = {}
+        for field in IMPORT_FIELDS:
+            if field in raw:
+                values[field] = self.parse_field(field, raw[field])
+
+        if 'name' not in values or _blank(values['name']):
+            raise CatalogRowError('missing name')
+        if 'price' not in values:
+            raise CatalogRowError('missing price')
+
+        # Mirror Product.clean(), which bulk writes bypass
+        if 'in_stock' not in values and 'stock_quantity' in values:
+            values['in_stock'] = values['stock_quantity'] > 0
+        if values.get('in_stock') is False:
+            values['stock_quantity'] = 0
+        elif values.get('in_stock') and values.get('stock_quantity', 1) <= 0:
+            raise CatalogRowError('stock_quantity must be greater than 0 when in stock')
+
+        size_ids = None
+        if 'sizes' in raw:
+            size_ids = self.parse_sizes(raw['sizes'])
+        return sku, values, size_ids
+
+    def parse_field(self, field, value):
+        if field == 'price':
+            try:
+                price = Decimal(str(value).strip())
+            except InvalidOperation:
+                raise CatalogRowError(f'invalid price {value!r}')
+            if price < 0:
+                raise CatalogRowError(f'invalid price {value!r}')
+            return price
+        if field == 'category':
+            if _blank(value):
+                return None
+            try:
+                return self.categories[str(value).strip()]
+            except KeyError:
+                raise CatalogRowError(f'unknown category {value!r}')
+        if field in ('has_sizes', 'in_stock'):
+            return _parse_bool(value)
+        if field == 'rating':
+            rating = _parse_int(value, field)
+            if rating is not None and not 1 <= rating <= 5:
+                raise CatalogRowError(f'invalid rating {value!r}')
+            return rating
+        if field == 'stock_quantity':
+            quantity = _parse_int(value, field) or 0
+            if quantity < 0:
+                raise CatalogRowError(f'invalid stock_quantity {value!r}')
+            return quantity
+        if field in ('name', 'description'):
+            return '' if value is None else str(value).strip()
+        return None if _blank(value) else str(value).strip()
+
+    def parse_sizes(self, value):
+        if isinstance(value, str):
+            names = [name.strip() for name in value.split(SIZE_SEPARATOR)]
+        else:
+            names = [str(name).strip() for name in value or []]
+        try:
+            return {self.sizes[name] for name in names if name}
+        except KeyError as e:
+            raise CatalogRowError(f'unknown size {e.args[0]!r}')
+
+
+def _out_of_stock_conflict(product, values):
+    """True if a row would mark a product in stock without stock to sell"""
+    in_stock = values.get('in_stock', product.in_stock)
+    return in_stock and values.get('stock_quantity', product.stock_quantity) <= 0
+
+
+def _field_changed(product, field, value):
+    if field == 'category':
+        return product.category_id != (value.pk if value else None)
+    return getattr(product, field) != value
+
+
+def import_catalog(rows, dry_run=False, batch_size=IMPORT_BATCH_SIZE):
+    """
+    Import catalog rows, matching existing products on SKU
+
+    Args:
+        rows: Iterable of (line, row dict) pairs (see READERS)
+        dry_run: Compute the diff without writing anything
+        batch_size: Rows diffed and written per batch
+
+    Returns:
+        ImportReport
+    """
+    report = ImportReport(dry_run=dry_run)
+    parser = RowParser()
+    batch = {}
+
+    for line, raw in rows:
+        report.rows += 1
+        try:
+            sku, values, size_ids = parser.parse(raw)
+        except CatalogRowError as e:
+            report.add_error(line, raw.get('sku'), str(e))
+            continue
+        # A SKU repeated within a batch: the last row wins
+        batch[sku] = (line, values, size_ids)
+        if len(batch) >= batch_size:
+            _apply_batch(batch, report)
+            batch = {}
+
+    if batch:
+        _apply_batch(batch, report)
+
+    report.elapsed = time.monotonic() - report.started
+    return report
+
+
+def _apply_batch(batch, report):
+    existing = Product.objects.by_skus(batch)
+    now = timezone.now()
+    to_create = []
+    to_update = []
+    update_fields = set()
+    desired_sizes = {}
+
+    for sku, (line, values, size_ids) in batch.items():
+        product = existing.get(sku)
+        if product is not None and _out_of_stock_conflict(product, values):
+            report.add_error(line, sku, 'stock_quantity must be greater than 0 when in stock')
+            continue
+        if product is None:
+            product = Product(sku=sku, **values)
+            if not product.stock_quantity:
+                product.in_stock = False
+            to_create.append(product)
+            report.created += 1
+        else:
+            changed = [field for field, value in values.items() if _field_changed(product, field, value)]
+            if changed:
+                for field in changed:
+                    setattr(product, field, values[field])
+                product.updated_at = now
+                to_update.append(product)
+                update_fields.update(changed)
+                report.changed_fields.update(changed)
+                report.updated += 1
+            else:
+                report.unchanged += 1
+        if size_ids is not None:
+            desired_sizes[sku] = size_ids
+
+    if report.dry_run:
+        _diff_sizes(existing, desired_sizes, report)
+        return
+
+    with transaction.atomic():
+        if to_create:
+            Product.objects.bulk_create(to_create)
+        if to_update:
+            Product.objects.bulk_update(to_update, sorted(update_fields | {'updated_at'}))
+        if desired_sizes:
+            if to_create:
+                # bulk_create doesn't return primary keys on every backend
+                existing.update(Product.objects.by_skus(p.sku for p in to_create))
+            _link_sizes(existing, desired_sizes, report)
+
+    # Bulk writes skip the model signals that normally drop cached summaries
+    products_changed(to_create + to_update)
+
+
+def _current_size_links(product_ids):
+    through = Product.sizes.through
+    links = {}
+    for product_id, size_id in through.objects.filter(
+        product_id__in=product_ids
+    ).values_list('product_id', 'size_id'):
+        links.setdefault(product_id, set()).add(size_id)
+    return links
+
+
+def _diff_sizes(products, desired_sizes, report):
+    """Count size links to add and remove; returns (to_add, to_remove)"""
+    product_ids = {sku: products[sku].pk for sku in desired_sizes if sku in products}
+    current = _current_size_links(list(product_ids.values()))
+    to_add = []
+    to_remove = []
+    for sku, size_ids in desired_sizes.items():
+        product_id = product_ids.get(sku)
+        linked = current.get(product_id, set())
+        to_add.extend((product_id, size_id) for size_id in size_ids - linked)
+        to_remove.extend((product_id, size_id) for size_id in linked - size_ids)
+    report.size_links_added += len(to_add)
+    report.size_links_removed += len(to_remove)
+    return to_add, to_remove
+
+
+def _link_sizes(products, desired_sizes, report):
+    to_add, to_remove = _diff_sizes(products, desired_sizes, report)
+    through = Product.sizes.through
+    if to_remove:
+        removed = Q()
+        for product_id, size_id in to_remove:
+            removed |= Q(product_id=product_id, size_id=size_id)
+        through.objects.filter(removed).delete()
+    if to_add:
+        through.objects.bulk_create(
+            [through(product_id=product_id, size_id=size_id) for product_id, size_id in to_add],
+            ignore_conflicts=True
+        )
@@ -0,0 +1,127 @@
+"""
+Responsive image derivatives for product images
+
+Each uploaded product image is resized to a few widths and saved as JPEG
+and WebP next to the original. The URLs and ready-made srcset strings are
+stored in ``Product.image_derivatives`` so templates never touch the
+original file.
+
+``render_derivatives`` is a pure function of the source bytes, so the
+backfill command can run it in a process pool.
+"""
+import hashlib
+import io
+import os
+
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+
+# name -> max width in pixels
+DERIVATIVE_WIDTHS = {
+    'thumb': 150,
+    'card': 400,
+    'detail': 800,
+}
+DERIVATIVE_FORMATS = {
+    'jpeg': {'format': 'JPEG', 'quality': 82, 'optimize': True, 'progressive': True},
+    'webp': {'format': 'WEBP', 'quality': 80, 'method': 4},
+}
+DERIVATIVE_DIR = 'products/derivatives'
+
+
+def render_derivatives(source):
+    """
+    Resize image bytes to every derivative width and format
+
+    Images are never upscaled.
+
+    Args:
+        source: Original image bytes
+
+    Returns:
+        dict of (name, format) -> (width, bytes)
+    """
+    from PIL import Image, ImageOps
+
+    with Image.open(io.BytesIO(source)) as original:
+        image = ImageOps.exif_transpose(original)
+        if image.mode not in ('RGB', 'L'):
+            image = image.convert('RGB')
+        image.load()
+
+    rendered = {}
+    for name, max_width in DERIVATIVE_WIDTHS.items():
+        width = min(max_width, image.width)
+        height = round(image.height * width / image.width)
+        resized = image.resize((width, height), Image.LANCZOS) if width != image.width else image
+        for fmt, options in DERIVATIVE_FORMATS.items():
+            buffer = io.BytesIO()
+            resized.save(buffer, **options)
+            rendered[(name, fmt)] = (width, buffer.getvalue())
+    return rendered
+
+
+def derivative_path(source_name, source, name, fmt):
+    """Storage path for a derivative, keyed on the source content"""
+    stem = os.path.splitext(os.path.basename(source_name))[0]
+    digest = hashlib.sha256(source).hexdigest()[:12]
+    extension = 'jpg' if fmt == 'jpeg' else fmt
+    return f'{DERIVATIVE_DIR}/{stem}-{digest}-{name}.{extension}'
+
+
+def store_derivatives(source_name, source, rendered, storage=None):
+    """
+    Save rendered derivatives and describe them for Product.image_derivatives
+
+    Returns:
+        dict with the source name, one entry per derivative
+        ({'width', 'jpeg', 'webp'} URLs) and 'srcset' strings per format
+    """
+    storage = storage or default_storage
+    derivatives = {'source': source_name, 'srcset': {}}
+
+    for (name, fmt), (width, content) in rendered.items():
+        path = derivative_path(source_name, source, name, fmt)
+        if not storage.exists(path):
+            path = storage.save(path, ContentFile(content))
+        entry = derivatives.setdefault(name, {'width': width})
+        entry[fmt] = storage.url(path)
+
+    for fmt in DERIVATIVE_FORMATS:
+        # Widths can repeat when the original is small; keep one per width
+        candidates = {}
+        for name in DERIVATIVE_WIDTHS:
+            candidates.setdefault(derivatives[name]['width'], derivatives[name][fmt])
+        derivatives['srcset'][fmt] = ', '.join(
+            f'{url} {width}w' for width, url in sorted(candidates.items())
+        )
+    return derivatives
+
+
+def derivatives_outdated(product):
+    """True if the product's image has no derivatives for its current file"""
+    if not product.image:
+        return bool(product.image_derivatives)
+    return (product.image_derivatives or {}).get('source') != product.image.name
+
+
+def generate_derivatives(product, storage=None):
+    """
+    Build and store derivatives for a product's uploaded image
+
+    Saves only the image_derivatives column.
+    """
+    if product.image:
+        product.image.open('rb')
+        try:
+            source = product.image.read()
+        finally:
+            product.image.close()
+        product.image_derivatives = store_derivatives(
+            product.image.name, source, render_derivatives(source), storage
+        )
+    else:
+        product.image_derivatives = {}
+
+    type(product).objects.filter(pk=product.pk).update(image_derivatives=product.image_derivatives)
+    return product.image_derivatives
@@ -0,0 +1,77 @@
+"""
+Management command to bulk import or update products from CSV/JSON
+"""
+import os
+
+from django.core.management.base import BaseCommand, CommandError
+
+from products.catalog_import import IMPORT_BATCH_SIZE, READERS, import_catalog
+
+FORMAT_BY_EXTENSION = {
+    '.csv': 'csv',
+    '.json': 'json',
+    '.ndjson': 'json',
+    '.jsonl': 'json',
+}
+
+
+class Command(BaseCommand):
+    help = 'Import products from a CSV, JSON or NDJSON file, matching existing products on SKU'
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help='File to import')
+        parser.add_argument(
+            '--format',
+            choices=sorted(READERS),
+            help='Input format (default: from the file extension)',
+        )
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help='Report what would change without writing anything',
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=IMPORT_BATCH_SIZE,
+            help=f'Rows diffed and written per batch (default: {IMPORT_BATCH_SIZE})',
+        )
+
+    def handle(self, *args, **options):
+        path = options['path']
+        input_format = options['format'] or FORMAT_BY_EXTENSION.get(os.path.splitext(path)[1].lower())
+        if input_format is None:
+            raise CommandError('Cannot tell the format from the file name; pass --format')
+
+        try:
+            stream = open(path, newline='', encoding='utf-8')
+        except OSError as e:
+            raise CommandError(f'Cannot open {path}: {e}')
+
+        with stream:
+            report = import_catalog(
+                READERS[input_format](stream),
+                dry_run=options['dry_run'],
+                batch_size=options['batch_size'],
+            )
+
+        title = 'Catalog Import (dry run)' if report.dry_run else 'Catalog Import'
+        self.stdout.write(self.style.SUCCESS(f'=== {title} ==='))
+        self.stdout.write(f'Rows read: {report.rows}')
+        self.stdout.write(f'Created: {report.created}')
+        self.stdout.write(f'Updated: {report.updated}')
+        self.stdout.write(f'Unchanged: {report.unchanged}')
+        self.stdout.write(f'Size links added: {report.size_links_added}')
+        self.stdout.write(f'Size links removed: {report.size_links_removed}')
+        for field, count in report.changed_fields.most_common():
+            self.stdout.write(f'  {field}: {count} changed')
+        self.stdout.write(f'Time: {report.elapsed:.2f}s ({report.rows_per_second:.0f} rows/s)')
+
+        if report.errors:
+            self.stdout.write(self.style.ERROR(f'Errors: {len(report.errors)}'))
+            for error in report.errors[:50]:
+                self.stdout.write(self.style.ERROR(
+                    f"  line {error['line']} (sku {error['sku'] or '-'}): {error['message']}"
+                ))
+            if len(report.errors) > 50:
+                self.stdout.write(self.style.ERROR(f'  ... and {len(report.errors) - 50} more'))
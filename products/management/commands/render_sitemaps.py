@@ -0,0 +1,44 @@
+"""
+Management command to pre-render sitemaps into the cache
+"""
+import time
+
+from django.conf import settings
+from django.contrib.sites.models import Site
+from django.core.exceptions import ImproperlyConfigured
+from django.core.management.base import BaseCommand, CommandError
+
+from wiesbaden_cyclery.sitemaps import prerender_sitemaps
+
+
+class Command(BaseCommand):
+    help = 'Render the sitemap index and every sitemap chunk into the cache'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--domain',
+            default=None,
+            help='Domain used in sitemap URLs (default: the current Site)',
+        )
+        parser.add_argument(
+            '--protocol',
+            default=settings.SITEMAP_PROTOCOL,
+            help=f'Protocol used in sitemap URLs (default: {settings.SITEMAP_PROTOCOL})',
+        )
+
+    def handle(self, *args, **options):
+        self.stdout.write(self.style.SUCCESS('=== Render Sitemaps ==='))
+        domain = options['domain'] or Site.objects.get_current().domain
+        started = time.monotonic()
+
+        try:
+            rendered = prerender_sitemaps(domain, options['protocol'])
+        except ImproperlyConfigured as e:
+            raise CommandError(str(e))
+
+        for name, sitemap in rendered.items():
+            self.stdout.write(f'  sitemap-{name}.xml: {len(sitemap.content):,} bytes')
+        elapsed = time.monotonic() - started
+        self.stdout.write(self.style.SUCCESS(
+            f'Rendered {len(rendered)} sitemaps for {options["protocol"]}://{domain} in {elapsed:.2f}s'
+        ))
@@ -1,30 +1,58 @@
 """
 Management command to upload existing local images to S3 product_images folder
 """
-from django.core.management.base import BaseCommand
-from django.conf import settings
-from products.models import Product
-import boto3
 import os
-from botocore.exceptions import ClientError
+from django.core.management.base import BaseCommand, CommandError
+from django.conf import settings
+from products.media_sync import (
+    LocalSyncBackend, MediaSync, S3SyncBackend, SyncTask, FAILED, SKIPPED, UPLOADED
+)
 
 
 class Command(BaseCommand):
     help = 'Upload existing local images to S3 product_images folder and update product URLs'
 
-    def handle(self, *args, **options):
-        self.stdout.write('Uploading local images to S3 product_images folder...')
-        
-        # AWS S3 configuration
-        s3_client = boto3.client(
-            's3',
-            aws_access_key_id=settings.AWS_ACCESS_KEY_ID,
-            aws_secret_access_key=settings.AWS_SECRET_ACCESS_KEY,
-            region_name=settings.AWS_S3_REGION_NAME
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--workers',
+            type=int,
+            default=8,
+            help='Number of concurrent uploads (default: 8)',
         )
-        
-        bucket_name = settings.AWS_STORAGE_BUCKET_NAME
+        parser.add_argument(
+            '--local-dir',
+            help='Copy into this directory instead of S3 (offline stand-in)',
+        )
+        parser.add_argument(
+            '--base-url',
+            default='/media/',
+            help='URL prefix for files synced with --local-dir (default: /media/)',
+        )
+
+    def handle(self, *args, **options):
         s3_folder = 'product_images/'
+
+        if options['local_dir']:
+            backend = LocalSyncBackend(options['local_dir'], base_url=options['base_url'])
+            destination = options['local_dir']
+        else:
+            if not getattr(settings, 'AWS_STORAGE_BUCKET_NAME', None):
+                raise CommandError('AWS is not configured; set USE_AWS or pass --local-dir')
+            import boto3
+            s3_client = boto3.client(
+                's3',
+                aws_access_key_id=settings.AWS_ACCESS_KEY_ID,
+                aws_secret_access_key=settings.AWS_SECRET_ACCESS_KEY,
+                region_name=settings.AWS_S3_REGION_NAME
+            )
+            backend = S3SyncBackend(
+                settings.AWS_STORAGE_BUCKET_NAME,
+                client=s3_client,
+                acl='public-read'  # Make images publicly accessible
+            )
+            destination = f's3://{settings.AWS_STORAGE_BUCKET_NAME}'
+
+        self.stdout.write(f'Syncing local images to {destination}/{s3_folder}...')
         
         # Map existing local images to products
         image_assignments = {
@@ -91,57 +119,30 @@ class Command(BaseCommand):
             604: ("components/bike_wheel.jpg", "carbon-wheelset.jpg"),  # Same as 501
         }
         
-        uploaded_files = set()
-        updated_products = 0
+        tasks = [
+            SyncTask(
+                os.path.join('media', 'products', *local_path.split('/')),
+                f'{s3_folder}{s3_filename}',
+                [product_id]
+            )
+            for product_id, (local_path, s3_filename) in image_assignments.items()
+        ]
         
-        for product_id, (local_path, s3_filename) in image_assignments.items():
-            try:
-                product = Product.objects.get(pk=product_id)
-                local_file_path = f"media/products/{local_path}"
-                s3_key = f"{s3_folder}{s3_filename}"
-                
-                # Upload file to S3 if not already uploaded
-                if s3_filename not in uploaded_files and os.path.exists(local_file_path):
-                    try:
-                        self.stdout.write(f'Uploading {local_file_path} -> s3://{bucket_name}/{s3_key}')
-                        
-                        with open(local_file_path, 'rb') as file_data:
-                            s3_client.upload_fileobj(
-                                file_data,
-                                bucket_name,
-                                s3_key,
-                                ExtraArgs={
-                                    'ContentType': 'image/jpeg',
-                                    'ACL': 'public-read'  # Make images publicly accessible
-                                }
-                            )
-                        
-                        uploaded_files.add(s3_filename)
-                        self.stdout.write(self.style.SUCCESS(f'✓ Uploaded: {s3_filename}'))
-                        
-                    except ClientError as e:
-                        self.stdout.write(self.style.ERROR(f'✗ Upload failed for {s3_filename}: {e}'))
-                        continue
-                
-                # Update product image URL
-                s3_url = f"https://{bucket_name}.s3.amazonaws.com/{s3_key}"
-                product.image_url = s3_url
-                product.save()
-                updated_products += 1
-                
-                self.stdout.write(f'✓ Updated {product.name}: {s3_url}')
-                
-            except Product.DoesNotExist:
-                self.stdout.write(self.style.WARNING(f'⚠ Product {product_id} not found'))
-            except FileNotFoundError:
-                self.stdout.write(self.style.WARNING(f'⚠ Local file not found: {local_file_path}'))
+        symbols = {UPLOADED: '✓ Uploaded', SKIPPED: '= Unchanged', FAILED: '✗ Failed'}
+
+        def progress(result, done, total):
+            message = f'[{done}/{total}] {symbols[result.status]}: {result.task.key}'
+            if result.status == FAILED:
+                self.stdout.write(self.style.ERROR(f'{message} ({result.error})'))
+            else:
+                self.stdout.write(message)
+
+        report = MediaSync(backend, workers=options['workers'], progress=progress).run(tasks)
         
         self.stdout.write('')
-        self.stdout.write(self.style.SUCCESS(f'✅ Upload complete!'))
-        self.stdout.write(f'📁 Uploaded {len(uploaded_files)} unique images to S3')
-        self.stdout.write(f'🔗 Updated {updated_products} product URLs')
-        self.stdout.write('')
-        self.stdout.write('S3 Structure:')
-        self.stdout.write(f'  Bucket: {bucket_name}')
-        self.stdout.write(f'  Folder: {s3_folder}')
-        self.stdout.write(f'  Files: {len(uploaded_files)} images')
\ No newline at end of file
+        self.stdout.write(self.style.SUCCESS('✅ Upload complete!'))
+        self.stdout.write(f'📁 Uploaded {report.count(UPLOADED)} images, {report.count(SKIPPED)} unchanged, '
+                          f'{report.count(FAILED)} failed')
+        self.stdout.write(f'🔗 Updated {report.products_updated} product URLs')
+        self.stdout.write(f'⏱  {report.elapsed:.1f}s ({report.files_per_second:.1f} files/s, '
+                          f'{report.megabytes_per_second:.2f} MB/s)')
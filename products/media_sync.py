@@ -0,0 +1,250 @@
+"""
+Concurrent media sync engine
+
+Uploads local files to S3 (or a local directory standing in for it) from a
+thread pool. Each file's SHA-256 is stored with the object, so files that
+haven't changed since the last sync are skipped. Product image URLs are
+then updated in one bulk_update.
+"""
+import hashlib
+import logging
+import mimetypes
+import os
+import shutil
+import time
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+from django.utils import timezone
+
+from .models import Product
+from .signals import products_changed
+
+logger = logging.getLogger(__name__)
+
+HASH_CHUNK_SIZE = 1024 * 1024
+MULTIPART_THRESHOLD = 8 * 1024 * 1024
+
+UPLOADED = 'uploaded'
+SKIPPED = 'skipped'
+FAILED = 'failed'
+
+SyncTask = namedtuple('SyncTask', ['local_path', 'key', 'product_ids'])
+SyncResult = namedtuple('SyncResult', ['task', 'status', 'size', 'error'])
+
+
+def file_sha256(path):
+    """Hex SHA-256 of a file, read in chunks"""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(HASH_CHUNK_SIZE), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def guess_content_type(path):
+    return mimetypes.guess_type(path)[0] or 'application/octet-stream'
+
+
+class S3SyncBackend:
+    """
+    Upload to an S3 bucket
+
+    boto3 clients are thread-safe, so one client is shared by all workers.
+    Large files are sent as concurrent multipart uploads by the transfer
+    manager.
+    """
+
+    def __init__(self, bucket, client=None, acl=None, max_concurrency=4):
+        import boto3
+        from boto3.s3.transfer import TransferConfig
+
+        self.bucket = bucket
+        self.client = client or boto3.client('s3')
+        self.acl = acl
+        self.transfer_config = TransferConfig(
+            multipart_threshold=MULTIPART_THRESHOLD,
+            multipart_chunksize=MULTIPART_THRESHOLD,
+            max_concurrency=max_concurrency,
+        )
+
+    def head(self, key):
+        """Return {'sha256': ...} for an existing object, None if missing"""
+        from botocore.exceptions import ClientError
+
+        try:
+            response = self.client.head_object(Bucket=self.bucket, Key=key)
+        except ClientError as e:
+            if e.response.get('Error', {}).get('Code') in ('404', 'NoSuchKey', 'NotFound'):
+                return None
+            raise
+        return {'sha256': response.get('Metadata', {}).get('sha256')}
+
+    def upload(self, local_path, key, sha256):
+        extra_args = {
+            'ContentType': guess_content_type(local_path),
+            'Metadata': {'sha256': sha256},
+        }
+        if self.acl:
+            extra_args['ACL'] = self.acl
+        self.client.upload_file(
+            local_path, self.bucket, key, ExtraArgs=extra_args, Config=self.transfer_config
+        )
+
+    def url(self, key):
+        return f'https://{self.bucket}.s3.amazonaws.com/{key}'
+
+
+class LocalSyncBackend:
+    """
+    Copy into a local directory, standing in for S3 in tests and offline runs
+    """
+
+    def __init__(self, root, base_url='/media/'):
+        self.root = str(root)
+        self.base_url = base_url
+
+    def _path(self, key):
+        return os.path.join(self.root, *key.split('/'))
+
+    def head(self, key):
+        path = self._path(key)
+        if not os.path.exists(path):
+            return None
+        return {'sha256': file_sha256(path)}
+
+    def upload(self, local_path, key, sha256):
+        path = self._path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        shutil.copyfile(local_path, path)
+
+    def url(self, key):
+        return f'{self.base_url}{key}'
+
+
+class SyncReport:
+    """
+    Outcome of a sync run
+    """
+
+    def __init__(self):
+        self.results = []
+        self.products_updated = 0
+        self.started = time.monotonic()
+        self.elapsed = 0
+
+    def count(self, status):
+        return sum(1 for result in self.results if result.status == status)
+
+    @property
+    def uploaded_bytes(self):
+        return sum(result.size for result in self.results if result.status == UPLOADED)
+
+    @property
+    def failures(self):
+        return [result for result in self.results if result.status == FAILED]
+
+    @property
+    def files_per_second(self):
+        return len(self.results) / self.elapsed if self.elapsed else 0
+
+    @property
+    def megabytes_per_second(self):
+        return self.uploaded_bytes / 1024 / 1024 / self.elapsed if self.elapsed else 0
+
+
+class MediaSync:
+    """
+    Sync local files to a backend from a thread pool
+
+    Args:
+        backend: S3SyncBackend or LocalSyncBackend
+        workers: Number of files transferred concurrently
+        progress: Optional callable(result, done, total) run after each file
+    """
+
+    def __init__(self, backend, workers=8, progress=None):
+        self.backend = backend
+        self.workers = workers
+        self.progress = progress
+
+    def run(self, tasks):
+        """
+        Upload all tasks and point their products at the uploaded files
+
+        Tasks sharing a key are uploaded once.
+
+        Returns:
+            SyncReport
+        """
+        report = SyncReport()
+        tasks = self._merge(tasks)
+
+        with ThreadPoolExecutor(max_workers=self.workers) as executor:
+            futures = [executor.submit(self.sync_file, task) for task in tasks]
+            for done, future in enumerate(as_completed(futures), start=1):
+                result = future.result()
+                report.results.append(result)
+                if self.progress:
+                    self.progress(result, done, len(tasks))
+
+        report.products_updated = self.update_product_urls({
+            product_id: self.backend.url(result.task.key)
+            for result in report.results if result.status != FAILED
+            for product_id in result.task.product_ids
+        })
+        report.elapsed = time.monotonic() - report.started
+        return report
+
+    def _merge(self, tasks):
+        merged = {}
+        for task in tasks:
+            if task.key in merged:
+                existing = merged[task.key]
+                merged[task.key] = existing._replace(
+                    product_ids=list(existing.product_ids) + list(task.product_ids)
+                )
+            else:
+                merged[task.key] = task
+        return list(merged.values())
+
+    def sync_file(self, task):
+        """Upload one file unless the backend already has the same content"""
+        try:
+            remote = self.backend.head(task.key)
+            if not os.path.exists(task.local_path):
+                if remote is not None:
+                    # Already uploaded from elsewhere; just link it
+                    return SyncResult(task, SKIPPED, 0, None)
+                return SyncResult(task, FAILED, 0, f'local file not found: {task.local_path}')
+
+            sha256 = file_sha256(task.local_path)
+            if remote is not None and remote['sha256'] == sha256:
+                return SyncResult(task, SKIPPED, 0, None)
+
+            self.backend.upload(task.local_path, task.key, sha256)
+            return SyncResult(task, UPLOADED, os.path.getsize(task.local_path), None)
+        except Exception as e:
+            logger.error(f'Media sync failed for {task.key}: {e}')
+            return SyncResult(task, FAILED, 0, str(e))
+
+    def update_product_urls(self, urls):
+        """
+        Set image_url on many products with one read and one bulk_update
+
+        Returns:
+            Number of products changed
+        """
+        products = Product.objects.in_bulk(list(urls))
+        changed = []
+        now = timezone.now()
+        for product_id, product in products.items():
+            if product.image_url != urls[product_id]:
+                product.image_url = urls[product_id]
+                product.updated_at = now
+                changed.append(product)
+
+        if changed:
+            Product.objects.bulk_update(changed, ['image_url', 'updated_at'])
+            products_changed(changed)
+        return len(changed)
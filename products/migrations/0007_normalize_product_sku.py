@@ -0,0 +1,48 @@
+from collections import defaultdict
+
+from django.db import migrations
+
+
+def normalize_skus(apps, schema_editor):
+    """
+    Normalize stored SKUs and stop if normalizing creates duplicates
+
+    Uniqueness is enforced by the next migration; conflicts must be resolved
+    by hand first, so they are reported rather than guessed at.
+    """
+    Product = apps.get_model('products', 'Product')
+
+    by_sku = defaultdict(list)
+    changed = []
+    for product in Product.objects.exclude(sku=None).only('pk', 'sku').iterator():
+        sku = product.sku.strip().upper() or None
+        if sku is not None:
+            by_sku[sku].append(product.pk)
+        if sku != product.sku:
+            product.sku = sku
+            changed.append(product)
+
+    conflicts = {sku: pks for sku, pks in by_sku.items() if len(pks) > 1}
+    if conflicts:
+        lines = '\n'.join(
+            f'  {sku}: product ids {", ".join(str(pk) for pk in sorted(pks))}'
+            for sku, pks in sorted(conflicts.items())
+        )
+        raise RuntimeError(
+            f'Cannot make Product.sku unique, {len(conflicts)} SKU(s) are shared by '
+            f'several products after normalization:\n{lines}\n'
+            'Give these products distinct SKUs and run migrate again.'
+        )
+
+    Product.objects.bulk_update(changed, ['sku'], batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('products', '0006_auto_20251008_0047'),
+    ]
+
+    operations = [
+        migrations.RunPython(normalize_skus, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,24 @@
+# Generated by Django 3.2.25 on 2026-10-19 05:38
+
+from django.db import migrations, models
+
+
+def mark_empty_products_out_of_stock(apps, schema_editor):
+    """Products flagged in stock without any units are out of stock"""
+    Product = apps.get_model('products', 'Product')
+    Product.objects.filter(in_stock=True, stock_quantity__lte=0).update(in_stock=False)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('products', '0009_product_image_derivatives'),
+    ]
+
+    operations = [
+        migrations.RunPython(mark_empty_products_out_of_stock, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='product',
+            constraint=models.CheckConstraint(check=models.Q(('in_stock', False), ('stock_quantity__gt', 0), _connector='OR'), name='product_in_stock_has_quantity'),
+        ),
+    ]
@@ -2,8 +2,10 @@
 Product models for Wiesbaden Cyclery
 """
 from django.db import models
+from django.db.models import Avg, Case, F, Q, When
 from django.contrib.auth.models import User
 from django.core.validators import MinValueValidator, MaxValueValidator
+from django.utils import timezone
 
 
 class Category(models.Model):
@@ -36,6 +38,33 @@ class Size(models.Model):
         return self.display_name
 
 
+def normalize_sku(value):
+    """Canonical SKU form: trimmed, upper case, blank as None"""
+    if value is None:
+        return None
+    value = str(value).strip().upper()
+    return value or None
+
+
+class ProductQuerySet(models.QuerySet):
+    """QuerySet with SKU lookups"""
+
+    def by_skus(self, skus):
+        """
+        Bulk look up products by SKU in one indexed query
+
+        Args:
+            skus: Iterable of SKUs in any case/whitespace
+
+        Returns:
+            dict of normalized SKU -> Product for the SKUs that exist
+        """
+        skus = {normalize_sku(sku) for sku in skus} - {None}
+        if not skus:
+            return {}
+        return self.in_bulk(list(skus), field_name='sku')
+
+
 class Product(models.Model):
     """Product model for bicycles and accessories"""
     
@@ -48,7 +77,7 @@ class Product(models.Model):
     ]
     
     category = models.ForeignKey('Category', null=True, blank=True, on_delete=models.SET_NULL)
-    sku = models.CharField(max_length=254, null=True, blank=True)
+    sku = models.CharField(max_length=254, null=True, blank=True, unique=True)
     name = models.CharField(max_length=254)
     description = models.TextField()
     has_sizes = models.BooleanField(default=False)
@@ -56,6 +85,8 @@ class Product(models.Model):
     rating = models.IntegerField(choices=RATING_CHOICES, null=True, blank=True, validators=[MinValueValidator(1), MaxValueValidator(5)])
     image_url = models.URLField(max_length=1024, null=True, blank=True)
     image = models.ImageField(upload_to='products/', null=True, blank=True)
+    # Resized JPEG/WebP copies of image with srcset strings (see products/images.py)
+    image_derivatives = models.JSONField(default=dict, blank=True, editable=False)
     in_stock = models.BooleanField(default=True)
     stock_quantity = models.PositiveIntegerField(default=0)
     
@@ -71,16 +102,36 @@ class Product(models.Model):
     # Many-to-many relationship with sizes
     sizes = models.ManyToManyField(Size, blank=True)
 
+    objects = ProductQuerySet.as_manager()
+
     class Meta:
         ordering = ['name']
+        constraints = [
+            models.CheckConstraint(
+                check=Q(in_stock=False) | Q(stock_quantity__gt=0),
+                name='product_in_stock_has_quantity',
+            ),
+        ]
+
+    # Fields clean() validates or rewrites; saves leaving them out skip it
+    CLEANED_FIELDS = frozenset({'sku', 'in_stock', 'stock_quantity'})
 
     def __str__(self):
         return self.name
 
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # Remember the stored SKU so caches keyed on it can be invalidated
+        instance._loaded_sku = instance.__dict__.get('sku')
+        return instance
+
     def clean(self):
         """Model validation"""
         from django.core.exceptions import ValidationError
         
+        self.sku = normalize_sku(self.sku)
+        
         # Stock validation: if in_stock is True, stock_quantity must be > 0
         if self.in_stock and (self.stock_quantity is None or self.stock_quantity <= 0):
             raise ValidationError({
@@ -92,10 +143,60 @@ class Product(models.Model):
             self.stock_quantity = 0
     
     def save(self, *args, **kwargs):
-        """Override save to call clean"""
-        self.clean()
+        """Override save to call clean, unless update_fields leaves out what it checks"""
+        update_fields = kwargs.get('update_fields')
+        if update_fields is None or self.CLEANED_FIELDS.intersection(update_fields):
+            self.clean()
         super().save(*args, **kwargs)
 
+    def adjust_stock(self, delta):
+        """
+        Add delta units to the stock in a single UPDATE
+
+        The row is changed with F() expressions, so concurrent orders can't
+        overwrite each other's decrements, and in_stock follows whether any
+        units are left.
+
+        Args:
+            delta: Units to add; negative to take units out of stock
+
+        Returns:
+            True if the stock was changed, False if fewer than -delta units
+            were left
+        """
+        products = type(self).objects.filter(pk=self.pk)
+        if delta < 0:
+            products = products.filter(stock_quantity__gte=-delta)
+        # Compared with the stored quantity, as the database sees the
+        # values from before the UPDATE
+        updated = products.update(
+            stock_quantity=F('stock_quantity') + delta,
+            in_stock=Case(When(stock_quantity__gt=-delta, then=True), default=False),
+            updated_at=timezone.now(),
+        )
+        if not updated:
+            return False
+        self.refresh_from_db(fields=['stock_quantity', 'in_stock', 'updated_at'])
+        self.changed()
+        return True
+
+    def refresh_rating(self):
+        """Set the rating to the average review rating, writing only that column"""
+        average = self.reviews.aggregate(average=Avg('rating'))['average']
+        self.rating = round(average) if average is not None else None
+        self.save(update_fields=['rating', 'updated_at'])
+
+    def changed(self):
+        """
+        Invalidate cached summaries, sitemaps and catalog pages for the product
+
+        Saves do this through the product signals; call it after writing the
+        row with a queryset update.
+        """
+        from .signals import products_changed
+
+        products_changed([self])
+
     def get_rating_display(self):
         """Return rating as stars"""
         if self.rating:
@@ -103,6 +204,20 @@ class Product(models.Model):
         return 'No rating'
 
 
+class CatalogVersion(models.Model):
+    """
+    Time of the last catalog change, in a single row
+
+    Kept in the database so every worker validates catalog pages against
+    the same version (see wiesbaden_cyclery.http_cache).
+    """
+
+    changed_at = models.DateTimeField()
+
+    def __str__(self):
+        return f'Catalog changed at {self.changed_at}'
+
+
 class Review(models.Model):
     """Product review model"""
     
@@ -0,0 +1,85 @@
+"""
+Product signals for cache invalidation and image derivatives
+"""
+import logging
+
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from wiesbaden_cyclery.http_cache import touch_catalog
+from wiesbaden_cyclery.sitemaps import invalidate_product_sitemaps, invalidate_sitemaps, sitemap_names
+
+from .images import derivatives_outdated, generate_derivatives
+from .models import Category, Product, Review, Size
+from .summaries import invalidate_product_summaries
+
+logger = logging.getLogger(__name__)
+
+
+def products_changed(products):
+    """
+    Invalidate cached summaries, sitemaps and catalog pages for products
+
+    Saves do this through the receivers below; call it after writing rows
+    with bulk_create, bulk_update or a queryset update.
+    """
+    products = list(products)
+    if not products:
+        return
+    invalidate_product_summaries(product.sku for product in products)
+    product_ids = [product.pk for product in products]
+    if None in product_ids:
+        # bulk_create left new products without keys; drop every chunk
+        invalidate_sitemaps(sitemap_names())
+    else:
+        invalidate_product_sitemaps(product_ids)
+    touch_catalog()
+
+
+@receiver(post_save, sender=Product)
+@receiver(post_delete, sender=Product)
+def product_changed(sender, instance, **kwargs):
+    """
+    Drop the cached summary under the current and the previously stored SKU,
+    and the sitemap chunk holding the product
+    """
+    invalidate_product_summaries([instance.sku, getattr(instance, '_loaded_sku', None)])
+    instance._loaded_sku = instance.sku
+    invalidate_product_sitemaps([instance.pk])
+
+
+@receiver(post_save, sender=Category)
+@receiver(post_delete, sender=Category)
+def category_changed(sender, instance, **kwargs):
+    """Drop the cached category sitemap"""
+    invalidate_sitemaps(['categories'])
+
+
+@receiver(post_save, sender=Product)
+@receiver(post_delete, sender=Product)
+@receiver(post_save, sender=Category)
+@receiver(post_delete, sender=Category)
+@receiver(post_save, sender=Size)
+@receiver(post_delete, sender=Size)
+@receiver(post_save, sender=Review)
+@receiver(post_delete, sender=Review)
+def catalog_changed(sender, **kwargs):
+    """Invalidate cached catalog pages"""
+    touch_catalog()
+
+
+@receiver(post_save, sender=Product)
+def product_image_changed(sender, instance, raw=False, **kwargs):
+    """
+    Generate responsive derivatives when a new image is uploaded
+    """
+    if raw or not derivatives_outdated(instance):
+        return
+    if instance.image and not instance.image.storage.exists(instance.image.name):
+        # e.g. fixtures naming files that were never uploaded
+        return
+    try:
+        generate_derivatives(instance)
+    except Exception as e:
+        # The original image still works; the backfill command can retry
+        logger.error(f'Could not generate image derivatives for product {instance.pk}: {e}')
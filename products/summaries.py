@@ -0,0 +1,79 @@
+"""
+SKU-keyed product summaries for integrations
+
+Summaries are small JSON-ready dicts cached per SKU, so repeated lookups by
+internal jobs hit the cache and misses are loaded in one indexed query. They
+report availability, not exact stock counts.
+
+Cache keys include the catalog version (see wiesbaden_cyclery.http_cache),
+which lives in the database, so every worker stops using a summary once the
+catalog changes. Saving or deleting a product also drops its entries right
+away (see signals).
+"""
+import hashlib
+
+from django.conf import settings
+from django.core.cache import cache
+from django.urls import reverse
+
+from wiesbaden_cyclery.http_cache import catalog_version
+
+from .models import Product, normalize_sku
+
+PRODUCT_SUMMARY_CACHE_PREFIX = 'product_summary_'
+
+
+def _cache_key(sku, version):
+    # Hashed, so long SKUs stay within memcached's key length limit
+    digest = hashlib.md5(sku.encode()).hexdigest()
+    return f'{PRODUCT_SUMMARY_CACHE_PREFIX}{version!r}_{digest}'
+
+
+def product_summary(product):
+    """Build the summary dict for a product"""
+    return {
+        'id': product.pk,
+        'sku': product.sku,
+        'name': product.name,
+        'price': str(product.price),
+        'in_stock': product.in_stock,
+        'category': product.category.name if product.category else None,
+        'image_url': product.image_url,
+        'url': reverse('product_detail', args=[product.pk]),
+    }
+
+
+def get_product_summaries(skus):
+    """
+    Get summaries for many SKUs
+
+    Args:
+        skus: Iterable of SKUs in any case/whitespace
+
+    Returns:
+        dict of normalized SKU -> summary for the SKUs that exist
+    """
+    skus = {normalize_sku(sku) for sku in skus} - {None}
+    version = catalog_version()
+    keys = {sku: _cache_key(sku, version) for sku in skus}
+    cached = cache.get_many(keys.values())
+    summaries = {sku: cached[key] for sku, key in keys.items() if key in cached}
+
+    missing = skus - summaries.keys()
+    if missing:
+        products = Product.objects.select_related('category').by_skus(missing)
+        loaded = {sku: product_summary(product) for sku, product in products.items()}
+        cache.set_many(
+            {keys[sku]: summary for sku, summary in loaded.items()},
+            settings.PRODUCT_SUMMARY_CACHE_TIMEOUT
+        )
+        summaries.update(loaded)
+    return summaries
+
+
+def invalidate_product_summaries(skus):
+    """Drop cached summaries for the given SKUs"""
+    version = catalog_version()
+    keys = [_cache_key(sku, version) for sku in {normalize_sku(sku) for sku in skus} - {None}]
+    if keys:
+        cache.delete_many(keys)
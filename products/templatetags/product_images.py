@@ -0,0 +1,20 @@
+from django import template
+
+register = template.Library()
+
+
+@register.filter
+def image_src(product, size='card'):
+    """URL of a product image derivative, falling back to the original"""
+    derivative = (product.image_derivatives or {}).get(size)
+    if derivative:
+        return derivative['jpeg']
+    if product.image:
+        return product.image.url
+    return product.image_url or ''
+
+
+@register.filter
+def image_srcset(product, fmt='jpeg'):
+    """srcset string for a product image in the given format ('jpeg' or 'webp')"""
+    return (product.image_derivatives or {}).get('srcset', {}).get(fmt, '')
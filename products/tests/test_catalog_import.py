@@ -0,0 +1,121 @@
+"""
+Tests for the bulk catalog import
+"""
+import io
+import json
+import os
+import tempfile
+from decimal import Decimal
+from django.core.management import call_command
+from django.test import TestCase
+from products.catalog_import import import_catalog, iter_csv_rows, iter_json_rows
+from products.models import Product, Category, Size
+
+CATALOG_CSV = """sku,name,description,category,price,stock_quantity,has_sizes,sizes
+RB-001,Aero Road,Fast bike,road_bikes,1299.00,5,true,S|M
+RB-002,Endurance Road,Comfy bike,road_bikes,999.00,0,true,M|L
+AC-001,Bike Lock,Strong lock,,29.99,20,false,
+"""
+
+
+class CatalogImportTest(TestCase):
+    """Test importing products matched on SKU"""
+
+    def setUp(self):
+        Category.objects.create(name='road_bikes', friendly_name='Road Bikes')
+        for order, name in enumerate(['S', 'M', 'L']):
+            Size.objects.create(name=name, display_name=name, sort_order=order)
+
+    def run_import(self, content, **kwargs):
+        return import_catalog(iter_csv_rows(io.StringIO(content)), **kwargs)
+
+    def test_creates_products_with_sizes(self):
+        """Test new SKUs are created and linked to their sizes"""
+        report = self.run_import(CATALOG_CSV)
+
+        self.assertEqual((report.created, report.updated, report.errors), (3, 0, []))
+        aero = Product.objects.get(sku='RB-001')
+        self.assertEqual(aero.category.name, 'road_bikes')
+        self.assertEqual(aero.price, Decimal('1299.00'))
+        self.assertTrue(aero.in_stock)
+        self.assertEqual(sorted(aero.sizes.values_list('name', flat=True)), ['M', 'S'])
+        self.assertFalse(Product.objects.get(sku='RB-002').in_stock)
+        self.assertEqual(report.size_links_added, 4)
+
+    def test_reimport_applies_only_diff(self):
+        """Test a re-import updates changed fields and size links only"""
+        self.run_import(CATALOG_CSV)
+        changed = CATALOG_CSV.replace('1299.00,5,true,S|M', '1199.00,5,true,M|L')
+
+        with self.assertNumQueries(9):
+            report = self.run_import(changed)
+
+        self.assertEqual((report.created, report.updated, report.unchanged), (0, 1, 2))
+        self.assertEqual(dict(report.changed_fields), {'price': 1})
+        self.assertEqual((report.size_links_added, report.size_links_removed), (1, 1))
+        aero = Product.objects.get(sku='RB-001')
+        self.assertEqual(aero.price, Decimal('1199.00'))
+        self.assertEqual(sorted(aero.sizes.values_list('name', flat=True)), ['L', 'M'])
+
+    def test_dry_run_writes_nothing(self):
+        """Test a dry run reports changes without applying them"""
+        report = self.run_import(CATALOG_CSV, dry_run=True)
+
+        self.assertEqual(report.created, 3)
+        self.assertFalse(Product.objects.exists())
+
+    def test_invalid_rows_reported(self):
+        """Test invalid rows are skipped with their line in the file"""
+        content = CATALOG_CSV + ',No SKU,,,1.00,1,false,\nX-1,Bad,,unknown,1.00,1,false,\n'
+        report = self.run_import(content)
+
+        self.assertEqual(report.created, 3)
+        self.assertEqual([error['line'] for error in report.errors], [5, 6])
+        self.assertIn('unknown category', report.errors[1]['message'])
+
+    def test_in_stock_without_quantity_reported(self):
+        """Test marking a product without stock as in stock is a row error"""
+        self.run_import(CATALOG_CSV)
+        report = self.run_import('sku,name,price,in_stock\nRB-002,Endurance Road,999.00,true\n')
+
+        self.assertEqual(report.updated, 0)
+        self.assertEqual(report.errors[0]['line'], 2)
+        self.assertIn('stock_quantity', report.errors[0]['message'])
+        self.assertFalse(Product.objects.get(sku='RB-002').in_stock)
+
+    def test_command_reads_json_array(self):
+        """Test the command streams a JSON array"""
+        rows = [
+            {'sku': 'AC-002', 'name': 'Pump', 'description': 'Floor pump', 'price': 39.5, 'stock_quantity': 3},
+            {'sku': 'AC-003', 'name': 'Helmet', 'description': 'Safe', 'price': '59.00', 'sizes': ['S', 'M']},
+        ]
+        with tempfile.TemporaryDirectory() as tmpdir:
+            path = os.path.join(tmpdir, 'catalog.json')
+            with open(path, 'w') as catalog:
+                json.dump(rows, catalog, indent=2)
+            out = io.StringIO()
+            call_command('import_catalog', path, stdout=out)
+
+        self.assertIn('Created: 2', out.getvalue())
+        self.assertEqual(Product.objects.get(sku='AC-002').price, Decimal('39.50'))
+        self.assertEqual(Product.objects.get(sku='AC-003').sizes.count(), 2)
+
+
+class JsonStreamTest(TestCase):
+    """Test the incremental JSON reader"""
+
+    def test_array_across_chunk_boundaries(self):
+        """Test objects split across read chunks are decoded"""
+        rows = [{'sku': f'SKU-{i}', 'name': 'x' * i} for i in range(50)]
+        stream = io.StringIO(json.dumps(rows))
+        self.assertEqual(list(iter_json_rows(stream, chunk_size=7)), rows)
+
+    def test_ndjson(self):
+        """Test newline-delimited objects are decoded"""
+        stream = io.StringIO('{"sku": "A"}\n{"sku": "B"}\n')
+        self.assertEqual([row['sku'] for row in iter_json_rows(stream, chunk_size=5)], ['A', 'B'])
+
+    def test_truncated_input_raises(self):
+        """Test truncated input raises instead of silently stopping"""
+        with self.assertRaises(json.JSONDecodeError):
+            list(iter_json_rows(io.StringIO('[{"sku": "A"}, {"sku": '), chunk_size=4))
@@ -0,0 +1,98 @@
+"""
+Tests for responsive product image derivatives
+"""
+import io
+import shutil
+import tempfile
+from decimal import Decimal
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.template import Context, Template
+from django.test import TestCase, override_settings
+from PIL import Image
+from products.images import render_derivatives
+from products.models import Product, Category
+
+MEDIA_ROOT = tempfile.mkdtemp()
+
+
+def image_bytes(width, height, fmt='JPEG'):
+    buffer = io.BytesIO()
+    Image.new('RGB', (width, height), 'red').save(buffer, fmt)
+    return buffer.getvalue()
+
+
+@override_settings(MEDIA_ROOT=MEDIA_ROOT)
+class ImageDerivativeTest(TestCase):
+    """Test derivative generation at upload time and by backfill"""
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(MEDIA_ROOT, ignore_errors=True)
+
+    def setUp(self):
+        self.category = Category.objects.create(name='road_bikes', friendly_name='Road Bikes')
+
+    def create_product(self, **kwargs):
+        return Product.objects.create(
+            name='Road Bike', price=Decimal('999.00'), category=self.category,
+            stock_quantity=1, in_stock=True, **kwargs
+        )
+
+    def test_render_sizes_without_upscaling(self):
+        """Test derivatives are resized to each width and never upscaled"""
+        rendered = render_derivatives(image_bytes(600, 300))
+
+        self.assertEqual(rendered[('thumb', 'jpeg')][0], 150)
+        self.assertEqual(rendered[('detail', 'webp')][0], 600)
+        with Image.open(io.BytesIO(rendered[('card', 'webp')][1])) as card:
+            self.assertEqual((card.format, card.size), ('WEBP', (400, 200)))
+
+    def test_generated_on_upload(self):
+        """Test saving a product with a new image stores derivative URLs"""
+        product = self.create_product(
+            image=SimpleUploadedFile('bike.jpg', image_bytes(1200, 800), content_type='image/jpeg')
+        )
+
+        product.refresh_from_db()
+        derivatives = product.image_derivatives
+        self.assertEqual(derivatives['source'], product.image.name)
+        self.assertTrue(derivatives['thumb']['webp'].endswith('-thumb.webp'))
+        self.assertEqual(derivatives['srcset']['jpeg'].count('w,'), 2)
+
+        html = Template(
+            "{% load product_images %}{{ product|image_src:'card' }}|{{ product|image_srcset:'webp' }}"
+        ).render(Context({'product': product}))
+        self.assertIn('-card.jpg|', html)
+        self.assertIn('-detail.webp 800w', html)
+
+    def test_missing_file_skipped(self):
+        """Test saving a product whose image file doesn't exist logs no error"""
+        with self.assertNoLogs('products.signals', level='ERROR'):
+            product = self.create_product(image='products/missing.jpg')
+
+        product.refresh_from_db()
+        self.assertEqual(product.image_derivatives, {})
+
+    def test_backfill_command(self):
+        """Test the backfill command fills in missing derivatives"""
+        product = self.create_product(
+            image=SimpleUploadedFile('bike.png', image_bytes(300, 300, 'PNG'), content_type='image/png')
+        )
+        Product.objects.filter(pk=product.pk).update(image_derivatives={})
+
+        call_command('generate_image_derivatives', workers=1, stdout=io.StringIO())
+
+        product.refresh_from_db()
+        self.assertEqual(product.image_derivatives['detail']['width'], 300)
+        # One srcset candidate per distinct width
+        self.assertEqual(product.image_derivatives['srcset']['webp'].count(' 300w'), 1)
+
+    def test_fallback_without_derivatives(self):
+        """Test templates fall back to image_url when there is no upload"""
+        product = self.create_product(image_url='https://cdn.example.com/bike.jpg')
+        html = Template("{% load product_images %}{{ product|image_src:'thumb' }}").render(
+            Context({'product': product})
+        )
+        self.assertEqual(html, 'https://cdn.example.com/bike.jpg')
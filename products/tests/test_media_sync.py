@@ -0,0 +1,84 @@
+"""
+Tests for the media sync engine
+"""
+import os
+import shutil
+import tempfile
+from decimal import Decimal
+from django.test import TestCase
+from products.media_sync import (
+    LocalSyncBackend, MediaSync, SyncTask, FAILED, SKIPPED, UPLOADED
+)
+from products.models import Product, Category
+
+
+class MediaSyncTest(TestCase):
+    """Test syncing files to the local stand-in backend"""
+
+    def setUp(self):
+        self.source = tempfile.mkdtemp()
+        self.target = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.source)
+        self.addCleanup(shutil.rmtree, self.target)
+        self.backend = LocalSyncBackend(self.target, base_url='https://cdn.example.com/')
+
+        category = Category.objects.create(name='accessories', friendly_name='Accessories')
+        self.products = [
+            Product.objects.create(
+                name=f'Product {i}', price=Decimal('10.00'), category=category,
+                stock_quantity=1, in_stock=True
+            )
+            for i in range(3)
+        ]
+        self.helmet = self.write_file('helmet.jpg', b'helmet')
+        self.lock = self.write_file('lock.jpg', b'lock')
+
+    def write_file(self, name, content):
+        path = os.path.join(self.source, name)
+        with open(path, 'wb') as f:
+            f.write(content)
+        return path
+
+    def tasks(self):
+        return [
+            SyncTask(self.helmet, 'product_images/helmet.jpg', [self.products[0].pk]),
+            SyncTask(self.helmet, 'product_images/helmet.jpg', [self.products[1].pk]),
+            SyncTask(self.lock, 'product_images/lock.jpg', [self.products[2].pk]),
+        ]
+
+    def test_uploads_and_updates_urls(self):
+        """Test shared files upload once and all products get URLs"""
+        progress = []
+        report = MediaSync(
+            self.backend, workers=4, progress=lambda result, done, total: progress.append((done, total))
+        ).run(self.tasks())
+
+        self.assertEqual(report.count(UPLOADED), 2)
+        self.assertEqual(report.uploaded_bytes, len(b'helmet') + len(b'lock'))
+        self.assertEqual(sorted(progress), [(1, 2), (2, 2)])
+        self.assertTrue(os.path.exists(os.path.join(self.target, 'product_images', 'lock.jpg')))
+        self.assertEqual(report.products_updated, 3)
+        self.products[1].refresh_from_db()
+        self.assertEqual(self.products[1].image_url, 'https://cdn.example.com/product_images/helmet.jpg')
+
+    def test_unchanged_files_skipped(self):
+        """Test a second run skips files whose content hash matches"""
+        MediaSync(self.backend).run(self.tasks())
+        self.write_file('lock.jpg', b'new lock')
+
+        with self.assertNumQueries(1):
+            report = MediaSync(self.backend).run(self.tasks())
+
+        self.assertEqual(report.count(SKIPPED), 1)
+        self.assertEqual(report.count(UPLOADED), 1)
+        self.assertEqual(report.products_updated, 0)
+
+    def test_missing_file_reported(self):
+        """Test missing local files fail without touching their products"""
+        task = SyncTask(os.path.join(self.source, 'nope.jpg'), 'product_images/nope.jpg', [self.products[0].pk])
+        report = MediaSync(self.backend).run([task])
+
+        self.assertEqual(report.count(FAILED), 1)
+        self.assertIn('local file not found', report.failures[0].error)
+        self.products[0].refresh_from_db()
+        self.assertIsNone(self.products[0].image_url)
@@ -2,9 +2,13 @@
 Tests for Product models
 """
 from django.test import TestCase
+from django.contrib.auth.models import User
 from django.core.exceptions import ValidationError
+from django.db import IntegrityError, connection, transaction
+from django.test.utils import CaptureQueriesContext
 from decimal import Decimal
-from products.models import Product, Category, Size
+from products.models import Product, Category, Review, Size
+from wiesbaden_cyclery.http_cache import catalog_version
 
 
 class CategoryModelTest(TestCase):
@@ -143,3 +147,57 @@ class ProductModelTest(TestCase):
         )
         self.assertFalse(product.in_stock)
         self.assertEqual(product.stock_quantity, 0)
+
+
+class ProductTargetedUpdateTest(TestCase):
+    """Test narrow stock and rating updates"""
+
+    def setUp(self):
+        self.product = Product.objects.create(
+            name='Stock Bike',
+            description='A bike',
+            price=Decimal('999.99'),
+            stock_quantity=2,
+            in_stock=True
+        )
+
+    def test_adjust_stock_sells_out_and_restores(self):
+        """Test adjusting stock updates in_stock and bumps the catalog version"""
+        version = catalog_version()
+        with self.captureOnCommitCallbacks(execute=True), self.assertNumQueries(2):
+            self.assertTrue(self.product.adjust_stock(-2))
+        self.assertEqual(self.product.stock_quantity, 0)
+        self.assertFalse(self.product.in_stock)
+        self.assertNotEqual(catalog_version(), version)
+
+        self.assertTrue(self.product.adjust_stock(3))
+        self.product.refresh_from_db()
+        self.assertEqual(self.product.stock_quantity, 3)
+        self.assertTrue(self.product.in_stock)
+
+    def test_adjust_stock_refuses_overselling(self):
+        """Test taking more units than are left changes nothing"""
+        self.assertFalse(self.product.adjust_stock(-3))
+        self.product.refresh_from_db()
+        self.assertEqual(self.product.stock_quantity, 2)
+        self.assertTrue(self.product.in_stock)
+
+    def test_refresh_rating_writes_only_rating(self):
+        """Test the rating refresh updates only rating and updated_at"""
+        for index, rating in enumerate([4, 5]):
+            user = User.objects.create_user(username=f'rider{index}', password='testpass123')
+            Review.objects.create(product=self.product, user=user, title='Nice', rating=rating, comment='Good')
+
+        with CaptureQueriesContext(connection) as captured:
+            self.product.refresh_rating()
+        update = [query['sql'] for query in captured.captured_queries if query['sql'].startswith('UPDATE')]
+        self.assertEqual(len(update), 1)
+        self.assertIn('"rating"', update[0])
+        self.assertNotIn('"description"', update[0])
+        self.product.refresh_from_db()
+        self.assertEqual(self.product.rating, 4)
+
+    def test_in_stock_requires_quantity_in_database(self):
+        """Test the check constraint rejects in-stock products without units"""
+        with self.assertRaises(IntegrityError), transaction.atomic():
+            Product.objects.filter(pk=self.product.pk).update(stock_quantity=0)
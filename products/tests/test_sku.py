@@ -0,0 +1,118 @@
+"""
+Tests for SKU normalization, lookups and summary caching
+"""
+import importlib
+from decimal import Decimal
+from django.apps import apps
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.test import TestCase
+from django.urls import reverse
+from django.utils import timezone
+from products.forms import ProductForm
+from products.models import CatalogVersion, Product, Category
+from products.summaries import _cache_key, get_product_summaries
+from wiesbaden_cyclery.http_cache import CATALOG_VERSION_KEY, catalog_version
+
+sku_migration = importlib.import_module('products.migrations.0007_normalize_product_sku')
+
+
+class SkuTest(TestCase):
+    """Test SKU normalization and bulk lookups"""
+
+    def setUp(self):
+        cache.clear()
+        self.category = Category.objects.create(name='accessories', friendly_name='Accessories')
+        self.lock = self.create_product('Bike Lock', ' lock-1 ')
+        self.pump = self.create_product('Pump', 'PUMP-1')
+
+    def create_product(self, name, sku):
+        return Product.objects.create(
+            name=name,
+            sku=sku,
+            price=Decimal('20.00'),
+            category=self.category,
+            stock_quantity=5,
+            in_stock=True
+        )
+
+    def test_sku_normalized_on_save(self):
+        """Test SKUs are trimmed and upper cased, blanks stored as NULL"""
+        self.assertEqual(self.lock.sku, 'LOCK-1')
+        first = self.create_product('Bell', '')
+        second = self.create_product('Light', '  ')
+        self.assertIsNone(first.sku)
+        self.assertIsNone(second.sku)
+
+    def test_duplicate_sku_rejected_by_form(self):
+        """Test the product form reports a duplicate normalized SKU"""
+        form = ProductForm(data={
+            'name': 'Other Lock', 'sku': 'Lock-1', 'category': self.category.pk,
+            'description': 'Lock', 'price': '10.00', 'in_stock': True, 'stock_quantity': 1,
+        })
+        self.assertFalse(form.is_valid())
+        self.assertIn('sku', form.errors)
+
+    def test_by_skus_single_query(self):
+        """Test bulk lookups normalize input and use one query"""
+        with self.assertNumQueries(1):
+            products = Product.objects.by_skus(['lock-1', ' pump-1', 'missing'])
+        self.assertEqual(products, {'LOCK-1': self.lock, 'PUMP-1': self.pump})
+        self.assertEqual(Product.objects.by_skus([None, '']), {})
+
+    def test_summaries_cached_and_invalidated(self):
+        """Test summaries are cached per SKU and dropped on save"""
+        summaries = get_product_summaries(['lock-1', 'PUMP-1'])
+        self.assertEqual(summaries['LOCK-1']['price'], '20.00')
+
+        with self.assertNumQueries(0):
+            get_product_summaries(['LOCK-1', 'PUMP-1'])
+
+        self.lock.price = Decimal('25.00')
+        self.lock.save()
+        self.assertEqual(get_product_summaries(['LOCK-1'])['LOCK-1']['price'], '25.00')
+
+        lock = Product.objects.get(pk=self.lock.pk)
+        lock.sku = 'LOCK-2'
+        lock.save()
+        self.assertEqual(get_product_summaries(['LOCK-1']), {})
+
+    def test_summaries_follow_catalog_version(self):
+        """Test a catalog change recorded elsewhere bypasses cached summaries"""
+        get_product_summaries(['LOCK-1'])
+        # Another worker changes the price; this worker's entry isn't dropped
+        Product.objects.filter(pk=self.lock.pk).update(price=Decimal('30.00'))
+        self.assertEqual(get_product_summaries(['LOCK-1'])['LOCK-1']['price'], '20.00')
+
+        CatalogVersion.objects.update_or_create(pk=1, defaults={'changed_at': timezone.now()})
+        cache.delete(CATALOG_VERSION_KEY)
+        self.assertEqual(get_product_summaries(['LOCK-1'])['LOCK-1']['price'], '30.00')
+
+    def test_summary_keys_hashed(self):
+        """Test long SKUs give cache keys memcached accepts"""
+        self.assertLess(len(_cache_key('X' * 300, catalog_version())), 250)
+
+    def test_summary_view(self):
+        """Test the staff-only JSON endpoint returns summaries and missing SKUs"""
+        response = self.client.get(reverse('product_summaries'), {'sku': 'lock-1'})
+        self.assertEqual(response.status_code, 302)
+
+        staff = User.objects.create_user(username='staff', password='testpass123', is_staff=True)
+        self.client.force_login(staff)
+        response = self.client.get(reverse('product_summaries'), {'sku': 'lock-1,nope'})
+
+        data = response.json()
+        self.assertEqual(list(data['products']), ['LOCK-1'])
+        self.assertNotIn('stock_quantity', data['products']['LOCK-1'])
+        self.assertEqual(data['missing'], ['NOPE'])
+        self.assertEqual(self.client.get(reverse('product_summaries')).status_code, 400)
+
+    def test_migration_reports_conflicts(self):
+        """Test the normalizing migration refuses to merge conflicting SKUs"""
+        Product.objects.bulk_create([
+            Product(name='A', sku='dup-1', price=Decimal('1.00'), in_stock=False),
+            Product(name='B', sku=' DUP-1', price=Decimal('1.00'), in_stock=False),
+        ])
+
+        with self.assertRaisesRegex(RuntimeError, 'DUP-1: product ids'):
+            sku_migration.normalize_skus(apps, None)
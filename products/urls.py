@@ -7,6 +7,7 @@ from . import views
 urlpatterns = [
     path('', views.all_products, name='products'),
     path('<int:product_id>/', views.product_detail, name='product_detail'),
+    path('skus/', views.product_summaries, name='product_summaries'),
     path('<int:product_id>/review/', views.add_review, name='add_review'),
     path('management/', views.product_management, name='product_management'),
     path('add/', views.add_product, name='add_product'),
@@ -8,11 +8,17 @@ from django.contrib.admin.views.decorators import staff_member_required
 from django.db.models import Q, Avg
 from django.db.models.functions import Lower
 from django.core.paginator import Paginator
+from django.http import JsonResponse
+from wiesbaden_cyclery.http_cache import catalog_page
 
-from .models import Product, Category, Size, Review
+from .models import Product, Category, Size, Review, normalize_sku
 from .forms import ReviewForm, ProductForm
+from .summaries import get_product_summaries
 
+MAX_SUMMARY_SKUS = 100
 
+
+@catalog_page
 def all_products(request):
     """A view to show all products, including sorting and search queries"""
     
@@ -103,6 +109,7 @@ def all_products(request):
     return render(request, 'products/products.html', context)
 
 
+@catalog_page
 def product_detail(request, product_id):
     """A view to show individual product details"""
     
@@ -138,9 +145,10 @@ def product_detail(request, product_id):
     review_form = ReviewForm()
     
     # Get stock information for this user
-    from shopping_cart.utils import get_available_stock, get_cart_quantity_for_product
-    available_stock = get_available_stock(request, product)
-    cart_quantity = get_cart_quantity_for_product(request, product)
+    from shopping_cart.services import CartService
+    cart_service = CartService.for_request(request)
+    available_stock = cart_service.available_stock(product)
+    cart_quantity = cart_service.quantity_in_cart(product)
 
     context = {
         'product': product,
@@ -156,6 +164,29 @@ def product_detail(request, product_id):
     return render(request, 'products/product_detail.html', context)
 
 
+@staff_member_required
+def product_summaries(request):
+    """
+    JSON product summaries by SKU for staff integrations
+
+    SKUs are passed as repeated or comma separated ``sku`` parameters.
+    """
+    skus = [
+        sku for value in request.GET.getlist('sku')
+        for sku in value.split(',') if sku.strip()
+    ]
+    if not skus:
+        return JsonResponse({'error': 'Pass at least one sku parameter'}, status=400)
+    if len(skus) > MAX_SUMMARY_SKUS:
+        return JsonResponse(
+            {'error': f'At most {MAX_SUMMARY_SKUS} SKUs per request'}, status=400
+        )
+
+    summaries = get_product_summaries(skus)
+    missing = sorted({normalize_sku(sku) for sku in skus} - summaries.keys())
+    return JsonResponse({'products': summaries, 'missing': missing})
+
+
 @login_required
 def add_review(request, product_id):
     """Add a review for a product"""
@@ -175,12 +206,7 @@ def add_review(request, product_id):
             review.user = request.user
             review.save()
             
-            # Update product rating
-            avg_rating = Review.objects.filter(product=product).aggregate(
-                Avg('rating')
-            )['rating__avg']
-            product.rating = round(avg_rating, 1)
-            product.save()
+            product.refresh_rating()
             
             messages.success(request, 'Your review has been added successfully!')
             return redirect('product_detail', product_id=product_id)
@@ -1,4 +1,8 @@
+from decimal import Decimal
 from django.contrib import admin
+from django.db.models import DecimalField, ExpressionWrapper, F, OuterRef, Subquery, Sum
+from django.db.models.functions import Coalesce
+from wiesbaden_cyclery.paginator import EstimatedCountPaginator
 from .models import Cart, CartItem
 
 
@@ -20,18 +24,21 @@ class CartItemInline(admin.TabularInline):
 @admin.register(Cart)
 class CartAdmin(admin.ModelAdmin):
     """Admin interface for shopping carts"""
-    list_display = ('__str__', 'user', 'session_key_short', 'total_items', 'subtotal_display', 'total_display', 'created_at')
+    list_display = ('__str__', 'user', 'session_key_short', 'total_items_display', 'subtotal_display', 'total_display', 'created_at')
     list_filter = ('created_at', 'updated_at')
+    list_select_related = ('user',)
     search_fields = ('user__username', 'user__email', 'session_key')
-    readonly_fields = ('created_at', 'updated_at', 'total_items', 'subtotal_display', 'delivery_cost_display', 'total_display')
+    readonly_fields = ('created_at', 'updated_at', 'total_items_display', 'subtotal_display', 'delivery_cost_display', 'total_display')
     inlines = [CartItemInline]
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
 
     fieldsets = (
         ('Cart Information', {
             'fields': ('user', 'session_key')
         }),
         ('Cart Totals', {
-            'fields': ('total_items', 'subtotal_display', 'delivery_cost_display', 'total_display'),
+            'fields': ('total_items_display', 'subtotal_display', 'delivery_cost_display', 'total_display'),
             'classes': ('collapse',)
         }),
         ('Timestamps', {
@@ -40,6 +47,24 @@ class CartAdmin(admin.ModelAdmin):
         }),
     )
 
+    def get_queryset(self, request):
+        """Annotate item counts and subtotals so the changelist doesn't query per row"""
+        items = CartItem.objects.filter(cart=OuterRef('pk')).order_by().values('cart')
+        line_total = ExpressionWrapper(
+            F('quantity') * F('product__price'),
+            output_field=DecimalField(max_digits=12, decimal_places=2)
+        )
+        return super().get_queryset(request).annotate(
+            annotated_total_items=Coalesce(
+                Subquery(items.annotate(total=Sum('quantity')).values('total')), 0
+            ),
+            annotated_subtotal=Coalesce(
+                Subquery(items.annotate(total=Sum(line_total)).values('total')),
+                Decimal('0.00'),
+                output_field=DecimalField(max_digits=12, decimal_places=2)
+            ),
+        )
+
     def session_key_short(self, obj):
         """Display shortened session key"""
         if obj.session_key:
@@ -47,19 +72,27 @@ class CartAdmin(admin.ModelAdmin):
         return "-"
     session_key_short.short_description = "Session"
 
+    def total_items_display(self, obj):
+        """Display total number of items"""
+        return obj.annotated_total_items
+    total_items_display.short_description = "Total items"
+    total_items_display.admin_order_field = 'annotated_total_items'
+
     def subtotal_display(self, obj):
         """Display formatted subtotal"""
-        return f"€{obj.subtotal:.2f}"
+        return f"€{obj.annotated_subtotal:.2f}"
     subtotal_display.short_description = "Subtotal"
+    subtotal_display.admin_order_field = 'annotated_subtotal'
 
     def delivery_cost_display(self, obj):
         """Display formatted delivery cost"""
-        return f"€{obj.delivery_cost:.2f}"
+        return f"€{Cart.delivery_cost_for(obj.annotated_subtotal):.2f}"
     delivery_cost_display.short_description = "Delivery"
 
     def total_display(self, obj):
         """Display formatted total"""
-        return f"€{obj.total:.2f}"
+        total = obj.annotated_subtotal + Cart.delivery_cost_for(obj.annotated_subtotal)
+        return f"€{total:.2f}"
     total_display.short_description = "Total"
 
 
@@ -70,6 +103,9 @@ class CartItemAdmin(admin.ModelAdmin):
     list_filter = ('added_at', 'product__category')
     search_fields = ('product__name', 'cart__user__username', 'cart__session_key')
     readonly_fields = ('added_at', 'line_total_display')
+    list_select_related = ('cart__user', 'product', 'size')
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
 
     def cart_owner(self, obj):
         """Display cart owner information"""
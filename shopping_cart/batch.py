@@ -0,0 +1,226 @@
+"""
+Batched cart mutations
+
+A batch is a list of add/update/remove operations applied to one cart in
+one transaction. The affected products, their sizes and the cart's items are
+each read with one query, operations are validated and applied in memory in
+order, and the changes are written with bulk_create/bulk_update/delete.
+Totals are computed once from the final in-memory state.
+
+An operation that fails validation is reported and skipped; the others are
+still applied.
+
+The bulk writes bypass CartItem.save(): model validation (full_clean) and
+per-item signals don't run, so every rule an item must satisfy is checked
+by the batch itself. The cart's updated_at is bumped in the same transaction.
+"""
+from collections import Counter
+
+from django.db import transaction
+from django.utils import timezone
+from products.models import Product, Size
+
+from .models import Cart, CartItem
+
+MAX_BATCH_OPERATIONS = 50
+OPERATIONS = ('add', 'update', 'remove')
+
+
+class CartOperationError(ValueError):
+    """Raised for batch operations that can't be applied"""
+
+
+def _parse_id(value, field):
+    if value in (None, ''):
+        return None
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        raise CartOperationError(f'invalid {field} {value!r}')
+
+
+def parse_operations(data):
+    """
+    Validate the shape of a batch request
+
+    Args:
+        data: Decoded JSON body, {'operations': [{'op', 'product', 'size', 'quantity'}, ...]}
+
+    Returns:
+        list of operation dicts with integer ids and quantities
+    """
+    operations = data.get('operations') if isinstance(data, dict) else None
+    if not isinstance(operations, list) or not operations:
+        raise CartOperationError('operations must be a non-empty list')
+    if len(operations) > MAX_BATCH_OPERATIONS:
+        raise CartOperationError(f'at most {MAX_BATCH_OPERATIONS} operations per batch')
+
+    parsed = []
+    for raw in operations:
+        if not isinstance(raw, dict) or raw.get('op') not in OPERATIONS:
+            raise CartOperationError(f'op must be one of {", ".join(OPERATIONS)}')
+        product_id = _parse_id(raw.get('product'), 'product')
+        if product_id is None:
+            raise CartOperationError('missing product')
+        quantity = _parse_id(raw.get('quantity', 1), 'quantity') or 0
+        if quantity < 0 or (raw['op'] == 'add' and quantity == 0):
+            raise CartOperationError(f'invalid quantity {raw.get("quantity")!r}')
+        parsed.append({
+            'op': raw['op'],
+            'product': product_id,
+            'size': _parse_id(raw.get('size'), 'size'),
+            'quantity': quantity,
+        })
+    return parsed
+
+
+class _CartState:
+    """The cart's lines and per-product quantities while a batch is applied"""
+
+    def __init__(self, cart, products, sizes, product_sizes):
+        self.cart = cart
+        self.products = products
+        self.sizes = sizes
+        self.product_sizes = product_sizes
+        self.items = {
+            (item.product_id, item.size_id): item
+            for item in cart.items.select_related('product')
+        }
+        self.quantities = Counter()
+        for (product_id, _), item in self.items.items():
+            self.quantities[product_id] += item.quantity
+        self.removed = {}
+        self.changed = set()
+
+    def validate(self, op):
+        product = self.products.get(op['product'])
+        if product is None:
+            raise CartOperationError('Product not found')
+        size = None
+        if op['size'] is not None:
+            size = self.sizes.get(op['size'])
+            if size is None:
+                raise CartOperationError('Size not found')
+            if size.pk not in self.product_sizes.get(product.pk, ()):
+                raise CartOperationError('Selected size is not available for this product')
+        elif op['op'] == 'add' and self.product_sizes.get(product.pk):
+            raise CartOperationError('Please select a size for this product')
+        return product, size
+
+    def check_stock(self, product, quantity, other_quantity):
+        if not product.in_stock:
+            raise CartOperationError(f'{product.name} is currently out of stock')
+        if other_quantity + quantity > product.stock_quantity:
+            max_allowed = max(0, product.stock_quantity - other_quantity)
+            raise CartOperationError(
+                f'Cannot set quantity of {product.name} to {quantity}. Maximum allowed: {max_allowed} '
+                f'(stock: {product.stock_quantity}, other items in cart: {other_quantity})'
+            )
+
+    def set_quantity(self, product, size, key, quantity):
+        item = self.items.get(key)
+        old_quantity = item.quantity if item else 0
+        if quantity == 0:
+            if item is not None:
+                del self.items[key]
+                self.changed.discard(key)
+                if item.pk:
+                    self.removed[key] = item
+        else:
+            if item is None:
+                # Re-adding a line removed earlier in the batch reuses its row
+                item = self.removed.pop(key, None) or CartItem(cart=self.cart, product=product, size=size)
+                self.items[key] = item
+            item.quantity = quantity
+            self.changed.add(key)
+        self.quantities[product.pk] += quantity - old_quantity
+
+    def apply(self, op):
+        product, size = self.validate(op)
+        key = (product.pk, size.pk if size else None)
+        item = self.items.get(key)
+
+        if op['op'] == 'remove' or (op['op'] == 'update' and op['quantity'] == 0):
+            if item is None:
+                raise CartOperationError('Item not found in cart')
+            self.set_quantity(product, size, key, 0)
+            return 0
+
+        if op['op'] == 'update' and item is None:
+            raise CartOperationError('Item not found in cart')
+
+        current = item.quantity if item else 0
+        quantity = op['quantity'] + current if op['op'] == 'add' else op['quantity']
+        self.check_stock(product, quantity, self.quantities[product.pk] - current)
+        self.set_quantity(product, size, key, quantity)
+        return quantity
+
+    def save(self):
+        """
+        Write the changed lines in bulk
+
+        Skips CartItem.save() and full_clean(), so the batch's own checks are
+        the only validation. Touches Cart.updated_at when anything changed so
+        purge_carts doesn't treat a cart edited only by batches as abandoned.
+        """
+        if not self.changed and not self.removed:
+            return
+        to_create = [self.items[key] for key in self.changed if not self.items[key].pk]
+        to_update = [self.items[key] for key in self.changed if self.items[key].pk]
+        if self.removed:
+            CartItem.objects.filter(pk__in=[item.pk for item in self.removed.values()]).delete()
+        if to_update:
+            CartItem.objects.bulk_update(to_update, ['quantity'])
+        if to_create:
+            CartItem.objects.bulk_create(to_create)
+        self.cart.updated_at = timezone.now()
+        Cart.objects.filter(pk=self.cart.pk).update(updated_at=self.cart.updated_at)
+
+    def totals(self):
+        total_items = sum(item.quantity for item in self.items.values())
+        subtotal = sum(item.product.price * item.quantity for item in self.items.values())
+        delivery_cost = Cart.delivery_cost_for(subtotal)
+        return {
+            'cart_total_items': total_items,
+            'cart_total': float(subtotal + delivery_cost),
+            'cart_subtotal': float(subtotal),
+            'cart_delivery_cost': float(delivery_cost),
+        }
+
+
+def apply_cart_operations(cart, operations):
+    """
+    Apply parsed operations to a cart in one transaction
+
+    Returns:
+        (results, totals): one result dict per operation, in order, and the
+        cart totals after the batch
+    """
+    product_ids = {op['product'] for op in operations}
+    size_ids = {op['size'] for op in operations if op['size'] is not None}
+    results = []
+
+    with transaction.atomic():
+        products = Product.objects.select_for_update().only(
+            'id', 'name', 'price', 'in_stock', 'stock_quantity'
+        ).in_bulk(product_ids)
+        sizes = Size.objects.in_bulk(size_ids) if size_ids else {}
+        product_sizes = {}
+        for product_id, size_id in Product.sizes.through.objects.filter(
+            product_id__in=product_ids
+        ).values_list('product_id', 'size_id'):
+            product_sizes.setdefault(product_id, set()).add(size_id)
+
+        state = _CartState(cart, products, sizes, product_sizes)
+        for index, op in enumerate(operations):
+            result = {'index': index, 'op': op['op'], 'product': op['product'], 'size': op['size']}
+            try:
+                result['quantity'] = state.apply(op)
+                result['success'] = True
+            except CartOperationError as e:
+                result['success'] = False
+                result['error'] = str(e)
+            results.append(result)
+        state.save()
+
+    return results, state.totals()
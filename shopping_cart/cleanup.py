@@ -0,0 +1,88 @@
+"""
+Garbage collection of abandoned anonymous carts and expired sessions
+
+Anonymous browsing creates a Cart row per session, and sessions are only
+removed by ``clearsessions``. Both are deleted here in bounded batches, each
+in its own short transaction, so a large backlog never holds long locks.
+
+An anonymous cart is expired when the cart was last saved and its last item
+added before the cutoff, and its session no longer exists or has expired.
+Carts belonging to users are never purged.
+"""
+from datetime import timedelta
+
+from django.conf import settings
+from django.contrib.sessions.models import Session
+from django.db import transaction
+from django.db.models import Exists, OuterRef
+from django.utils import timezone
+
+from .models import Cart, CartItem
+
+DB_SESSION_ENGINES = (
+    'django.contrib.sessions.backends.db',
+    'django.contrib.sessions.backends.cached_db',
+)
+
+
+def expired_carts(now=None, max_age_days=None):
+    """Anonymous carts without activity since the cutoff"""
+    now = now or timezone.now()
+    max_age_days = settings.CART_EXPIRY_DAYS if max_age_days is None else max_age_days
+    cutoff = now - timedelta(days=max_age_days)
+
+    recent_items = CartItem.objects.filter(cart=OuterRef('pk'), added_at__gte=cutoff)
+    queryset = Cart.objects.filter(user__isnull=True, updated_at__lt=cutoff).exclude(
+        Exists(recent_items)
+    )
+    if settings.SESSION_ENGINE in DB_SESSION_ENGINES:
+        live_session = Session.objects.filter(
+            session_key=OuterRef('session_key'), expire_date__gt=now
+        )
+        queryset = queryset.exclude(Exists(live_session))
+    return queryset
+
+
+def _purge_in_batches(queryset, delete, batch_size):
+    while True:
+        with transaction.atomic():
+            pks = list(queryset.order_by('pk').values_list('pk', flat=True)[:batch_size])
+            if not pks:
+                return
+            yield len(pks), delete(pks)
+
+
+def purge_expired_carts(batch_size=None, now=None, max_age_days=None):
+    """
+    Delete expired anonymous carts and their items
+
+    Yields:
+        (carts, items) deleted per batch
+    """
+    batch_size = batch_size or settings.CART_PURGE_BATCH_SIZE
+
+    def delete(pks):
+        items, _ = CartItem.objects.filter(cart_id__in=pks).delete()
+        Cart.objects.filter(pk__in=pks).delete()
+        return items
+
+    yield from _purge_in_batches(expired_carts(now, max_age_days), delete, batch_size)
+
+
+def purge_expired_sessions(batch_size=None, now=None):
+    """
+    Delete expired database sessions
+
+    Yields:
+        number of sessions deleted per batch
+    """
+    if settings.SESSION_ENGINE not in DB_SESSION_ENGINES:
+        return
+    batch_size = batch_size or settings.CART_PURGE_BATCH_SIZE
+    queryset = Session.objects.filter(expire_date__lte=now or timezone.now())
+
+    def delete(pks):
+        return Session.objects.filter(pk__in=pks).delete()[0]
+
+    for deleted, _ in _purge_in_batches(queryset, delete, batch_size):
+        yield deleted
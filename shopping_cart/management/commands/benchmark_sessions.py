@@ -0,0 +1,88 @@
+"""
+Management command to count session queries per request for anonymous browsing
+"""
+from django.conf import settings
+from django.contrib.sessions.models import Session
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test import Client, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from products.models import Product
+from shopping_cart.models import Cart
+
+PROFILES = {
+    'db': 'django.contrib.sessions.backends.db',
+    'cached_db': 'django.contrib.sessions.backends.cached_db',
+}
+
+
+def _browse(product):
+    """An anonymous visit: browse, add one item, look at the cart, browse on"""
+    detail = reverse('product_detail', args=[product.pk])
+    return [
+        ('get', reverse('home')),
+        ('get', reverse('products')),
+        ('get', detail),
+        ('post', reverse('shopping_cart:add_to_cart', args=[product.pk])),
+        ('get', reverse('shopping_cart:cart')),
+        ('get', reverse('products')),
+        ('get', detail),
+        ('get', reverse('shopping_cart:cart')),
+    ]
+
+
+class Command(BaseCommand):
+    help = 'Count django_session queries per request for each session profile'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--visitors',
+            type=int,
+            default=20,
+            help='Anonymous visitors per profile (default: 20)',
+        )
+
+    def handle(self, *args, **options):
+        product = Product.objects.filter(in_stock=True, stock_quantity__gt=0, sizes__isnull=True).first()
+        if product is None:
+            raise CommandError('Needs an in-stock product without sizes')
+
+        self.stdout.write(self.style.SUCCESS('=== Session Benchmark ==='))
+        requests = _browse(product)
+        self.stdout.write(f'{options["visitors"]} visitors x {len(requests)} requests per profile')
+        self.stdout.write(f'{"profile":<28}{"reads/req":>10}{"writes/req":>11}{"queries/req":>12}')
+
+        for profile, engine in PROFILES.items():
+            for write_avoidance in (False, True):
+                name = f'{profile}{" + write avoidance" if write_avoidance else ""}'
+                with override_settings(SESSION_ENGINE=engine, SESSION_WRITE_AVOIDANCE=write_avoidance):
+                    reads, writes, queries = self.run(requests, product, options['visitors'])
+                count = len(requests) * options['visitors']
+                self.stdout.write(
+                    f'{name:<28}{reads / count:>10.2f}{writes / count:>11.2f}{queries / count:>12.2f}'
+                )
+
+    def run(self, requests, product, visitors):
+        reads = writes = queries = 0
+        session_keys = []
+        try:
+            for _ in range(visitors):
+                client = Client()
+                for method, path in requests:
+                    data = {'quantity': 1} if method == 'post' else None
+                    with CaptureQueriesContext(connection) as captured:
+                        getattr(client, method)(path, data)
+                    for query in captured.captured_queries:
+                        queries += 1
+                        if 'django_session' in query['sql']:
+                            if query['sql'].lstrip().upper().startswith('SELECT'):
+                                reads += 1
+                            else:
+                                writes += 1
+                session_keys.append(client.cookies[settings.SESSION_COOKIE_NAME].value)
+        finally:
+            Cart.objects.filter(session_key__in=session_keys).delete()
+            Session.objects.filter(session_key__in=session_keys).delete()
+        return reads, writes, queries
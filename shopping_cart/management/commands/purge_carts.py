@@ -0,0 +1,97 @@
+"""
+Management command to delete abandoned anonymous carts and expired sessions
+"""
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from shopping_cart.cleanup import purge_expired_carts, purge_expired_sessions
+
+
+class Command(BaseCommand):
+    help = 'Delete expired anonymous carts and sessions in bounded batches'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--days',
+            type=int,
+            default=settings.CART_EXPIRY_DAYS,
+            help=f'Keep carts with activity in this many days (default: {settings.CART_EXPIRY_DAYS})',
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=settings.CART_PURGE_BATCH_SIZE,
+            help=f'Rows deleted per transaction (default: {settings.CART_PURGE_BATCH_SIZE})',
+        )
+        parser.add_argument(
+            '--pause',
+            type=float,
+            default=0,
+            help='Seconds to sleep between batches to leave room for other writes',
+        )
+        parser.add_argument(
+            '--skip-sessions',
+            action='store_true',
+            help='Only purge carts, leave expired sessions alone',
+        )
+        parser.add_argument(
+            '--continuous',
+            action='store_true',
+            help='Keep running, purging again every --interval seconds',
+        )
+        parser.add_argument(
+            '--interval',
+            type=float,
+            default=3600,
+            help='Seconds between runs with --continuous (default: 3600)',
+        )
+
+    def handle(self, *args, **options):
+        if options['days'] < 0 or options['batch_size'] < 1:
+            raise CommandError('--days must be >= 0 and --batch-size >= 1')
+
+        self.stdout.write(self.style.SUCCESS('=== Purge Carts ==='))
+        try:
+            while True:
+                self.purge(options)
+                if not options['continuous']:
+                    break
+                time.sleep(options['interval'])
+        except KeyboardInterrupt:
+            self.stdout.write('Stopped')
+
+    def purge(self, options):
+        started = time.monotonic()
+        carts = items = batches = 0
+        for deleted_carts, deleted_items in purge_expired_carts(
+            options['batch_size'], max_age_days=options['days']
+        ):
+            carts += deleted_carts
+            items += deleted_items
+            batches += 1
+            self.pause(options)
+        elapsed = time.monotonic() - started
+        self.report(f'{carts} carts and {items} items', carts, batches, elapsed)
+
+        if options['skip_sessions']:
+            return
+        started = time.monotonic()
+        sessions = batches = 0
+        for deleted in purge_expired_sessions(options['batch_size']):
+            sessions += deleted
+            batches += 1
+            self.pause(options)
+        elapsed = time.monotonic() - started
+        self.report(f'{sessions} sessions', sessions, batches, elapsed)
+
+    def pause(self, options):
+        if options['pause']:
+            time.sleep(options['pause'])
+
+    def report(self, deleted, rows, batches, elapsed):
+        rate = rows / elapsed if elapsed else rows
+        self.stdout.write(self.style.SUCCESS(
+            f'Deleted {deleted} in {batches} batches, {elapsed:.2f}s ({rate:.0f}/s)'
+        ))
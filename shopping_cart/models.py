@@ -20,10 +20,11 @@ class Cart(models.Model):
         max_length=40, 
         null=True, 
         blank=True,
+        db_index=True,
         help_text="Session key for anonymous carts"
     )
     created_at = models.DateTimeField(auto_now_add=True)
-    updated_at = models.DateTimeField(auto_now=True)
+    updated_at = models.DateTimeField(auto_now=True, db_index=True)
 
     class Meta:
         verbose_name = "Shopping Cart"
@@ -47,8 +48,13 @@ class Cart(models.Model):
     @property
     def delivery_cost(self):
         """Calculate delivery cost - free over threshold"""
+        return self.delivery_cost_for(self.subtotal)
+
+    @staticmethod
+    def delivery_cost_for(subtotal):
+        """Delivery cost for a given subtotal"""
         free_delivery_threshold = Decimal(str(getattr(settings, 'FREE_DELIVERY_THRESHOLD', 50.00)))
-        if self.subtotal >= free_delivery_threshold:
+        if subtotal >= free_delivery_threshold:
             return Decimal('0.00')
         return Decimal('4.99')
 
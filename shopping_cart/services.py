@@ -0,0 +1,65 @@
+"""
+Cart read model
+
+Stock checks need how many units of each product a cart holds, summed over
+sizes. CartService loads that for the whole cart with one GROUP BY query
+the first time it's needed, so pages and cart updates don't each re-fetch
+the cart and sum its lines in Python.
+"""
+from django.db.models import Sum
+
+
+def product_quantities(cart):
+    """{product_id: units in the cart} summed over sizes, in one query"""
+    if cart is None or cart.pk is None:
+        return {}
+    return dict(
+        cart.items.order_by().values('product_id').annotate(
+            units=Sum('quantity')
+        ).values_list('product_id', 'units')
+    )
+
+
+class CartService:
+    """
+    Per-product quantities and stock limits for one cart
+
+    Args:
+        cart: The cart, or None for a visitor without one
+    """
+
+    def __init__(self, cart):
+        self.cart = cart
+        self._quantities = None
+
+    @classmethod
+    def for_request(cls, request, create=False):
+        """Service for the request's cart, creating the cart only if asked"""
+        from .utils import get_cart, get_or_create_cart
+
+        return cls(get_or_create_cart(request) if create else get_cart(request))
+
+    @property
+    def quantities(self):
+        if self._quantities is None:
+            self._quantities = product_quantities(self.cart)
+        return self._quantities
+
+    def changed(self):
+        """Forget the loaded quantities after the cart's lines change"""
+        self._quantities = None
+
+    def quantity_in_cart(self, product):
+        """Units of a product in the cart, all sizes combined"""
+        return self.quantities.get(getattr(product, 'pk', product), 0)
+
+    def available_stock(self, product):
+        """Units of a product that can still be added to the cart"""
+        if not product.in_stock:
+            return 0
+        return max(0, product.stock_quantity - self.quantity_in_cart(product))
+
+    def max_quantity(self, item):
+        """The largest quantity a cart line may have, given the product's other lines"""
+        other_quantity = self.quantity_in_cart(item.product_id) - item.quantity
+        return item.product.stock_quantity - other_quantity
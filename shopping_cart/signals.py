@@ -0,0 +1,32 @@
+"""
+Shopping cart signals
+"""
+from django.contrib.auth.signals import user_logged_in
+from django.db import transaction
+from django.dispatch import receiver
+
+from .models import Cart
+from .utils import CART_SESSION_KEY, merge_carts
+
+
+@receiver(user_logged_in)
+def merge_session_cart(sender, request, user, **kwargs):
+    """
+    Move the anonymous cart into the user's cart when they log in
+
+    Runs once per login, so authenticated requests never look for a
+    session cart.
+    """
+    session = getattr(request, 'session', None)
+    cart_id = session.pop(CART_SESSION_KEY, None) if session is not None else None
+    if cart_id is None:
+        return
+
+    session_cart = Cart.objects.filter(pk=cart_id, user__isnull=True).first()
+    if session_cart is None:
+        return
+
+    with transaction.atomic():
+        cart, created = Cart.objects.get_or_create(user=user)
+        merge_carts(session_cart, cart)
+        session_cart.delete()
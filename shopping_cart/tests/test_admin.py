@@ -0,0 +1,70 @@
+"""
+Tests for the shopping cart admin
+"""
+from decimal import Decimal
+from django.contrib.auth.models import User
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from products.models import Product, Category
+from shopping_cart.models import Cart, CartItem
+
+
+class CartChangelistTest(TestCase):
+    """Test cart changelists run a constant number of queries"""
+
+    def setUp(self):
+        self.admin = User.objects.create_superuser('admin', 'admin@example.com', 'password')
+        self.client.force_login(self.admin)
+        self.category = Category.objects.create(name='accessories', friendly_name='Accessories')
+        self.product = Product.objects.create(
+            name='Bike Lock',
+            price=Decimal('20.00'),
+            category=self.category,
+            stock_quantity=500,
+            in_stock=True
+        )
+
+    def create_carts(self, count):
+        for i in range(count):
+            user = User.objects.create_user(f'shopper{Cart.objects.count()}', password='password')
+            cart = Cart.objects.create(user=user)
+            CartItem.objects.create(cart=cart, product=self.product, quantity=2)
+
+    def changelist_queries(self, url):
+        # Warm up per-session work (session, permissions) before measuring
+        self.client.get(url)
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        return len(queries), response
+
+    def test_cart_changelist_query_count(self):
+        """Test the cart changelist doesn't query per row"""
+        url = reverse('admin:shopping_cart_cart_changelist')
+        self.create_carts(1)
+        one_row, response = self.changelist_queries(url)
+        self.assertContains(response, '<td class="field-subtotal_display">€40.00</td>', html=True)
+        self.assertContains(response, '<td class="field-total_display">€44.99</td>', html=True)
+
+        self.create_carts(20)
+        many_rows, _ = self.changelist_queries(url)
+        self.assertEqual(one_row, many_rows)
+
+    def test_cartitem_changelist_query_count(self):
+        """Test the cart item changelist doesn't query per row"""
+        url = reverse('admin:shopping_cart_cartitem_changelist')
+        self.create_carts(1)
+        one_row, _ = self.changelist_queries(url)
+
+        self.create_carts(20)
+        many_rows, _ = self.changelist_queries(url)
+        self.assertEqual(one_row, many_rows)
+
+    def test_cart_change_view(self):
+        """Test the change view shows annotated totals"""
+        self.create_carts(1)
+        cart = Cart.objects.get()
+        response = self.client.get(reverse('admin:shopping_cart_cart_change', args=[cart.pk]))
+        self.assertContains(response, '€44.99')
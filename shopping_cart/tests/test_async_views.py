@@ -0,0 +1,84 @@
+"""
+Tests for the async AJAX cart and order endpoints
+"""
+import asyncio
+import json
+from decimal import Decimal
+
+from django.test import TransactionTestCase
+from django.urls import reverse
+from orders.models import Order
+from products.models import Category, Product
+from shopping_cart.views import ajax_add_to_cart, cart_summary_ajax
+
+
+class AsyncAjaxViewTest(TransactionTestCase):
+    """Test async AJAX views, whose ORM work runs in pool threads"""
+
+    def setUp(self):
+        category = Category.objects.create(name='bikes', friendly_name='Bikes')
+        self.product = Product.objects.create(
+            name='Gravel Bike', price=Decimal('40.00'), category=category,
+            stock_quantity=5, in_stock=True
+        )
+
+    def post_json(self, url, data):
+        return self.client.post(url, json.dumps(data), content_type='application/json')
+
+    def test_views_are_coroutines(self):
+        """Test the endpoints are served as async views"""
+        self.assertTrue(asyncio.iscoroutinefunction(ajax_add_to_cart))
+        self.assertTrue(asyncio.iscoroutinefunction(cart_summary_ajax))
+
+    def test_add_update_and_summary(self):
+        """Test adding, updating and summarising the cart"""
+        response = self.post_json(
+            reverse('shopping_cart:ajax_add_to_cart', args=[self.product.pk]), {'quantity': 2}
+        )
+        self.assertTrue(response.json()['success'])
+        self.assertEqual(response.json()['cart_total_items'], 2)
+
+        response = self.post_json(
+            reverse('shopping_cart:ajax_update_cart', args=[self.product.pk]), {'quantity': 3}
+        )
+        self.assertEqual(response.json()['cart_total_items'], 3)
+
+        summary = self.client.get(reverse('shopping_cart:ajax_cart_summary')).json()
+        self.assertEqual(summary['cart_total_items'], 3)
+        self.assertEqual(summary['cart_subtotal'], 120.0)
+
+        checkout = self.client.get(reverse('orders:ajax_checkout_summary')).json()
+        self.assertEqual(checkout['cart_total_items'], 3)
+
+    def test_method_not_allowed(self):
+        """Test the async method decorators reject other methods"""
+        response = self.client.get(reverse('shopping_cart:ajax_add_to_cart', args=[self.product.pk]))
+        self.assertEqual(response.status_code, 405)
+        response = self.client.post(reverse('orders:ajax_checkout_summary'))
+        self.assertEqual(response.status_code, 405)
+
+    def test_order_status(self):
+        """Test order status lookups"""
+        order = Order.objects.create(
+            full_name='Test Rider', email='rider@example.com', phone_number='123',
+            country='DE', postcode='65183', town_or_city='Wiesbaden', street_address1='Main 1'
+        )
+        response = self.client.get(reverse('orders:ajax_order_status', args=[order.order_number]))
+        self.assertEqual(response.json()['status'], order.status)
+        response = self.client.get(reverse('orders:ajax_order_status', args=['missing']))
+        self.assertEqual(response.status_code, 404)
+
+    def test_batch_update(self):
+        """Test the batch endpoint applies operations and reports each one"""
+        url = reverse('shopping_cart:ajax_batch_update_cart')
+        response = self.post_json(url, {'operations': [
+            {'op': 'add', 'product': self.product.pk, 'quantity': 2},
+            {'op': 'add', 'product': self.product.pk, 'quantity': 4},
+        ]})
+        data = response.json()
+        self.assertFalse(data['success'])
+        self.assertEqual([result['success'] for result in data['results']], [True, False])
+        self.assertEqual(data['cart_total_items'], 2)
+
+        response = self.post_json(url, {'operations': [{'op': 'explode', 'product': self.product.pk}]})
+        self.assertEqual(response.status_code, 400)
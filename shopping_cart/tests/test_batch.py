@@ -0,0 +1,114 @@
+"""
+Tests for batched cart mutations
+"""
+from datetime import timedelta
+from decimal import Decimal
+from django.test import TestCase
+from django.utils import timezone
+from products.models import Product, Category, Size
+from shopping_cart.batch import CartOperationError, apply_cart_operations, parse_operations
+from shopping_cart.models import Cart, CartItem
+
+
+class CartBatchTest(TestCase):
+    """Test applying several cart operations at once"""
+
+    def setUp(self):
+        category = Category.objects.create(name='parts', friendly_name='Parts')
+        self.bell = Product.objects.create(
+            name='Bell', price=Decimal('10.00'), category=category, stock_quantity=5, in_stock=True
+        )
+        self.light = Product.objects.create(
+            name='Light', price=Decimal('25.00'), category=category, stock_quantity=2, in_stock=True
+        )
+        self.jersey = Product.objects.create(
+            name='Jersey', price=Decimal('40.00'), category=category, stock_quantity=10, in_stock=True
+        )
+        self.medium = Size.objects.create(name='M', display_name='Medium')
+        self.jersey.sizes.add(self.medium)
+        self.cart = Cart.objects.create(session_key='batch-session')
+        CartItem.objects.create(cart=self.cart, product=self.bell, quantity=1)
+
+    def apply(self, *operations):
+        return apply_cart_operations(self.cart, parse_operations({'operations': list(operations)}))
+
+    def test_mixed_operations(self):
+        """Test adds, updates and removes in one batch with per-op results"""
+        results, totals = self.apply(
+            {'op': 'update', 'product': self.bell.pk, 'quantity': 3},
+            {'op': 'add', 'product': self.light.pk, 'quantity': 2},
+            {'op': 'add', 'product': self.jersey.pk, 'size': self.medium.pk, 'quantity': 1},
+        )
+        self.assertTrue(all(result['success'] for result in results))
+        self.assertEqual(totals['cart_total_items'], 6)
+        self.assertEqual(totals['cart_subtotal'], 120.0)
+        self.assertEqual(totals['cart_delivery_cost'], 0.0)
+        self.assertEqual(
+            dict(self.cart.items.values_list('product__name', 'quantity')),
+            {'Bell': 3, 'Light': 2, 'Jersey': 1}
+        )
+
+    def test_failed_operations_are_reported_and_skipped(self):
+        """Test invalid operations fail alone without blocking the rest"""
+        results, totals = self.apply(
+            {'op': 'add', 'product': self.light.pk, 'quantity': 3},
+            {'op': 'add', 'product': self.jersey.pk, 'quantity': 1},
+            {'op': 'update', 'product': self.light.pk, 'quantity': 1},
+            {'op': 'remove', 'product': self.bell.pk},
+        )
+        self.assertEqual([result['success'] for result in results], [False, False, False, True])
+        self.assertIn('Maximum allowed: 2', results[0]['error'])
+        self.assertEqual(results[1]['error'], 'Please select a size for this product')
+        self.assertEqual(results[2]['error'], 'Item not found in cart')
+        self.assertEqual(totals['cart_total_items'], 0)
+        self.assertFalse(self.cart.items.exists())
+
+    def test_stock_is_checked_against_earlier_operations(self):
+        """Test later operations see quantities set earlier in the batch"""
+        results, _ = self.apply(
+            {'op': 'add', 'product': self.light.pk, 'quantity': 1},
+            {'op': 'add', 'product': self.light.pk, 'quantity': 1},
+            {'op': 'add', 'product': self.light.pk, 'quantity': 1},
+        )
+        self.assertEqual([result['success'] for result in results], [True, True, False])
+
+    def test_remove_then_add_reuses_line(self):
+        """Test a line removed and re-added in one batch is kept"""
+        results, totals = self.apply(
+            {'op': 'remove', 'product': self.bell.pk},
+            {'op': 'add', 'product': self.bell.pk, 'quantity': 2},
+        )
+        self.assertTrue(all(result['success'] for result in results))
+        self.assertEqual(list(self.cart.items.values_list('quantity', flat=True)), [2])
+
+    def test_cart_updated_at_is_bumped(self):
+        """Test a batch that changes lines touches the cart, a failed one doesn't"""
+        Cart.objects.filter(pk=self.cart.pk).update(updated_at=timezone.now() - timedelta(days=30))
+        stale = Cart.objects.get(pk=self.cart.pk).updated_at
+
+        self.apply({'op': 'update', 'product': self.light.pk, 'quantity': 1})
+        self.assertEqual(Cart.objects.get(pk=self.cart.pk).updated_at, stale)
+
+        self.apply({'op': 'update', 'product': self.bell.pk, 'quantity': 2})
+        self.assertGreater(Cart.objects.get(pk=self.cart.pk).updated_at, stale)
+
+    def test_query_count_is_constant(self):
+        """Test queries don't grow with the number of operations"""
+        operations = [{'op': 'add', 'product': self.bell.pk, 'quantity': 1}]
+        with self.assertNumQueries(7):
+            self.apply(*operations)
+        operations = [
+            {'op': 'update', 'product': self.bell.pk, 'quantity': 1},
+            {'op': 'add', 'product': self.light.pk, 'quantity': 1},
+            {'op': 'add', 'product': self.light.pk, 'quantity': 1},
+            {'op': 'add', 'product': self.jersey.pk, 'size': self.medium.pk, 'quantity': 2},
+        ]
+        with self.assertNumQueries(9):
+            self.apply(*operations)
+
+    def test_malformed_batches_are_rejected(self):
+        """Test the request shape is validated"""
+        for data in ({}, {'operations': []}, {'operations': [{'op': 'explode', 'product': 1}]},
+                     {'operations': [{'op': 'add', 'product': 1, 'quantity': 0}]}):
+            with self.assertRaises(CartOperationError):
+                parse_operations(data)
@@ -4,8 +4,10 @@ Tests for Shopping Cart functionality
 from django.test import TestCase, Client
 from django.urls import reverse
 from decimal import Decimal
+from django.contrib.auth.models import User
 from products.models import Product, Category, Size
 from shopping_cart.models import Cart, CartItem
+from shopping_cart.utils import merge_carts
 
 
 class CartModelTest(TestCase):
@@ -129,3 +131,51 @@ class CartViewTest(TestCase):
         # Check cart page
         response = self.client.get(reverse('shopping_cart:cart'))
         self.assertContains(response, self.product.name)
+
+
+
+class CartMergeTest(TestCase):
+    """Test merging the anonymous cart into the user's cart at login"""
+
+    def setUp(self):
+        category = Category.objects.create(name='parts', friendly_name='Parts')
+        self.bell = Product.objects.create(
+            name='Bell', price=Decimal('10.00'), category=category, stock_quantity=5, in_stock=True
+        )
+        self.light = Product.objects.create(
+            name='Light', price=Decimal('25.00'), category=category, stock_quantity=3, in_stock=True
+        )
+        self.user = User.objects.create_user(username='rider', password='testpass123')
+
+    def test_login_merges_session_cart(self):
+        """Test logging in moves the anonymous cart's lines to the user's cart"""
+        user_cart = Cart.objects.create(user=self.user)
+        CartItem.objects.create(cart=user_cart, product=self.bell, quantity=1)
+        self.client.post(reverse('shopping_cart:add_to_cart', args=[self.bell.id]), {'quantity': 2})
+        self.client.post(reverse('shopping_cart:add_to_cart', args=[self.light.id]), {'quantity': 1})
+
+        self.client.login(username='rider', password='testpass123')
+
+        self.assertEqual(Cart.objects.count(), 1)
+        self.assertEqual(
+            dict(user_cart.items.values_list('product__name', 'quantity')),
+            {'Bell': 3, 'Light': 1}
+        )
+        self.assertNotIn('cart_id', self.client.session)
+
+    def test_merge_caps_quantities_at_stock(self):
+        """Test merged quantities never exceed the product's stock"""
+        source = Cart.objects.create(session_key='anonymous')
+        target = Cart.objects.create(user=self.user)
+        CartItem.objects.create(cart=source, product=self.bell, quantity=4)
+        CartItem.objects.create(cart=source, product=self.light, quantity=3)
+        CartItem.objects.create(cart=target, product=self.bell, quantity=3)
+        CartItem.objects.create(cart=target, product=self.light, quantity=3)
+
+        with self.assertNumQueries(2):
+            merge_carts(source, target)
+
+        self.assertEqual(
+            dict(target.items.values_list('product__name', 'quantity')),
+            {'Bell': 5, 'Light': 3}
+        )
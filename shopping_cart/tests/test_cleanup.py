@@ -0,0 +1,70 @@
+"""
+Tests for purging abandoned carts and expired sessions
+"""
+from datetime import timedelta
+from decimal import Decimal
+from io import StringIO
+
+from django.contrib.auth.models import User
+from django.contrib.sessions.backends.db import SessionStore
+from django.contrib.sessions.models import Session
+from django.core.management import call_command
+from django.test import TestCase
+from django.utils import timezone
+from products.models import Category, Product
+from shopping_cart.cleanup import expired_carts
+from shopping_cart.models import Cart, CartItem
+
+
+class PurgeCartsTest(TestCase):
+    """Test the purge_carts command"""
+
+    def setUp(self):
+        category = Category.objects.create(name='parts', friendly_name='Parts')
+        self.product = Product.objects.create(
+            name='Bell', price=Decimal('10.00'), category=category, stock_quantity=5, in_stock=True
+        )
+        self.old = timezone.now() - timedelta(days=60)
+
+    def make_cart(self, age=None, item_age=None, **kwargs):
+        cart = Cart.objects.create(**kwargs)
+        item = CartItem.objects.create(cart=cart, product=self.product, quantity=1)
+        if age:
+            Cart.objects.filter(pk=cart.pk).update(updated_at=age)
+        if item_age:
+            CartItem.objects.filter(pk=item.pk).update(added_at=item_age)
+        return cart
+
+    def live_session(self):
+        session = SessionStore()
+        session.create()
+        return session.session_key
+
+    def test_only_abandoned_anonymous_carts_expire(self):
+        """Test recent, logged-in and live-session carts are kept"""
+        user = User.objects.create_user(username='rider', password='testpass123')
+        abandoned = self.make_cart(self.old, self.old, session_key='gone')
+        self.make_cart(session_key='fresh')
+        self.make_cart(self.old, session_key='recent-item')
+        self.make_cart(self.old, self.old, session_key=self.live_session())
+        self.make_cart(self.old, self.old, user=user)
+
+        self.assertEqual(list(expired_carts()), [abandoned])
+
+    def test_purges_in_batches_and_reports(self):
+        """Test carts, their items and expired sessions are deleted in batches"""
+        for index in range(5):
+            self.make_cart(self.old, self.old, session_key=f'gone-{index}')
+        kept = self.make_cart(session_key='fresh')
+        Session.objects.create(
+            session_key='expired', session_data='', expire_date=timezone.now() - timedelta(days=1)
+        )
+
+        out = StringIO()
+        call_command('purge_carts', batch_size=2, stdout=out)
+
+        self.assertEqual(list(Cart.objects.all()), [kept])
+        self.assertEqual(CartItem.objects.count(), 1)
+        self.assertFalse(Session.objects.filter(session_key='expired').exists())
+        self.assertIn('Deleted 5 carts and 5 items in 3 batches', out.getvalue())
+        self.assertIn('Deleted 1 sessions in 1 batches', out.getvalue())
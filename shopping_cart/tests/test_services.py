@@ -0,0 +1,58 @@
+"""
+Tests for the cart read model
+"""
+from decimal import Decimal
+from django.test import TestCase
+from django.urls import reverse
+from products.models import Product, Category, Size
+from shopping_cart.models import Cart, CartItem
+from shopping_cart.services import CartService
+
+
+class CartServiceTest(TestCase):
+    """Test per-product cart quantities and stock limits"""
+
+    def setUp(self):
+        category = Category.objects.create(name='clothing', friendly_name='Clothing')
+        self.jersey = Product.objects.create(
+            name='Jersey', price=Decimal('40.00'), category=category, stock_quantity=5, in_stock=True
+        )
+        self.bell = Product.objects.create(
+            name='Bell', price=Decimal('10.00'), category=category, stock_quantity=3, in_stock=True
+        )
+        self.medium = Size.objects.create(name='M', display_name='Medium')
+        self.large = Size.objects.create(name='L', display_name='Large')
+        self.jersey.sizes.add(self.medium, self.large)
+        self.cart = Cart.objects.create(session_key='service-session')
+        self.medium_line = CartItem.objects.create(
+            cart=self.cart, product=self.jersey, size=self.medium, quantity=2
+        )
+        CartItem.objects.create(cart=self.cart, product=self.jersey, size=self.large, quantity=1)
+
+    def test_quantities_are_summed_over_sizes_in_one_query(self):
+        """Test the quantity map is loaded once and covers every product"""
+        service = CartService(self.cart)
+        with self.assertNumQueries(1):
+            self.assertEqual(service.quantity_in_cart(self.jersey), 3)
+            self.assertEqual(service.quantity_in_cart(self.bell), 0)
+            self.assertEqual(service.available_stock(self.jersey), 2)
+            self.assertEqual(service.available_stock(self.bell), 3)
+            self.assertEqual(service.max_quantity(self.medium_line), 4)
+
+    def test_visitor_without_cart(self):
+        """Test a missing cart holds nothing and needs no queries"""
+        service = CartService(None)
+        with self.assertNumQueries(0):
+            self.assertEqual(service.available_stock(self.jersey), 5)
+
+    def test_cart_page_limits_each_line(self):
+        """Test the cart page offers each line the stock its other sizes leave"""
+        session = self.client.session
+        session.save()
+        Cart.objects.filter(pk=self.cart.pk).update(session_key=session.session_key)
+        response = self.client.get(reverse('shopping_cart:cart'))
+        limits = {
+            entry['item'].size.name: entry['max_available']
+            for entry in response.context['cart_items_with_stock']
+        }
+        self.assertEqual(limits, {'M': 4, 'L': 3})
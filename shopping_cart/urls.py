@@ -16,5 +16,6 @@ urlpatterns = [
     # AJAX views
     path('ajax/add/<int:product_id>/', views.ajax_add_to_cart, name='ajax_add_to_cart'),
     path('ajax/update/<int:product_id>/', views.ajax_update_cart, name='ajax_update_cart'),
+    path('ajax/batch/', views.ajax_batch_update_cart, name='ajax_batch_update_cart'),
     path('ajax/summary/', views.cart_summary_ajax, name='ajax_cart_summary'),
 ]
\ No newline at end of file
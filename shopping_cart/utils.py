@@ -1,28 +1,22 @@
-from django.contrib.sessions.models import Session
+from collections import Counter
+
 from .models import Cart, CartItem
+from .services import CartService
+
+CART_SESSION_KEY = 'cart_id'
 
 
 def get_or_create_cart(request):
     """
     Get or create a cart for the current request
     Handles both authenticated users and anonymous sessions
+
+    Anonymous carts are merged into the user's cart once, at login, by
+    shopping_cart.signals; nothing here looks for a session cart.
     """
     if request.user.is_authenticated:
         # For authenticated users, get or create cart linked to user
         cart, created = Cart.objects.get_or_create(user=request.user)
-        
-        # If user was anonymous and now logged in, merge session cart
-        try:
-            session_key = getattr(request.session, 'session_key', None)
-            if session_key:
-                session_cart = Cart.objects.filter(session_key=session_key).first()
-                if session_cart and session_cart != cart:
-                    merge_carts(session_cart, cart)
-                    session_cart.delete()
-        except (AttributeError, TypeError):
-            # Handle cases where session is not properly initialized
-            pass
-        
         return cart
     else:
         # For anonymous users, use session key
@@ -32,6 +26,10 @@ def get_or_create_cart(request):
             
             session_key = request.session.session_key
             cart, created = Cart.objects.get_or_create(session_key=session_key)
+            # Login rotates the session key; the cart id in the session
+            # data survives it and lets the login signal find this cart
+            if request.session.get(CART_SESSION_KEY) != cart.pk:
+                request.session[CART_SESSION_KEY] = cart.pk
             return cart
         except (AttributeError, TypeError):
             # Fallback: create a temporary cart without session
@@ -39,30 +37,68 @@ def get_or_create_cart(request):
             return Cart.objects.create()
 
 
+def get_cart(request):
+    """
+    Get the cart for the current request without creating one
+
+    Used by pages that only show the cart, so browsing them doesn't create
+    a session and an empty cart for every visitor.
+    """
+    if request.user.is_authenticated:
+        return Cart.objects.filter(user=request.user).first()
+    session_key = getattr(getattr(request, 'session', None), 'session_key', None)
+    if not session_key:
+        return None
+    return Cart.objects.filter(session_key=session_key).first()
+
+
 def merge_carts(source_cart, target_cart):
     """
     Merge items from source cart into target cart
     Used when anonymous user logs in
-    """
-    for source_item in source_cart.items.all():
-        # Check if item already exists in target cart
-        existing_item = target_cart.items.filter(
-            product=source_item.product,
-            size=source_item.size
-        ).first()
-        
+
+    Both carts' lines are read in one query. Lines already in the target
+    cart get the source quantity added and are saved with one bulk_update;
+    the rest are added with one bulk_create. Quantities are capped so the
+    target cart never holds more of a product than is in stock.
+    """
+    items = CartItem.objects.filter(
+        cart_id__in=[source_cart.pk, target_cart.pk]
+    ).select_related('product')
+    source_items, target_items = [], {}
+    in_cart = Counter()
+    for item in items:
+        if item.cart_id == target_cart.pk:
+            target_items[(item.product_id, item.size_id)] = item
+            in_cart[item.product_id] += item.quantity
+        else:
+            source_items.append(item)
+
+    to_update, to_create = [], []
+    for source_item in source_items:
+        product = source_item.product
+        available = product.stock_quantity - in_cart[product.pk] if product.in_stock else 0
+        quantity = min(source_item.quantity, available)
+        if quantity <= 0:
+            continue
+        in_cart[product.pk] += quantity
+
+        existing_item = target_items.get((source_item.product_id, source_item.size_id))
         if existing_item:
-            # Add quantities together
-            existing_item.quantity += source_item.quantity
-            existing_item.save()
+            existing_item.quantity += quantity
+            to_update.append(existing_item)
         else:
-            # Create new item in target cart
-            CartItem.objects.create(
+            to_create.append(CartItem(
                 cart=target_cart,
-                product=source_item.product,
-                size=source_item.size,
-                quantity=source_item.quantity
-            )
+                product=product,
+                size_id=source_item.size_id,
+                quantity=quantity
+            ))
+
+    if to_update:
+        CartItem.objects.bulk_update(to_update, ['quantity'])
+    if to_create:
+        CartItem.objects.bulk_create(to_create)
 
 
 def add_to_cart(request, product, size=None, quantity=1):
@@ -77,9 +113,7 @@ def add_to_cart(request, product, size=None, quantity=1):
         raise ValueError(f"{product.name} is currently out of stock")
     
     # Check current quantity in cart for this product (all sizes combined for simplicity)
-    current_cart_quantity = sum(
-        item.quantity for item in cart.items.filter(product=product)
-    )
+    current_cart_quantity = CartService(cart).quantity_in_cart(product)
     
     # Calculate total quantity after addition
     total_quantity = current_cart_quantity + quantity
@@ -133,9 +167,7 @@ def update_cart_item(request, product, size=None, quantity=1):
                 raise ValueError(f"{product.name} is currently out of stock")
             
             # Check current quantity in cart for this product (excluding the item being updated)
-            other_cart_quantity = sum(
-                item.quantity for item in cart.items.filter(product=product).exclude(id=cart_item.id)
-            )
+            other_cart_quantity = CartService(cart).quantity_in_cart(product) - cart_item.quantity
             
             # Calculate total quantity after update
             total_quantity = other_cart_quantity + quantity
@@ -183,21 +215,11 @@ def get_available_stock(request, product):
     """
     Get the available stock for a product considering items already in user's cart
     """
-    if not product.in_stock:
-        return 0
-    
-    cart = get_or_create_cart(request)
-    current_cart_quantity = sum(
-        item.quantity for item in cart.items.filter(product=product)
-    )
-    
-    available = product.stock_quantity - current_cart_quantity
-    return max(0, available)
+    return CartService.for_request(request).available_stock(product)
 
 
 def get_cart_quantity_for_product(request, product):
     """
     Get the total quantity of a product currently in the user's cart
     """
-    cart = get_or_create_cart(request)
-    return sum(item.quantity for item in cart.items.filter(product=product))
\ No newline at end of file
+    return CartService.for_request(request).quantity_in_cart(product)
@@ -5,7 +5,10 @@ from django.views.decorators.http import require_POST
 from django.views.decorators.csrf import csrf_exempt
 from django.urls import reverse
 from products.models import Product, Size
-from .utils import get_or_create_cart, add_to_cart, update_cart_item, remove_from_cart, clear_cart
+from wiesbaden_cyclery.async_views import async_require_POST, database_sync_to_async
+from .batch import CartOperationError, apply_cart_operations, parse_operations
+from .services import CartService
+from .utils import get_cart, get_or_create_cart, add_to_cart, update_cart_item, remove_from_cart, clear_cart
 import json
 
 
@@ -13,7 +16,7 @@ def cart_view(request):
     """
     Display the shopping cart with all items
     """
-    cart = get_or_create_cart(request)
+    cart = get_cart(request)
     cart_items = cart.items.select_related('product', 'size').all() if cart else []
     
     # Calculate free delivery delta
@@ -21,15 +24,12 @@ def cart_view(request):
     free_delivery_delta = max(0, free_delivery_threshold - float(cart.subtotal)) if cart else free_delivery_threshold
     
     # Add stock information for each cart item
+    cart_service = CartService(cart)
     cart_items_with_stock = []
     if cart_items:
         for item in cart_items:
             # Calculate available stock for this product
-            other_cart_quantity = sum(
-                cart_item.quantity for cart_item in cart_items 
-                if cart_item.product == item.product and cart_item != item
-            )
-            max_available = item.product.stock_quantity - other_cart_quantity
+            max_available = cart_service.max_quantity(item)
             
             cart_items_with_stock.append({
                 'item': item,
@@ -201,11 +201,15 @@ def clear_cart_view(request):
 
 # AJAX Views for dynamic cart updates
 
-@require_POST
-def ajax_add_to_cart(request, product_id):
+@async_require_POST
+async def ajax_add_to_cart(request, product_id):
     """
     AJAX view to add product to cart
     """
+    return await database_sync_to_async(_ajax_add_to_cart)(request, product_id)
+
+
+def _ajax_add_to_cart(request, product_id):
     try:
         product = get_object_or_404(Product, id=product_id)
         
@@ -253,11 +257,15 @@ def ajax_add_to_cart(request, product_id):
         })
 
 
-@require_POST
-def ajax_update_cart(request, product_id):
+@async_require_POST
+async def ajax_update_cart(request, product_id):
     """
     AJAX view to update cart item quantity
     """
+    return await database_sync_to_async(_ajax_update_cart)(request, product_id)
+
+
+def _ajax_update_cart(request, product_id):
     try:
         product = get_object_or_404(Product, id=product_id)
         
@@ -301,10 +309,44 @@ def ajax_update_cart(request, product_id):
         })
 
 
-def cart_summary_ajax(request):
+@async_require_POST
+async def ajax_batch_update_cart(request):
+    """
+    AJAX view to apply several add/update/remove operations at once
+    """
+    return await database_sync_to_async(_ajax_batch_update_cart)(request)
+
+
+def _ajax_batch_update_cart(request):
+    try:
+        operations = parse_operations(json.loads(request.body))
+    except (ValueError, CartOperationError) as e:
+        return JsonResponse({'success': False, 'error': str(e)}, status=400)
+
+    try:
+        cart = get_or_create_cart(request)
+        results, totals = apply_cart_operations(cart, operations)
+    except Exception as e:
+        return JsonResponse({
+            'success': False,
+            'error': str(e)
+        })
+
+    return JsonResponse({
+        'success': all(result['success'] for result in results),
+        'results': results,
+        **totals
+    })
+
+
+async def cart_summary_ajax(request):
     """
     AJAX view to get cart summary
     """
+    return await database_sync_to_async(_cart_summary_ajax)(request)
+
+
+def _cart_summary_ajax(request):
     try:
         cart = get_or_create_cart(request)
         
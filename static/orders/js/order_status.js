@@ -0,0 +1,47 @@
+// Live order status: reload the page when the order's status changes.
+// Uses the server-sent events stream and falls back to polling the JSON
+// endpoint when EventSource is unavailable or the server refuses the stream.
+function watchOrderStatus(orderNumber, currentStatus, pollInterval) {
+    var finalStatuses = ['delivered', 'cancelled'];
+    var statusUrl = '/orders/ajax/status/' + orderNumber + '/';
+
+    function changed(status) {
+        return status && status !== currentStatus;
+    }
+
+    function poll() {
+        setInterval(function() {
+            fetch(statusUrl)
+                .then(response => response.json())
+                .then(data => {
+                    if (data.success && changed(data.status)) {
+                        location.reload();
+                    }
+                })
+                .catch(error => console.log('Status check failed:', error));
+        }, pollInterval);
+    }
+
+    if (finalStatuses.indexOf(currentStatus) !== -1) {
+        return;
+    }
+    if (!window.EventSource) {
+        poll();
+        return;
+    }
+
+    var source = new EventSource(statusUrl + 'stream/');
+    source.addEventListener('status', function(event) {
+        var data = JSON.parse(event.data);
+        if (changed(data.status)) {
+            source.close();
+            location.reload();
+        }
+    });
+    source.onerror = function() {
+        // The browser reconnects on its own unless the server refused us
+        if (source.readyState === EventSource.CLOSED) {
+            poll();
+        }
+    };
+}
@@ -0,0 +1,56 @@
+"""
+Helpers for async views
+
+Django 3.2 has no async ORM, and under ASGI it runs every thread-sensitive
+sync call (sync views included) on one shared thread per process. Async
+views hand their ORM work to the thread pool with ``database_sync_to_async``
+instead, so concurrent requests don't queue behind each other.
+
+The method decorators in ``django.views.decorators.http`` wrap views in a
+sync function, which hides a coroutine view from Django; use the versions
+here for async views.
+"""
+from functools import wraps
+
+from asgiref.sync import sync_to_async
+from django.db import close_old_connections
+from django.http import HttpResponseNotAllowed
+from django.utils.log import log_response
+
+
+def database_sync_to_async(func):
+    """
+    Run blocking ORM code from an async view in the thread pool
+
+    Pool threads keep their own database connections, so stale ones are
+    closed before and after each call, as the request cycle would.
+    """
+    def inner(*args, **kwargs):
+        close_old_connections()
+        try:
+            return func(*args, **kwargs)
+        finally:
+            close_old_connections()
+    return sync_to_async(inner, thread_sensitive=False)
+
+
+def async_require_http_methods(request_method_list):
+    """Async version of django.views.decorators.http.require_http_methods"""
+    def decorator(view):
+        @wraps(view)
+        async def inner(request, *args, **kwargs):
+            if request.method not in request_method_list:
+                response = HttpResponseNotAllowed(request_method_list)
+                log_response(
+                    'Method Not Allowed (%s): %s', request.method, request.path,
+                    response=response,
+                    request=request,
+                )
+                return response
+            return await view(request, *args, **kwargs)
+        return inner
+    return decorator
+
+
+async_require_GET = async_require_http_methods(['GET'])
+async_require_POST = async_require_http_methods(['POST'])
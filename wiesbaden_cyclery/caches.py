@@ -0,0 +1,26 @@
+"""
+Helpers for choosing cache backends
+
+Some state (sitemaps, sessions, circuit breakers) must be seen by every
+worker. The local-memory and dummy backends keep a separate cache per
+process, so they can't hold it.
+"""
+PER_PROCESS_CACHE_BACKENDS = {
+    'django.core.cache.backends.locmem.LocMemCache',
+    'django.core.cache.backends.dummy.DummyCache',
+}
+
+
+def is_per_process_cache(alias, caches_setting=None):
+    """
+    True if the cache alias uses a backend private to each process
+
+    Args:
+        alias: Name of the cache in CACHES
+        caches_setting: CACHES dict to check, for use from settings.py
+    """
+    if caches_setting is None:
+        from django.conf import settings
+
+        caches_setting = settings.CACHES
+    return caches_setting[alias]['BACKEND'] in PER_PROCESS_CACHE_BACKENDS
@@ -0,0 +1,139 @@
+"""
+HTTP caching policy for catalog pages
+
+Catalog pages are validated against a global catalog version: the time of
+the last product, category, size or review change. It's stored in the
+database (``products.CatalogVersion``) so all workers and dynos agree on it,
+bumped by model signals once their transaction commits, seeded from the
+newest ``Product.updated_at`` and cached for ``CATALOG_VERSION_TTL`` seconds.
+
+- Visitors without a session cookie all see the same page. Their responses
+  carry an ETag and Last-Modified and are ``public`` so a reverse proxy can
+  serve them.
+- Visitors with a session, or who are logged in, see their own cart and
+  name in the header. Their ETag also covers the user and cart contents, and
+  their responses are ``private`` and must be revalidated.
+- Pages with pending flash messages are always rendered.
+
+Every response varies on Cookie. Anything that sets a cookie while rendering
+(a new session, the CSRF cookie) turns the response private.
+"""
+import hashlib
+from functools import wraps
+
+from django.conf import settings
+from django.contrib.messages import get_messages
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Max
+from django.utils.cache import get_conditional_response, patch_cache_control, patch_vary_headers
+from django.utils import timezone
+from django.utils.http import http_date
+
+CATALOG_VERSION_KEY = 'catalog:version'
+
+
+def catalog_version():
+    """
+    Timestamp of the last catalog change
+
+    Seeded from the newest product when no change has been recorded yet.
+    """
+    version = cache.get(CATALOG_VERSION_KEY)
+    if version is None:
+        from products.models import CatalogVersion, Product
+
+        changed_at = CatalogVersion.objects.filter(pk=1).values_list('changed_at', flat=True).first()
+        if changed_at is None:
+            latest = Product.objects.aggregate(latest=Max('updated_at'))['latest']
+            changed_at = CatalogVersion.objects.get_or_create(
+                pk=1, defaults={'changed_at': latest or timezone.now()}
+            )[0].changed_at
+        version = changed_at.timestamp()
+        cache.set(CATALOG_VERSION_KEY, version, settings.CATALOG_VERSION_TTL)
+    return version
+
+
+def touch_catalog():
+    """Mark the catalog as changed, invalidating every catalog page"""
+    # Written after commit, so writers don't queue on the version row's lock
+    # and a rolled back change doesn't invalidate anything
+    transaction.on_commit(_record_catalog_change)
+
+
+def _record_catalog_change():
+    from products.models import CatalogVersion
+
+    changed_at = timezone.now()
+    CatalogVersion.objects.update_or_create(pk=1, defaults={'changed_at': changed_at})
+    cache.set(CATALOG_VERSION_KEY, changed_at.timestamp(), settings.CATALOG_VERSION_TTL)
+
+
+def _is_personal(request):
+    return request.user.is_authenticated or settings.SESSION_COOKIE_NAME in request.COOKIES
+
+
+def _cart_fingerprint(request):
+    from shopping_cart.models import CartItem
+
+    if request.user.is_authenticated:
+        items = CartItem.objects.filter(cart__user=request.user)
+    else:
+        items = CartItem.objects.filter(cart__session_key=request.COOKIES[settings.SESSION_COOKIE_NAME])
+    return sorted(items.values_list('product_id', 'size_id', 'quantity'))
+
+
+def _etag(request, version, personal):
+    parts = [settings.PAGE_CACHE_VERSION, request.get_full_path(), repr(version)]
+    if personal:
+        parts += [str(request.user.pk), repr(_cart_fingerprint(request))]
+    return f'"{hashlib.md5("|".join(parts).encode()).hexdigest()}"'
+
+
+def _sets_cookies(request, response):
+    return bool(response.cookies) or request.META.get('CSRF_COOKIE_USED') or request.session.modified
+
+
+def catalog_page(view):
+    """
+    Apply the catalog caching policy to a GET view
+    """
+    @wraps(view)
+    def wrapper(request, *args, **kwargs):
+        if request.method not in ('GET', 'HEAD'):
+            return view(request, *args, **kwargs)
+
+        personal = _is_personal(request)
+        if len(get_messages(request)):
+            response = view(request, *args, **kwargs)
+            patch_vary_headers(response, ['Cookie'])
+            patch_cache_control(response, private=True, no_cache=True)
+            return response
+
+        version = catalog_version()
+        etag = _etag(request, version, personal)
+        # Last-Modified can't express user or cart changes
+        last_modified = None if personal else int(version)
+
+        response = get_conditional_response(request, etag=etag, last_modified=last_modified)
+        if response is None:
+            response = view(request, *args, **kwargs)
+            if response.status_code != 200:
+                return response
+            if not personal and _sets_cookies(request, response):
+                personal = True
+                last_modified = None
+
+        response['ETag'] = etag
+        if last_modified is not None:
+            response['Last-Modified'] = http_date(last_modified)
+        patch_vary_headers(response, ['Cookie'])
+        if personal:
+            patch_cache_control(response, private=True, max_age=0, must_revalidate=True)
+        else:
+            patch_cache_control(
+                response, public=True, max_age=settings.CATALOG_PAGE_MAX_AGE,
+                s_maxage=settings.CATALOG_PAGE_SHARED_MAX_AGE
+            )
+        return response
+    return wrapper
@@ -0,0 +1,50 @@
+"""
+Session middleware that skips writes which wouldn't change anything
+
+Django saves the session whenever it was marked modified. That includes
+assigning a key the value it already holds, and flash messages that fell
+back to the session and were added and shown in the same request. With
+SESSION_WRITE_AVOIDANCE on, the session data is compared with what was
+loaded and the save is skipped when it is unchanged.
+
+The session engine itself is chosen by SESSION_PROFILE in settings.
+"""
+from django.conf import settings
+from django.contrib.sessions.middleware import SessionMiddleware as DjangoSessionMiddleware
+
+
+class ChangeTrackingSessionMixin:
+    """Remember the session key and serialized data as loaded"""
+
+    _loaded = None
+
+    def load(self):
+        data = super().load()
+        self._loaded = (self.session_key, self.serializer().dumps(data))
+        return data
+
+    def has_changed(self):
+        """False if the session still holds exactly what was loaded"""
+        if self._loaded is None or not hasattr(self, '_session_cache'):
+            return True
+        return self._loaded != (self.session_key, self.serializer().dumps(self._session_cache))
+
+
+class SessionMiddleware(DjangoSessionMiddleware):
+    """
+    SessionMiddleware that doesn't save sessions whose data is unchanged
+    """
+
+    def __init__(self, get_response=None):
+        super().__init__(get_response)
+        if settings.SESSION_WRITE_AVOIDANCE:
+            self.SessionStore = type(
+                'SessionStore', (ChangeTrackingSessionMixin, self.SessionStore), {}
+            )
+
+    def process_response(self, request, response):
+        session = getattr(request, 'session', None)
+        if isinstance(session, ChangeTrackingSessionMixin) and session.modified \
+                and not session.has_changed():
+            session.modified = False
+        return super().process_response(request, response)
@@ -13,7 +13,9 @@ https://docs.djangoproject.com/en/3.2/ref/settings/
 import os
 from pathlib import Path
 from decouple import config
+from django.core.exceptions import ImproperlyConfigured
 import dj_database_url
+from wiesbaden_cyclery.caches import is_per_process_cache
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
 BASE_DIR = Path(__file__).resolve().parent.parent
@@ -73,7 +75,7 @@ CRISPY_TEMPLATE_PACK = "bootstrap4"
 MIDDLEWARE = [
     'django.middleware.security.SecurityMiddleware',
     'whitenoise.middleware.WhiteNoiseMiddleware',
-    'django.contrib.sessions.middleware.SessionMiddleware',
+    'wiesbaden_cyclery.sessions.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
@@ -123,6 +125,24 @@ else:
     }
 
 
+# Sessions
+# SESSION_PROFILE=cached_db reads sessions from the cache and falls back to
+# django_session on a miss; every write still goes to the database. It needs
+# a cache shared by all workers, which the default locmem cache is not, so
+# SESSION_CACHE_ALIAS must name a shared cache in CACHES (checked below).
+# Signed-cookie sessions don't fit: anonymous carts are keyed by the session
+# key, which that engine changes on every write.
+# SESSION_WRITE_AVOIDANCE skips saving sessions whose data didn't change
+# (see wiesbaden_cyclery/sessions.py)
+SESSION_PROFILE = config('SESSION_PROFILE', default='db')
+if SESSION_PROFILE == 'cached_db':
+    SESSION_ENGINE = 'django.contrib.sessions.backends.cached_db'
+    SESSION_CACHE_ALIAS = config('SESSION_CACHE_ALIAS', default='default')
+elif SESSION_PROFILE != 'db':
+    raise ImproperlyConfigured(f"SESSION_PROFILE must be 'db' or 'cached_db', not {SESSION_PROFILE!r}")
+SESSION_WRITE_AVOIDANCE = config('SESSION_WRITE_AVOIDANCE', default=True, cast=bool)
+
+
 # Caching
 # https://docs.djangoproject.com/en/3.2/topics/cache/
 
@@ -138,6 +158,35 @@ CACHES = {
     }
 }
 
+# Each worker would otherwise read its own, stale copy of a session
+if SESSION_PROFILE == 'cached_db' and is_per_process_cache(SESSION_CACHE_ALIAS, CACHES):
+    raise ImproperlyConfigured(
+        'SESSION_PROFILE=cached_db needs a cache shared by all workers; '
+        f'SESSION_CACHE_ALIAS {SESSION_CACHE_ALIAS!r} is private to each process'
+    )
+
+# How long SKU-keyed product summaries stay cached (see products/summaries.py)
+PRODUCT_SUMMARY_CACHE_TIMEOUT = config('PRODUCT_SUMMARY_CACHE_TIMEOUT', default=3600, cast=int)
+
+# Sitemaps: products per chunk (the protocol allows 50,000 URLs per file),
+# how long rendered sitemaps stay cached and how long crawlers may reuse them.
+# SITEMAP_CACHE should name a cache shared by all workers in production;
+# render_sitemaps refuses to run against a per-process one
+SITEMAP_CHUNK_SIZE = config('SITEMAP_CHUNK_SIZE', default=5000, cast=int)
+SITEMAP_CACHE_TIMEOUT = config('SITEMAP_CACHE_TIMEOUT', default=86400, cast=int)
+SITEMAP_MAX_AGE = config('SITEMAP_MAX_AGE', default=3600, cast=int)
+SITEMAP_PROTOCOL = config('SITEMAP_PROTOCOL', default='https')
+SITEMAP_CACHE = config('SITEMAP_CACHE', default='default')
+
+# Catalog page caching (wiesbaden_cyclery.http_cache). PAGE_CACHE_VERSION is
+# part of every ETag, so a new release invalidates pages rendered by the old
+# templates; Heroku's dyno metadata provides the slug commit.
+PAGE_CACHE_VERSION = config('PAGE_CACHE_VERSION', default=config('HEROKU_SLUG_COMMIT', default=''))
+CATALOG_PAGE_MAX_AGE = config('CATALOG_PAGE_MAX_AGE', default=60, cast=int)
+CATALOG_PAGE_SHARED_MAX_AGE = config('CATALOG_PAGE_SHARED_MAX_AGE', default=300, cast=int)
+# Seconds each worker may reuse the catalog version read from the database
+CATALOG_VERSION_TTL = config('CATALOG_VERSION_TTL', default=5, cast=int)
+
 
 # Password validation
 # https://docs.djangoproject.com/en/3.2/ref/settings/#auth-password-validators
@@ -189,6 +238,9 @@ MEDIA_URL = '/media/'
 # Static files configuration - LOCAL ONLY (no AWS)
 STATICFILES_STORAGE = 'whitenoise.storage.CompressedManifestStaticFilesStorage'
 
+# Runs the tests with plain static storage, so they don't need collectstatic
+TEST_RUNNER = 'wiesbaden_cyclery.test_runner.TestRunner'
+
 # AWS S3 Configuration - MEDIA FILES ONLY
 USE_AWS = config('USE_AWS', default=False, cast=bool)
 
@@ -201,7 +253,8 @@ if USE_AWS:
     AWS_S3_CUSTOM_DOMAIN = f'{AWS_STORAGE_BUCKET_NAME}.s3.amazonaws.com'
     AWS_DEFAULT_ACL = None
     AWS_S3_OBJECT_PARAMETERS = {
-        'CacheControl': 'max-age=86400',
+        # Media names are content hashes, so an object never changes
+        'CacheControl': 'public, max-age=31536000, immutable',
     }
     
     # S3 media settings ONLY - NO static files
@@ -238,6 +291,41 @@ STRIPE_PUBLIC_KEY = config('STRIPE_PUBLIC_KEY', default='')
 STRIPE_SECRET_KEY = config('STRIPE_SECRET_KEY', default='')
 STRIPE_WH_SECRET = config('STRIPE_WH_SECRET', default='')
 
+# Payment gateway adapter (see orders/payment_gateway.py)
+# Use 'orders.payment_gateway.FakeGateway' to run checkout without network access
+PAYMENT_GATEWAY = config('PAYMENT_GATEWAY', default='orders.payment_gateway.StripeGateway')
+# Point at a local stand-in (python manage.py run_fake_stripe) for offline load tests
+STRIPE_API_BASE = config('STRIPE_API_BASE', default='')
+STRIPE_CONNECT_TIMEOUT = config('STRIPE_CONNECT_TIMEOUT', default=3.05, cast=float)
+STRIPE_READ_TIMEOUT = config('STRIPE_READ_TIMEOUT', default=10.0, cast=float)
+STRIPE_MAX_NETWORK_RETRIES = config('STRIPE_MAX_NETWORK_RETRIES', default=2, cast=int)
+STRIPE_HTTP_POOL_SIZE = config('STRIPE_HTTP_POOL_SIZE', default=10, cast=int)
+
+# Circuit breaker around Stripe calls (see orders/circuit_breaker.py)
+# STRIPE_CIRCUIT_CACHE should name a cache shared by all workers in production
+STRIPE_CIRCUIT_BREAKER_ENABLED = config('STRIPE_CIRCUIT_BREAKER_ENABLED', default=True, cast=bool)
+STRIPE_CIRCUIT_FAILURE_THRESHOLD = config('STRIPE_CIRCUIT_FAILURE_THRESHOLD', default=5, cast=int)
+STRIPE_CIRCUIT_FAILURE_WINDOW = config('STRIPE_CIRCUIT_FAILURE_WINDOW', default=60, cast=int)
+STRIPE_CIRCUIT_RESET_TIMEOUT = config('STRIPE_CIRCUIT_RESET_TIMEOUT', default=30, cast=int)
+STRIPE_CIRCUIT_CACHE = config('STRIPE_CIRCUIT_CACHE', default='default')
+
+# Per-cart payment intents and their counters (see orders/stripe_utils.py)
+# PAYMENT_INTENT_CACHE should name a cache shared by all workers in production
+PAYMENT_INTENT_CACHE = config('PAYMENT_INTENT_CACHE', default='default')
+
+# Identical payment errors on an order within this many seconds are collapsed
+# into a counter on one OrderStatusHistory entry
+PAYMENT_ERROR_AGGREGATION_WINDOW = config('PAYMENT_ERROR_AGGREGATION_WINDOW', default=300, cast=int)
+
+# Live order status streams (orders.order_events). Each open stream holds a
+# server thread, so keep ORDER_EVENTS_MAX_CONNECTIONS below the gunicorn
+# thread count; streams end after ORDER_EVENTS_STREAM_TIMEOUT seconds and
+# the browser reconnects after ORDER_EVENTS_RETRY_MS
+ORDER_EVENTS_MAX_CONNECTIONS = config('ORDER_EVENTS_MAX_CONNECTIONS', default=4, cast=int)
+ORDER_EVENTS_HEARTBEAT = config('ORDER_EVENTS_HEARTBEAT', default=15, cast=int)
+ORDER_EVENTS_STREAM_TIMEOUT = config('ORDER_EVENTS_STREAM_TIMEOUT', default=300, cast=int)
+ORDER_EVENTS_RETRY_MS = config('ORDER_EVENTS_RETRY_MS', default=5000, cast=int)
+
 # Email settings - Use SMTP if credentials are provided, otherwise console
 EMAIL_HOST_USER = config('EMAIL_HOST_USER', default='')
 EMAIL_HOST_PASSWORD = config('EMAIL_HOST_PASSWORD', default='')
@@ -261,6 +349,11 @@ SERVER_EMAIL = DEFAULT_FROM_EMAIL
 # Free delivery threshold
 FREE_DELIVERY_THRESHOLD = config('FREE_DELIVERY_THRESHOLD', default=50.00, cast=float)
 
+# Anonymous carts idle for CART_EXPIRY_DAYS whose session has ended are
+# deleted by `manage.py purge_carts`, CART_PURGE_BATCH_SIZE rows at a time
+CART_EXPIRY_DAYS = config('CART_EXPIRY_DAYS', default=30, cast=int)
+CART_PURGE_BATCH_SIZE = config('CART_PURGE_BATCH_SIZE', default=1000, cast=int)
+
 # Analytics Configuration
 GA_MEASUREMENT_ID = config('GA_MEASUREMENT_ID', default='')
 FB_PIXEL_ID = config('FB_PIXEL_ID', default='')
@@ -1,7 +1,41 @@
+"""
+Sitemaps for Wiesbaden Cyclery
+
+``sitemap.xml`` is a sitemap index pointing at one sitemap per section.
+Products are split into chunks by primary key range, so a product change
+only affects the index and the one chunk holding that product.
+
+Rendered sitemaps are kept in the ``SITEMAP_CACHE`` cache with an ETag and
+Last-Modified value. They are rendered on the first request after a change,
+or ahead of time by the ``render_sitemaps`` management command. Invalidation
+only reaches other workers through a shared cache, so pre-rendering refuses a
+per-process backend and lazily rendered sitemaps are kept there no longer
+than crawlers may reuse them anyway (``SITEMAP_MAX_AGE``).
+"""
+import hashlib
+import time
+from collections import namedtuple
+
+from django.conf import settings
 from django.contrib.sitemaps import Sitemap
+from django.contrib.sites.models import Site
+from django.core.cache import caches
+from django.core.exceptions import ImproperlyConfigured
+from django.db.models import F, Max
+from django.template.loader import render_to_string
 from django.urls import reverse
 from products.models import Product, Category
 
+from .caches import is_per_process_cache
+
+SITEMAP_CACHE_PREFIX = 'sitemap:'
+INDEX = 'index'
+PRODUCT_CHUNK_PREFIX = 'products-'
+
+RenderedSitemap = namedtuple(
+    'RenderedSitemap', ['content', 'etag', 'last_modified', 'domain', 'protocol']
+)
+
 
 class StaticViewSitemap(Sitemap):
     """Sitemap for static pages"""
@@ -22,12 +56,26 @@ class StaticViewSitemap(Sitemap):
 
 
 class ProductSitemap(Sitemap):
-    """Sitemap for product pages"""
+    """
+    Sitemap for product pages
+
+    Args:
+        chunk: Only include products in this primary key chunk
+    """
     changefreq = 'weekly'
     priority = 0.8
 
+    def __init__(self, chunk=None):
+        self.chunk = chunk
+
     def items(self):
-        return Product.objects.filter(in_stock=True).order_by('-updated_at')
+        products = Product.objects.filter(in_stock=True).order_by('pk').only('pk', 'updated_at')
+        if self.chunk is not None:
+            size = settings.SITEMAP_CHUNK_SIZE
+            products = products.filter(
+                pk__gt=(self.chunk - 1) * size, pk__lte=self.chunk * size
+            )
+        return products
 
     def lastmod(self, obj):
         return obj.updated_at
@@ -45,4 +93,158 @@ class CategorySitemap(Sitemap):
         return Category.objects.all().order_by('name')
 
     def location(self, obj):
-        return reverse('products') + f'?category={obj.name}'
\ No newline at end of file
+        return reverse('products') + f'?category={obj.name}'
+
+
+# Sections that fit in a single sitemap
+SECTIONS = {
+    'static': StaticViewSitemap,
+    'categories': CategorySitemap,
+}
+
+
+def product_chunk(product_id):
+    """Number of the product sitemap chunk holding a product"""
+    return (product_id - 1) // settings.SITEMAP_CHUNK_SIZE + 1
+
+
+def product_chunks():
+    """
+    Non-empty product chunks with their latest update, in one GROUP BY
+
+    Returns:
+        dict of chunk number -> latest updated_at
+    """
+    rows = Product.objects.filter(in_stock=True).annotate(
+        chunk=(F('pk') - 1) / settings.SITEMAP_CHUNK_SIZE + 1
+    ).values('chunk').annotate(lastmod=Max('updated_at')).order_by('chunk')
+    return {row['chunk']: row['lastmod'] for row in rows}
+
+
+def sitemap_names():
+    """Names of every sitemap, index first"""
+    return [INDEX, *SECTIONS, *(f'{PRODUCT_CHUNK_PREFIX}{chunk}' for chunk in product_chunks())]
+
+
+def _parse_product_chunk(name):
+    if not name.startswith(PRODUCT_CHUNK_PREFIX):
+        return None
+    chunk = name[len(PRODUCT_CHUNK_PREFIX):]
+    return int(chunk) if chunk.isdigit() and int(chunk) > 0 else None
+
+
+def _absolute(protocol, domain, path):
+    return f'{protocol}://{domain}{path}'
+
+
+def _render_index(domain, protocol):
+    chunks = product_chunks()
+    locations = [
+        _absolute(protocol, domain, reverse('sitemap_section', args=[name]))
+        for name in [*SECTIONS, *(f'{PRODUCT_CHUNK_PREFIX}{chunk}' for chunk in chunks)]
+    ]
+    content = render_to_string('sitemap_index.xml', {'sitemaps': locations})
+    return content, max(chunks.values(), default=None)
+
+
+def _render_urlset(sitemap, domain, protocol):
+    site = Site(domain=domain, name=domain)
+    urls = sitemap.get_urls(site=site, protocol=protocol)
+    if not urls:
+        return None, None
+    content = render_to_string('sitemap.xml', {'urlset': urls})
+    return content, max((url['lastmod'] for url in urls if url['lastmod']), default=None)
+
+
+def render_sitemap(name, domain, protocol):
+    """
+    Render one sitemap without touching the cache
+
+    Returns:
+        RenderedSitemap, or None for unknown names and empty product chunks
+    """
+    if name == INDEX:
+        content, last_modified = _render_index(domain, protocol)
+    elif name in SECTIONS:
+        content, last_modified = _render_urlset(SECTIONS[name](), domain, protocol)
+    else:
+        chunk = _parse_product_chunk(name)
+        if chunk is None:
+            return None
+        content, last_modified = _render_urlset(ProductSitemap(chunk), domain, protocol)
+    if content is None:
+        return None
+
+    content = content.encode()
+    return RenderedSitemap(
+        content=content,
+        etag=f'"{hashlib.md5(content).hexdigest()}"',
+        last_modified=int(last_modified.timestamp()) if last_modified else int(time.time()),
+        domain=domain,
+        protocol=protocol,
+    )
+
+
+def _sitemap_cache():
+    return caches[settings.SITEMAP_CACHE]
+
+
+def _cache_timeout():
+    if is_per_process_cache(settings.SITEMAP_CACHE):
+        # Other workers' copies can't be invalidated
+        return min(settings.SITEMAP_CACHE_TIMEOUT, settings.SITEMAP_MAX_AGE)
+    return settings.SITEMAP_CACHE_TIMEOUT
+
+
+def get_sitemap(name, domain, protocol=None):
+    """
+    Cached sitemap, rendered and stored on a miss
+
+    Returns:
+        RenderedSitemap or None
+    """
+    protocol = protocol or settings.SITEMAP_PROTOCOL
+    key = f'{SITEMAP_CACHE_PREFIX}{name}'
+    rendered = _sitemap_cache().get(key)
+    if rendered is not None and (rendered.domain, rendered.protocol) == (domain, protocol):
+        return rendered
+
+    rendered = render_sitemap(name, domain, protocol)
+    if rendered is not None:
+        _sitemap_cache().set(key, rendered, _cache_timeout())
+    return rendered
+
+
+def prerender_sitemaps(domain, protocol=None):
+    """
+    Render every sitemap into the cache
+
+    Returns:
+        dict of name -> RenderedSitemap
+
+    Raises:
+        ImproperlyConfigured: SITEMAP_CACHE is private to this process
+    """
+    if is_per_process_cache(settings.SITEMAP_CACHE):
+        raise ImproperlyConfigured(
+            f'SITEMAP_CACHE ({settings.SITEMAP_CACHE!r}) is private to each process; '
+            'pre-rendered sitemaps would only be seen by this one'
+        )
+    protocol = protocol or settings.SITEMAP_PROTOCOL
+    rendered = {}
+    for name in sitemap_names():
+        sitemap = render_sitemap(name, domain, protocol)
+        if sitemap is not None:
+            _sitemap_cache().set(f'{SITEMAP_CACHE_PREFIX}{name}', sitemap, settings.SITEMAP_CACHE_TIMEOUT)
+            rendered[name] = sitemap
+    return rendered
+
+
+def invalidate_sitemaps(names):
+    _sitemap_cache().delete_many([f'{SITEMAP_CACHE_PREFIX}{name}' for name in names])
+
+
+def invalidate_product_sitemaps(product_ids):
+    """Drop the index and the chunks holding the given products"""
+    chunks = {product_chunk(product_id) for product_id in product_ids}
+    invalidate_sitemaps([INDEX, *(f'{PRODUCT_CHUNK_PREFIX}{chunk}' for chunk in chunks)])
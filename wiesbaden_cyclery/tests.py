@@ -1,10 +1,35 @@
 """
 Tests for main Wiesbaden Cyclery application
 """
-from django.test import TestCase, Client
+import hashlib
+import io
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+from decimal import Decimal
+
+from django.conf import settings
+from django.contrib.sessions.backends.db import SessionStore
+from django.core.cache import cache, caches
+from django.core.exceptions import ImproperlyConfigured
+from django.core.files.base import ContentFile
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.http import HttpResponse
+from django.test import RequestFactory, TestCase, Client, override_settings
 from django.urls import reverse
 from django.contrib.auth.models import User
 
+from custom_storages import IMMUTABLE_CACHE_CONTROL, HashedFileSystemStorage, MediaStorage
+from products.models import Category, Product
+from shopping_cart.models import Cart
+from wiesbaden_cyclery.caches import is_per_process_cache
+from wiesbaden_cyclery.http_cache import catalog_version, touch_catalog
+from wiesbaden_cyclery.sessions import SessionMiddleware
+from wiesbaden_cyclery.sitemaps import prerender_sitemaps
+
 
 class HomepageTestCase(TestCase):
     """Test cases for the homepage functionality"""
@@ -72,4 +97,288 @@ class BasicProjectTestCase(TestCase):
         with connection.cursor() as cursor:
             cursor.execute("SELECT 1")
             result = cursor.fetchone()
-            self.assertEqual(result[0], 1)
\ No newline at end of file
+            self.assertEqual(result[0], 1)
+
+
+class ContentHashStorageTestCase(TestCase):
+    """Test cases for the content-hashed media storage"""
+
+    def setUp(self):
+        """Set up a storage in a temporary directory"""
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+        self.storage = HashedFileSystemStorage(location=f'{self.tmp.name}/media', base_url='/media/')
+
+    def test_names_by_content_hash(self):
+        """Test that files are stored under a hash of their content"""
+        name = self.storage.save('products/Bike.JPG', ContentFile(b'image bytes'))
+        digest = hashlib.sha256(b'image bytes').hexdigest()[:16]
+        self.assertEqual(name, f'products/{digest}.jpg')
+        self.assertEqual(self.storage.url(name), f'/media/products/{digest}.jpg')
+
+    def test_identical_content_is_stored_once(self):
+        """Test that identical uploads share one file"""
+        first = self.storage.save('products/a.jpg', ContentFile(b'same'))
+        second = self.storage.save('products/b.jpg', ContentFile(b'same'))
+        other = self.storage.save('products/c.jpg', ContentFile(b'different'))
+        self.assertEqual(first, second)
+        self.assertNotEqual(first, other)
+        self.assertEqual(len(os.listdir(f'{self.tmp.name}/media/products')), 2)
+
+    def test_shared_files_are_kept_on_delete(self):
+        """Test that files still used by a product are not deleted"""
+        name = self.storage.save('products/a.jpg', ContentFile(b'bytes'))
+        product = Product.objects.create(
+            name='Bike', price=Decimal('100.00'), image=name, stock_quantity=1, in_stock=True
+        )
+
+        self.storage.delete(name)
+        self.assertTrue(self.storage.exists(name))
+
+        Product.objects.filter(pk=product.pk).update(image='')
+        self.storage.delete(name)
+        self.assertFalse(self.storage.exists(name))
+
+    def test_s3_storage_headers(self):
+        """Test that S3 media is public, unsigned and cached for a year"""
+        self.assertEqual(MediaStorage.object_parameters, {'CacheControl': IMMUTABLE_CACHE_CONTROL})
+        self.assertFalse(MediaStorage.querystring_auth)
+        self.assertIn('immutable', IMMUTABLE_CACHE_CONTROL)
+
+
+SITEMAP_CACHE_DIR = tempfile.mkdtemp()
+
+
+@override_settings(
+    SITEMAP_CHUNK_SIZE=2,
+    SITEMAP_CACHE='sitemaps',
+    CACHES={
+        **settings.CACHES,
+        'sitemaps': {
+            'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+            'LOCATION': SITEMAP_CACHE_DIR,
+        },
+    },
+)
+class SitemapTestCase(TestCase):
+    """Test cases for the chunked, cached sitemaps"""
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(SITEMAP_CACHE_DIR, ignore_errors=True)
+
+    def setUp(self):
+        """Create products spread over two chunks"""
+        cache.clear()
+        self.sitemap_cache = caches['sitemaps']
+        self.sitemap_cache.clear()
+        category = Category.objects.create(name='bikes', friendly_name='Bikes')
+        self.products = [
+            Product.objects.create(
+                name=f'Bike {i}', price=Decimal('100.00'), category=category,
+                stock_quantity=3, in_stock=True
+            )
+            for i in range(3)
+        ]
+        self.chunk = (self.products[2].pk - 1) // 2 + 1
+
+    def test_index_lists_sections_and_chunks(self):
+        """Test that the index links every section and product chunk"""
+        response = self.client.get(reverse('sitemap'))
+        self.assertEqual(response.status_code, 200)
+        self.assertContains(response, '/sitemap-static.xml')
+        self.assertContains(response, '/sitemap-categories.xml')
+        self.assertContains(response, f'/sitemap-products-{self.chunk}.xml')
+
+    def test_chunk_contains_its_products(self):
+        """Test that a chunk holds only products in its ID range"""
+        response = self.client.get(reverse('sitemap_section', args=[f'products-{self.chunk}']))
+        self.assertContains(response, reverse('product_detail', args=[self.products[2].pk]))
+        self.assertNotContains(response, reverse('product_detail', args=[self.products[0].pk]) + '<')
+
+    def test_unknown_sitemap_is_404(self):
+        """Test that unknown and empty sitemaps are not found"""
+        self.assertEqual(self.client.get(reverse('sitemap_section', args=['products-999'])).status_code, 404)
+        self.assertEqual(self.client.get(reverse('sitemap_section', args=['nope'])).status_code, 404)
+
+    def test_conditional_get(self):
+        """Test that a repeat request with the ETag gets a 304 without queries"""
+        url = reverse('sitemap_section', args=[f'products-{self.chunk}'])
+        response = self.client.get(url)
+        self.assertIn('Last-Modified', response)
+        with self.assertNumQueries(0):
+            not_modified = self.client.get(url, HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(not_modified.status_code, 304)
+
+    def test_product_change_invalidates_only_its_chunk(self):
+        """Test that saving a product drops the index and its own chunk"""
+        other_chunk = (self.products[0].pk - 1) // 2 + 1
+        prerender_sitemaps('testserver')
+        self.products[2].name = 'Renamed'
+        self.products[2].save()
+        self.assertIsNone(self.sitemap_cache.get('sitemap:index'))
+        self.assertIsNone(self.sitemap_cache.get(f'sitemap:products-{self.chunk}'))
+        if other_chunk != self.chunk:
+            self.assertIsNotNone(self.sitemap_cache.get(f'sitemap:products-{other_chunk}'))
+        self.assertIsNotNone(self.sitemap_cache.get('sitemap:static'))
+
+    def test_prerender_refuses_per_process_cache(self):
+        """Test that pre-rendering into a local-memory cache is refused"""
+        with self.settings(SITEMAP_CACHE='default'):
+            with self.assertRaises(ImproperlyConfigured):
+                prerender_sitemaps('testserver')
+            with self.assertRaises(CommandError):
+                call_command('render_sitemaps', domain='testserver', stdout=io.StringIO())
+
+
+class CatalogPageCacheTestCase(TestCase):
+    """Test cases for conditional GET on catalog pages"""
+
+    def setUp(self):
+        """Create a product and clear the catalog version"""
+        cache.clear()
+        self.category = Category.objects.create(name='bikes', friendly_name='Bikes')
+        self.product = Product.objects.create(
+            name='Road Bike', price=Decimal('900.00'), category=self.category,
+            stock_quantity=3, in_stock=True
+        )
+        self.url = reverse('products')
+
+    def test_anonymous_page_is_public(self):
+        """Test that anonymous visitors get a publicly cacheable page"""
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('public', response['Cache-Control'])
+        self.assertIn('Cookie', response['Vary'])
+        self.assertIn('Last-Modified', response)
+
+    def test_unchanged_page_is_not_modified(self):
+        """Test that a matching ETag or date gets a 304"""
+        response = self.client.get(self.url)
+        self.assertEqual(self.client.get(self.url, HTTP_IF_NONE_MATCH=response['ETag']).status_code, 304)
+        self.assertEqual(
+            self.client.get(self.url, HTTP_IF_MODIFIED_SINCE=response['Last-Modified']).status_code, 304
+        )
+
+    def test_catalog_change_invalidates_page(self):
+        """Test that saving a product changes the ETag"""
+        etag = self.client.get(self.url)['ETag']
+        self.product.price = Decimal('950.00')
+        with self.captureOnCommitCallbacks(execute=True):
+            self.product.save()
+        self.assertEqual(self.client.get(self.url, HTTP_IF_NONE_MATCH=etag).status_code, 200)
+
+    def test_version_is_shared_between_workers(self):
+        """Test that a worker with its own cache sees another worker's change"""
+        version = catalog_version()
+        with self.captureOnCommitCallbacks(execute=True):
+            touch_catalog()
+        changed = catalog_version()
+        self.assertGreater(changed, version)
+
+        # Another process starts with an empty local cache
+        cache.clear()
+        self.assertEqual(catalog_version(), changed)
+
+    def test_authenticated_page_is_private(self):
+        """Test that logged in users get private pages keyed on their cart"""
+        user = User.objects.create_user(username='rider', password='pass12345')
+        self.client.force_login(user)
+        response = self.client.get(self.url)
+        self.assertIn('private', response['Cache-Control'])
+        self.assertNotIn('Last-Modified', response)
+        self.assertEqual(self.client.get(self.url, HTTP_IF_NONE_MATCH=response['ETag']).status_code, 304)
+
+        cart, _ = Cart.objects.get_or_create(user=user)
+        cart.items.create(product=self.product, quantity=1)
+        self.assertEqual(self.client.get(self.url, HTTP_IF_NONE_MATCH=response['ETag']).status_code, 200)
+
+    def test_page_setting_cookies_is_private(self):
+        """Test that a page rendering a CSRF token is not shared"""
+        response = self.client.get(reverse('product_detail', args=[self.product.pk]))
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('private', response['Cache-Control'])
+
+    def test_legal_pages_are_cached(self):
+        """Test that legal pages use the catalog policy"""
+        for name in ('privacy_policy', 'terms_of_service', 'cookie_settings', 'categories'):
+            response = self.client.get(reverse(name))
+            self.assertEqual(
+                self.client.get(reverse(name), HTTP_IF_NONE_MATCH=response['ETag']).status_code, 304
+            )
+
+
+class SessionWriteAvoidanceTestCase(TestCase):
+    """Test cases for skipping session saves that change nothing"""
+
+    def setUp(self):
+        """Create a stored session holding a cart id"""
+        self.store = SessionStore()
+        self.store['cart_id'] = 1
+        self.store.create()
+
+    def respond(self, cart_id):
+        def view(request):
+            request.session['cart_id'] = cart_id
+            return HttpResponse()
+
+        request = RequestFactory().get('/')
+        request.COOKIES[settings.SESSION_COOKIE_NAME] = self.store.session_key
+        middleware = SessionMiddleware(view)
+        middleware.process_request(request)
+        return middleware.process_response(request, view(request))
+
+    def test_unchanged_session_is_not_saved(self):
+        """Test that rewriting a value the session already holds skips the save"""
+        with self.assertNumQueries(1):
+            response = self.respond(1)
+        self.assertNotIn(settings.SESSION_COOKIE_NAME, response.cookies)
+
+    def test_changed_session_is_saved(self):
+        """Test that real changes are still written"""
+        response = self.respond(2)
+        self.assertIn(settings.SESSION_COOKIE_NAME, response.cookies)
+        self.assertEqual(SessionStore(self.store.session_key)['cart_id'], 2)
+
+    @override_settings(SESSION_WRITE_AVOIDANCE=False)
+    def test_write_avoidance_can_be_disabled(self):
+        """Test that Django's save-when-modified behaviour is kept when disabled"""
+        self.assertIn(settings.SESSION_COOKIE_NAME, self.respond(1).cookies)
+
+    def test_browsing_creates_no_session(self):
+        """Test that product and cart pages don't create a session or cart"""
+        category = Category.objects.create(name='bikes', friendly_name='Bikes')
+        product = Product.objects.create(
+            name='Road Bike', price=Decimal('900.00'), category=category,
+            stock_quantity=3, in_stock=True
+        )
+        for url in (reverse('product_detail', args=[product.pk]), reverse('shopping_cart:cart')):
+            response = self.client.get(url)
+            self.assertEqual(response.status_code, 200)
+            self.assertNotIn(settings.SESSION_COOKIE_NAME, response.cookies)
+        self.assertFalse(Cart.objects.exists())
+
+
+class CacheBackendTestCase(TestCase):
+    """Test cases for refusing per-process caches where state must be shared"""
+
+    def test_per_process_backends(self):
+        """Test that local-memory and dummy caches count as per process"""
+        self.assertTrue(is_per_process_cache('default'))
+        self.assertFalse(is_per_process_cache('shared', {
+            'shared': {'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache'}
+        }))
+        self.assertTrue(is_per_process_cache('dummy', {
+            'dummy': {'BACKEND': 'django.core.cache.backends.dummy.DummyCache'}
+        }))
+
+    def test_cached_db_sessions_refuse_per_process_cache(self):
+        """Test that settings reject cached_db sessions on the locmem cache"""
+        result = subprocess.run(
+            [sys.executable, '-c', 'import wiesbaden_cyclery.settings'],
+            cwd=settings.BASE_DIR, capture_output=True, text=True,
+            env={**os.environ, 'SESSION_PROFILE': 'cached_db', 'SESSION_CACHE_ALIAS': 'default'},
+        )
+        self.assertNotEqual(result.returncode, 0)
+        self.assertIn('ImproperlyConfigured', result.stderr)
@@ -17,16 +17,7 @@ from django.contrib import admin
 from django.urls import path, include
 from django.conf import settings
 from django.conf.urls.static import static
-from django.contrib.sitemaps.views import sitemap
 from . import views
-from .sitemaps import StaticViewSitemap, ProductSitemap, CategorySitemap
-
-# Sitemap configuration
-sitemaps = {
-    'static': StaticViewSitemap,
-    'products': ProductSitemap,
-    'categories': CategorySitemap,
-}
 
 urlpatterns = [
     path('admin/', admin.site.urls),
@@ -40,7 +31,8 @@ urlpatterns = [
     path('terms-of-service/', views.terms_of_service, name='terms_of_service'),
     path('cookie-settings/', views.cookie_settings, name='cookie_settings'),
     # SEO URLs
-    path('sitemap.xml', sitemap, {'sitemaps': sitemaps}, name='django.contrib.sitemaps.views.sitemap'),
+    path('sitemap.xml', views.sitemap, name='sitemap'),
+    path('sitemap-<slug:name>.xml', views.sitemap, name='sitemap_section'),
     path('robots.txt', views.robots_txt, name='robots_txt'),
     path('seo-test/', views.seo_test, name='seo_test'),
     # Categories page
@@ -1,9 +1,15 @@
 """
 Main views for Wiesbaden Cyclery
 """
+from django.conf import settings
+from django.contrib.sites.shortcuts import get_current_site
 from django.shortcuts import render
-from django.http import HttpResponse
+from django.http import Http404, HttpResponse
 from django.template import loader
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.utils.http import http_date
+
+from .http_cache import catalog_page
 
 
 def index(request):
@@ -13,6 +19,7 @@ def index(request):
     return render(request, 'home/index.html')
 
 
+@catalog_page
 def categories(request):
     """
     Categories page view
@@ -28,6 +35,7 @@ def categories(request):
     return render(request, 'categories/categories.html', context)
 
 
+@catalog_page
 def privacy_policy(request):
     """A view to return the privacy policy page"""
     context = {
@@ -36,6 +44,7 @@ def privacy_policy(request):
     return render(request, 'legal/privacy_policy.html', context)
 
 
+@catalog_page
 def terms_of_service(request):
     """A view to return the terms of service page"""
     context = {
@@ -44,6 +53,7 @@ def terms_of_service(request):
     return render(request, 'legal/terms_of_service.html', context)
 
 
+@catalog_page
 def cookie_settings(request):
     """A view to return the cookie settings page"""
     return render(request, 'legal/cookie_settings.html')
@@ -55,6 +65,28 @@ def robots_txt(request):
     return HttpResponse(template.render({'request': request}, request), content_type='text/plain')
 
 
+def sitemap(request, name='index'):
+    """
+    Serve a cached sitemap, or a 304 if the crawler's copy is current
+    """
+    from .sitemaps import get_sitemap
+
+    rendered = get_sitemap(name, get_current_site(request).domain)
+    if rendered is None:
+        raise Http404(f'No sitemap named {name!r}')
+
+    response = get_conditional_response(
+        request, etag=rendered.etag, last_modified=rendered.last_modified
+    )
+    if response is None:
+        response = HttpResponse(rendered.content, content_type='application/xml')
+    response['ETag'] = rendered.etag
+    response['Last-Modified'] = http_date(rendered.last_modified)
+    response['X-Robots-Tag'] = 'noindex, noodp, noarchive'
+    patch_cache_control(response, public=True, max_age=settings.SITEMAP_MAX_AGE)
+    return response
+
+
 def seo_test(request):
     """A view to return the SEO test page"""
     return render(request, 'seo_test.html')